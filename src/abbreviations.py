@@ -0,0 +1,193 @@
+"""
+Clinical Abbreviation Expander
+Purpose: Spell out clinical shorthand before the prompt is built
+
+"Rivaroxaban 10mg PO daily x 35 days for DVT/PE prevention" makes MedGemma
+decode PO, x, DVT and PE on every call before it can start simplifying.
+This deterministic stage (in the spirit of deterministic_normalize in
+test_b_v2) rewrites the shorthand into plain words first. Context decides
+the expansion: "x 35 days" is "for 35 days" but "x3" is "3 times", "per PT"
+is the physical therapist while "PT:" is physical therapy, and "<" / ">"
+only become "less than" / "more than" in front of a number. AMBIGUOUS
+shorthand is only expanded when the note is about the matching topic: "PE"
+next to DVT or blood thinners is a clot in the lungs, but "PE: normal" is a
+physical exam and stays as written. Every rule is
+compiled into one alternation, so a note is rewritten in a single scan,
+and expand_abbreviations caches its result per note text.
+
+Numbers, units and ranges come out unchanged, so dose_extractor.diff_facts
+finds the same facts before and after expansion.
+
+Usage:
+    expand_abbreviations("Oxycodone 5mg PO q4-6h PRN")
+    # "Oxycodone 5mg by mouth every 4 to 6 hours as needed"
+"""
+
+import re
+from functools import lru_cache
+
+# Case-sensitive shorthand with a single expansion
+ABBREVIATIONS = {
+    "PO": "by mouth",
+    "PRN": "as needed",
+    "prn": "as needed",
+    "WBAT": "put as much weight on your leg as is comfortable",
+    "NWB": "do not put any weight on your leg",
+    "TTWB": "only touch your toes to the ground",
+    "ROM": "range of motion",
+    "SOB": "shortness of breath",
+    "HTN": "high blood pressure",
+    "CHF": "heart failure",
+    "DM": "diabetes",
+    "ABX": "antibiotics",
+    "ER": "emergency room",
+    "ED": "emergency room",
+    "DVT": "blood clot in the leg",
+    "NSAID": "anti-inflammatory pain reliever (like ibuprofen or naproxen)",
+    "NSAIDs": "anti-inflammatory pain relievers (like ibuprofen or naproxen)",
+    "f/u": "follow-up",
+    "s/p": "after",
+    "w/": "with",
+}
+
+SCHEDULES = {
+    "bid": "twice a day",
+    "tid": "three times a day",
+    "qid": "four times a day",
+    "qd": "once a day",
+    "qhs": "at bedtime",
+    "qam": "every morning",
+    "qpm": "every evening",
+}
+
+# Shorthand with more than one clinical meaning -> (expansion, topic the
+# note must mention for that meaning). "PE" is also a physical exam, "PT"
+# also prothrombin time
+AMBIGUOUS = {
+    "PE": (
+        "blood clot in the lungs",
+        r"\bDVT\b|\bclots?\b|embolism|anticoagul|blood thinner|rivaroxaban|apixaban|heparin|enoxaparin|warfarin",
+    ),
+    "PT": ("physical therapy", r"\bwalker\b|\bcane\b|\bcrutches\b|\bWBAT\b|weight[- ]bearing|\bexercises?\b"),
+}
+
+# Shorthand time and weight units after a number, singular
+UNIT_WORDS = {"hr": "hour", "hrs": "hour", "wk": "week", "wks": "week", "lb": "pound", "lbs": "pound"}
+
+COMPARATOR_WORDS = {">=": "at least", "≥": "at least", "<=": "at most", "≤": "at most", ">": "more than", "<": "less than"}
+
+_NUMBER = r"\d+(?:\.\d+)?"
+# A number-led rule must start at the beginning of the number, not inside it
+_NUMBER_START = r"(?<![\d.])"
+_SENTENCE_START = re.compile(r"(?:^|[.!?:\n])[\s\-•*]*$")
+
+
+def _plural(number, word):
+    return word if number == "1" else word + "s"
+
+
+def _expand_in_context(abbreviation):
+    """Expansion that leaves the abbreviation as written unless the note mentions its topic"""
+    expansion, topic = AMBIGUOUS[abbreviation]
+    topic = re.compile(topic, re.IGNORECASE)
+
+    def expand(match):
+        return expansion if topic.search(match.string) else match.group(0)
+
+    return expand
+
+
+def _expand_dvt_pe(match):
+    clots = "a blood clot in the leg or a blood clot in the lungs"
+    if match.group("dvt_pe_prevention"):
+        return f"to prevent {clots}"
+    return (match.group("dvt_pe_for") or "") + clots
+
+
+def _expand_interval(match):
+    low, high = match.group("interval_low"), match.group("interval_high")
+    return f"every {low} to {high} hours" if high else f"every {low} {_plural(low, 'hour')}"
+
+
+def _expand_duration(match):
+    count, unit = match.group("duration_count"), match.group("duration_unit").lower()
+    return f"for {count} {_plural(count, UNIT_WORDS.get(unit, unit.rstrip('s')))}"
+
+
+# (name, pattern, expansion); earlier rules win when two start at the same place
+RULES = [
+    # "for DVT/PE prevention" reads as "to prevent ..." once spelled out
+    (
+        "dvt_pe",
+        r"\b(?P<dvt_pe_for>for\s+)?DVT\s*/\s*PE\b(?P<dvt_pe_prevention>\s+prevention\b)?",
+        _expand_dvt_pe,
+    ),
+    (
+        "interval",
+        r"(?i:\bq\s*(?P<interval_low>\d+)(?:\s*-\s*(?P<interval_high>\d+))?\s*(?:h|hrs?|hours?)\b)",
+        _expand_interval,
+    ),
+    ("schedule", rf"(?i:\b(?:{'|'.join(SCHEDULES)})\b)", lambda m: SCHEDULES[m.group(0).lower()]),
+    (
+        "duration",
+        rf"(?i:\bx\s*(?P<duration_count>{_NUMBER})\s*(?P<duration_unit>hours?|hrs?|days?|weeks?|wks?|months?)\b)",
+        _expand_duration,
+    ),
+    ("times", r"(?i:\bx\s*(?P<times_count>\d+)\b)", lambda m: f"{m.group('times_count')} times"),
+    ("per_pt", r"\bper\s+PT(?:\s+(?:recommendations?|instructions?))?\b", lambda m: "as your physical therapist recommends"),
+    # "PE: normal" is an exam finding; "PT/INR", "PT 14 sec" are a lab value
+    ("pe", r"\bPE\b(?!\s*:)", _expand_in_context("PE")),
+    ("pt", r"\bPT\b(?!\s*/|\s*\d)", _expand_in_context("PT")),
+    (
+        "comparator",
+        r"(?P<comparator_symbol>>=|<=|≥|≤|>|<)\s*(?=\d)",
+        lambda m: COMPARATOR_WORDS[m.group("comparator_symbol")] + " ",
+    ),
+    (
+        "fahrenheit",
+        rf"{_NUMBER_START}(?P<fahrenheit_value>{_NUMBER})\s*(?:°\s*F|F)\b",
+        lambda m: f"{m.group('fahrenheit_value')}°F",
+    ),
+    ("degrees", rf"{_NUMBER_START}(?P<degrees_value>{_NUMBER})\s*°", lambda m: f"{m.group('degrees_value')} degrees"),
+    (
+        "unit",
+        rf"{_NUMBER_START}(?P<unit_value>{_NUMBER})\s*(?P<unit_name>hrs?|wks?|lbs?)\b",
+        lambda m: f"{m.group('unit_value')} " + _plural(m.group("unit_value"), UNIT_WORDS[m.group("unit_name")]),
+    ),
+    ("liters", rf"{_NUMBER_START}(?P<liters_value>{_NUMBER})\s*L\b", lambda m: f"{m.group('liters_value')} liters"),
+    ("grams", rf"{_NUMBER_START}(?P<grams_value>{_NUMBER})\s*g\b", lambda m: f"{m.group('grams_value')} grams"),
+    (
+        "word",
+        r"(?<![\w/])(?:" + "|".join(re.escape(term) for term in sorted(ABBREVIATIONS, key=len, reverse=True)) + r")(?![\w/])",
+        lambda m: ABBREVIATIONS[m.group(0)],
+    ),
+]
+
+
+class AbbreviationExpander:
+    """All RULES compiled into one pattern and applied in a single re.sub pass"""
+
+    def __init__(self, rules=RULES):
+        self.expansions = {name: expand for name, _, expand in rules}
+        self.pattern = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in rules))
+
+    def _replace(self, match):
+        expansion = self.expansions[match.lastgroup](match)
+        # Keep sentence and bullet starts capitalized ("PT: WBAT" -> "Physical therapy: Put ...")
+        start = match.start()
+        if expansion[:1].islower() and _SENTENCE_START.search(match.string, max(0, start - 8), start):
+            expansion = expansion[0].upper() + expansion[1:]
+        return expansion
+
+    def expand(self, clinical_text):
+        """Note with every abbreviation spelled out"""
+        return self.pattern.sub(self._replace, clinical_text)
+
+
+DEFAULT_EXPANDER = AbbreviationExpander()
+
+
+@lru_cache(maxsize=4096)
+def expand_abbreviations(clinical_text):
+    """Cached expansion with the default rules; repeated notes are rewritten once"""
+    return DEFAULT_EXPANDER.expand(clinical_text)
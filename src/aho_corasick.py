@@ -0,0 +1,118 @@
+"""
+Aho-Corasick Multi-Pattern Matcher
+Purpose: Find every lexicon term in a text in one pass, however large the lexicon
+
+A regex alternation of a few hundred terms backtracks at every position;
+the automaton walks each character once and reports all terms ending
+there through its output links, so matching time is linear in the text
+plus the number of matches. Built once per lexicon and shared.
+
+Matching is on whole words by default (a term must not start or end inside
+a longer word) and case-insensitive unless ``ignore_case=False``. Each term
+carries a value, typically the canonical concept it stands for.
+
+Usage:
+    matcher = AhoCorasick({"edema": "edema", "swelling": "edema"})
+    for start, end, value in matcher.find(text):
+        ...
+"""
+
+
+class AhoCorasick:
+    """
+    Compiled automaton over a term -> value mapping.
+
+    ``terms`` may also be an iterable of strings, in which case each term
+    is its own value. Terms are stripped of surrounding whitespace.
+    """
+
+    def __init__(self, terms, ignore_case=True, whole_words=True):
+        if not isinstance(terms, dict):
+            terms = {term: term for term in terms}
+        self.ignore_case = ignore_case
+        self.whole_words = whole_words
+
+        # Per node: transitions, failure link, (length, value) of the term
+        # ending here, and the nearest node on the failure chain with a term
+        self._goto = [{}]
+        self._fail = [0]
+        self._term = [None]
+        self._output = [0]
+        for term, value in terms.items():
+            term = term.strip()
+            if term:
+                self._insert(term.lower() if ignore_case else term, value)
+        self._link()
+
+    def __len__(self):
+        return sum(term is not None for term in self._term)
+
+    def _insert(self, term, value):
+        node = 0
+        for char in term:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._term.append(None)
+                self._output.append(0)
+            node = child
+        self._term[node] = (len(term), value)
+
+    def _link(self):
+        """Breadth-first failure and output links"""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output[child] = fail if self._term[fail] is not None else self._output[fail]
+
+    def _at_boundary(self, text, start, end):
+        return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+    def iter_all(self, text):
+        """Every (start, end, value) occurrence, overlapping matches included, in order of end"""
+        haystack = text.lower() if self.ignore_case else text
+        goto, fail, term, output = self._goto, self._fail, self._term, self._output
+        node = 0
+        for index, char in enumerate(haystack):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            match = node if term[node] is not None else output[node]
+            while match:
+                length, value = term[match]
+                start = index + 1 - length
+                if not self.whole_words or self._at_boundary(haystack, start, index + 1):
+                    yield start, index + 1, value
+                match = output[match]
+
+    def find(self, text):
+        """Non-overlapping matches, leftmost-longest, as (start, end, value) in text order"""
+        return leftmost_longest(self.iter_all(text))
+
+    def values(self, text):
+        """Distinct values found in text, in order of first appearance"""
+        return list(dict.fromkeys(value for _, _, value in self.find(text)))
+
+
+def leftmost_longest(matches):
+    """
+    Resolve overlapping (start, end, value) matches, e.g. from several
+    automata: the earliest match wins, the longest among those starting together.
+    """
+    selected = []
+    covered = 0
+    for start, end, value in sorted(matches, key=lambda match: (match[0], -match[1])):
+        if start >= covered:
+            selected.append((start, end, value))
+            covered = end
+    return selected
@@ -0,0 +1,192 @@
+"""
+Discharge Instruction Review App
+Purpose: Streamlit front end for reviewing MedGemma transformations
+
+The model is loaded once per server process (st.cache_resource), so new
+sessions and reruns reuse the same weights; set MEDGEMMA_SERVER_URL to use
+a running model_server.py instead. Notes are pasted, uploaded as .txt
+files, or picked from the five test scenarios. Output streams while it
+decodes, and the review checks (grade, repetition loop, leftover jargon,
+dropped or added clinical facts, changed doses and thresholds) for each
+finished note run on a background thread pool while the next note is
+generating. Abbreviations in the note can optionally be spelled out
+(abbreviations.py) and jargon replaced with plain terms (jargon.py) before
+the prompt is built.
+
+Usage:
+    cd src
+    streamlit run app.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from abbreviations import expand_abbreviations
+from density_router import route_note
+from dose_extractor import diff_facts, list_changes
+from entity_extractor import compare_entities
+from jargon import find_jargon, substitute_plain_language
+from prefix_cache import PromptPrefixCache
+from prompts import PROMPTS
+from readability import readability_batch
+from scenarios import CLINICAL_INPUTS
+from streaming import stream_transform_text
+from test_medgemma import load_model
+from token_budget import TokenBudgetPlanner
+
+TARGET_RANGE = (4.5, 5.5)
+
+
+@st.cache_resource(show_spinner="Loading MedGemma...")
+def get_model():
+    """(model, processor) shared by every session in this server process"""
+    return load_model()
+
+
+@st.cache_resource
+def get_check_pool():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="review-checks")
+
+
+@st.cache_resource
+def get_prefix_cache():
+    """Prefilled prompt prefixes shared by every session, one per prompt version"""
+    return PromptPrefixCache()
+
+
+@st.cache_resource
+def get_planner():
+    return TokenBudgetPlanner.load()
+
+
+def review_checks(original, output, loop):
+    """Grade, loop, jargon and fact checks for one transformed note"""
+    grades = readability_batch([original, output])["flesch_kincaid_grade"]
+    original_grade, output_grade = float(grades[0]), float(grades[1])
+    return {
+        "original_grade": round(original_grade, 1),
+        "output_grade": round(output_grade, 1),
+        "reduction": round(original_grade - output_grade, 1),
+        "target_met": TARGET_RANGE[0] <= output_grade <= TARGET_RANGE[1],
+        "loop": loop,
+        "jargon": find_jargon(output),
+        "facts": compare_entities(original, output),
+        "quantities": diff_facts(original, output),
+    }
+
+
+def collect_notes():
+    """Notes to transform as (label, text) pairs from every input source"""
+    notes = []
+
+    scenario = st.selectbox("Test scenario", ["(none)"] + list(CLINICAL_INPUTS))
+    if scenario != "(none)":
+        notes.append((scenario, CLINICAL_INPUTS[scenario]))
+
+    pasted = st.text_area("Paste discharge instructions", height=180)
+    if pasted.strip():
+        notes.append(("Pasted note", pasted.strip()))
+
+    for upload in st.file_uploader("Or upload .txt notes", type=["txt"], accept_multiple_files=True) or []:
+        text = upload.getvalue().decode("utf-8", errors="replace").strip()
+        if text:
+            notes.append((upload.name, text))
+
+    return notes
+
+
+def render_checks(checks):
+    grade_col, reduction_col, loop_col, jargon_col = st.columns(4)
+    grade_col.metric(
+        "Grade", f"{checks['output_grade']:.1f}", f"{-checks['reduction']:.1f}", delta_color="inverse"
+    )
+    reduction_col.metric("Target 4.5-5.5", "✓ Met" if checks["target_met"] else "✗ Missed")
+    loop_col.metric("Repetition", "⚠ Loop" if checks["loop"] else "✓ None")
+    jargon_col.metric("Jargon terms", len(checks["jargon"]))
+    if checks["jargon"]:
+        st.warning("Jargon left in output: " + ", ".join(checks["jargon"]))
+    if checks["facts"]["dropped"]:
+        st.warning("Missing from output: " + ", ".join(checks["facts"]["dropped"]))
+    if checks["facts"]["added"]:
+        st.warning("Not in the original note: " + ", ".join(checks["facts"]["added"]))
+    if checks["quantities"]["rejected"]:
+        st.error(
+            "Doses or limits changed, reject this output:\n\n"
+            + "\n".join(f"- {change}" for change in list_changes(checks["quantities"]))
+        )
+    if checks["loop"]:
+        st.error(
+            f"Repetition loop: {checks['loop']['period']}-token cycle from generated token "
+            f"{checks['loop']['offset']}. Human review required."
+        )
+
+
+def main():
+    st.set_page_config(page_title="Discharge Instruction Review", layout="wide")
+    st.title("Discharge Instruction Review")
+
+    with st.sidebar:
+        prompt_name = st.selectbox("Prompt", list(PROMPTS), index=list(PROMPTS).index("d_v5"))
+        auto_budget = st.checkbox("Plan max_new_tokens per note", value=True)
+        max_new_tokens = st.slider("max_new_tokens", 100, 1000, 1000, step=50, disabled=auto_budget)
+        expand = st.checkbox("Expand abbreviations before generating", value=False)
+        plain_language = st.checkbox("Replace jargon in the note before generating", value=False)
+
+    notes = collect_notes()
+    if not st.button("Transform", type="primary", disabled=not notes):
+        for label, result in st.session_state.get("results", []):
+            st.subheader(label)
+            st.markdown(result["output"])
+            render_checks(result["checks"])
+        return
+
+    model, processor = get_model()
+    planner = get_planner()
+    pool = get_check_pool()
+    prompt = PROMPTS[prompt_name]
+
+    pending = []
+    for label, text in notes:
+        st.subheader(label)
+        decision = route_note(text)
+        st.caption(f"Density: {decision['profile']['density']} · {decision['reason']}")
+
+        model_input = expand_abbreviations(text) if expand else text
+        if plain_language:
+            model_input = substitute_plain_language(model_input)
+        limit = (
+            planner.budget(model_input, getattr(processor, "tokenizer", None), prompt) if auto_budget else max_new_tokens
+        )
+        metrics = {}
+        placeholder = st.empty()
+        output = ""
+
+        # Streamlit interrupts the script on Stop or a new rerun; closing the
+        # generator aborts the decode instead of leaving it running
+        stream = stream_transform_text(
+            model, processor, model_input, prompt, max_new_tokens=limit, metrics=metrics, prefix_cache=get_prefix_cache()
+        )
+        try:
+            for chunk in stream:
+                output += chunk
+                placeholder.markdown(output + "▌")
+        finally:
+            stream.close()
+        placeholder.markdown(output)
+
+        st.caption(f"First token {metrics['ttft_s'] or 0:.2f}s · total {metrics['elapsed_s']:.1f}s · limit {limit}")
+        pending.append((label, output, pool.submit(review_checks, text, output, metrics["loop"]), st.empty()))
+
+    results = []
+    for label, output, future, slot in pending:
+        checks = future.result()
+        with slot.container():
+            render_checks(checks)
+        results.append((label, {"output": output, "checks": checks}))
+
+    st.session_state["results"] = results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Offline Backends
+Purpose: Run the transform pipeline without a GPU, network access or MedGemma weights
+
+load_model() returns one of these when MEDGEMMA_BACKEND is set:
+- stub: StubModel, a deterministic generate() that reproduces MedGemma's
+  output length (proportional to the note length), per-token decode timing,
+  and its repetition loop on high-density notes. No weights, no forward
+  pass; use it for batching, caches, the server (without --continuous) and
+  experiment pipelines.
+- tiny: a randomly initialised two-layer Gemma 3 model. Real forward passes
+  and KV caches, so the continuous batching scheduler and the prompt prefix
+  cache work; the output text is noise.
+
+Both share a byte-level BPE tokenizer trained in-process on the clinical
+scenarios and prompts, with a Gemma-style chat template, so token counts
+are in the same range as MedGemma's.
+
+Usage:
+    MEDGEMMA_BACKEND=stub python experiment_runner.py experiments/d_series_regression.json
+    MEDGEMMA_BACKEND=tiny python model_server.py --continuous
+    MEDGEMMA_STUB_TIME_SCALE=0 ...   # stub without simulated latency
+"""
+
+import os
+import re
+import time
+import zlib
+from types import SimpleNamespace
+
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import BatchFeature, Gemma3ForCausalLM, Gemma3TextConfig, PreTrainedTokenizerFast
+
+from density_router import profile_density
+from prompts import PROMPTS
+from scenarios import CLINICAL_INPUTS
+
+BACKENDS = ("medgemma", "stub", "tiny")
+
+# Reported as the model id, so results from offline backends are never
+# mistaken for MedGemma's
+BACKEND_MODEL_IDS = {"stub": "stub-medgemma", "tiny": "tiny-random-gemma3"}
+
+SPECIAL_TOKENS = ["<pad>", "<bos>", "<eos>", "<unk>", "<start_of_turn>", "<end_of_turn>"]
+
+CHAT_TEMPLATE = (
+    "{{ bos_token }}{% for message in messages %}<start_of_turn>{{ message['role'] }}\n"
+    "{% if message['content'] is string %}{{ message['content'] }}"
+    "{% else %}{% for item in message['content'] %}{{ item['text'] }}{% endfor %}{% endif %}"
+    "<end_of_turn>\n{% endfor %}{% if add_generation_prompt %}<start_of_turn>model\n{% endif %}"
+)
+
+NOTE_IN_PROMPT = re.compile(r"ORIGINAL DISCHARGE INSTRUCTIONS:\n(.*?)\n\nPATIENT-FRIENDLY VERSION:", re.DOTALL)
+
+STUB_SECTIONS = [
+    "**MEDICATION**",
+    "- Take your medicine at the same time each day.",
+    "- Do not take more than your doctor told you.",
+    "**WHAT TO DO / WHAT NOT TO DO**",
+    "- Rest when you feel tired.",
+    "- Keep the area clean and dry.",
+    "- Walk a little each day.",
+    "- Do not lift heavy things for two weeks.",
+    "**CALL DOCTOR RIGHT AWAY IF**",
+    "- You have a fever.",
+    "- You have pain that does not go away.",
+    "- You feel short of breath.",
+]
+STUB_LOOP = "- Weigh yourself every day and call your doctor.\n"
+
+
+def build_tokenizer(vocab_size=4096):
+    """Train a small byte-level BPE tokenizer on the scenarios and prompts"""
+    corpus = list(CLINICAL_INPUTS.values()) + list(PROMPTS.values()) + STUB_SECTIONS + [STUB_LOOP]
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(
+        corpus,
+        trainers.BpeTrainer(
+            vocab_size=vocab_size,
+            special_tokens=SPECIAL_TOKENS,
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+            show_progress=False,
+        ),
+    )
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        pad_token="<pad>",
+        bos_token="<bos>",
+        eos_token="<eos>",
+        unk_token="<unk>",
+        additional_special_tokens=["<start_of_turn>", "<end_of_turn>"],
+    )
+    tokenizer.chat_template = CHAT_TEMPLATE
+    return tokenizer
+
+
+class LocalProcessor:
+    """The subset of the MedGemma AutoProcessor interface the pipeline uses"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def apply_chat_template(self, conversation, **kwargs):
+        output = self.tokenizer.apply_chat_template(conversation, **kwargs)
+        # BatchFeature, like the multimodal processor, so .to(device, dtype=...) works
+        return BatchFeature(dict(output)) if kwargs.get("return_dict") else output
+
+    def decode(self, token_ids, **kwargs):
+        return self.tokenizer.decode(token_ids, **kwargs)
+
+    def batch_decode(self, sequences, **kwargs):
+        return self.tokenizer.batch_decode(sequences, **kwargs)
+
+
+class StubModel:
+    """
+    Deterministic stand-in for MedGemma's generate().
+
+    Each row's output is chosen from the note's text hash and is
+    ``output_ratio`` times the note's token count long (at least
+    ``min_output_tokens``), then EOS. High-density notes (the Heart Failure
+    boundary in density_router) repeat one line until a stopping criterion
+    or max_new_tokens ends the row. Prefill and every decode step sleep for
+    the configured per-token times multiplied by ``time_scale``.
+    """
+
+    # generate() only: the prefix cache skips it, and the scheduler and
+    # model_server --continuous refuse it
+    supports_forward = False
+
+    def __init__(
+        self,
+        tokenizer,
+        output_ratio=1.6,
+        min_output_tokens=40,
+        prefill_token_s=0.0005,
+        decode_step_s=0.04,
+        time_scale=1.0,
+    ):
+        self.tokenizer = tokenizer
+        self.output_ratio = output_ratio
+        self.min_output_tokens = min_output_tokens
+        self.prefill_token_s = prefill_token_s
+        self.decode_step_s = decode_step_s
+        self.time_scale = time_scale
+        self.name_or_path = BACKEND_MODEL_IDS["stub"]
+        self.backend = "stub"
+        self.config = SimpleNamespace(name_or_path=self.name_or_path)
+        self.device = torch.device("cpu")
+        self.dtype = torch.float32
+
+        self._sections = [tokenizer(line + "\n", add_special_tokens=False)["input_ids"] for line in STUB_SECTIONS]
+        self._loop = tokenizer(STUB_LOOP, add_special_tokens=False)["input_ids"]
+
+    def _planned_output(self, prompt_ids):
+        """Token IDs this row will generate, ending in EOS unless it loops"""
+        text = self.tokenizer.decode(prompt_ids, skip_special_tokens=True)
+        match = NOTE_IN_PROMPT.search(text)
+        note = match.group(1) if match else text
+
+        note_tokens = len(self.tokenizer(note, add_special_tokens=False)["input_ids"])
+        length = max(self.min_output_tokens, int(note_tokens * self.output_ratio))
+
+        seed = zlib.crc32(note.encode("utf-8"))
+        start = seed % len(self._sections)
+        planned = []
+        for i in range(len(self._sections) * 4):
+            planned.extend(self._sections[(start + i) % len(self._sections)])
+            if len(planned) >= length:
+                break
+
+        if profile_density(note)["density"] == "high":
+            return planned[:length // 2] + self._loop * length
+        return planned[:length] + [self.tokenizer.eos_token_id]
+
+    def generate(
+        self, input_ids, attention_mask=None, max_new_tokens=1000, stopping_criteria=None, streamer=None, **kwargs
+    ):
+        """Greedy-decode-shaped output: prompt + generated, pad after each row finishes"""
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+
+        rows = input_ids.shape[0]
+        plans = [self._planned_output(input_ids[row][attention_mask[row].bool()].tolist()) for row in range(rows)]
+        pad_id = self.tokenizer.pad_token_id
+        eos_id = self.tokenizer.eos_token_id
+
+        time.sleep(self.prefill_token_s * int(attention_mask.sum()) * self.time_scale)
+        if streamer is not None:
+            streamer.put(input_ids.cpu())
+
+        sequences = input_ids
+        finished = torch.zeros(rows, dtype=torch.bool)
+        for step in range(max_new_tokens):
+            time.sleep(self.decode_step_s * self.time_scale)
+
+            next_tokens = torch.tensor([
+                pad_id if finished[row] else plans[row][step] if step < len(plans[row]) else plans[row][-1]
+                for row in range(rows)
+            ])
+            sequences = torch.cat([sequences, next_tokens[:, None].to(sequences.device)], dim=-1)
+            if streamer is not None:
+                streamer.put(next_tokens)
+            finished |= next_tokens == eos_id
+
+            if stopping_criteria is not None:
+                finished |= stopping_criteria(sequences, None).cpu()
+            if finished.all():
+                break
+
+        if streamer is not None:
+            streamer.end()
+        return sequences
+
+
+def build_tiny_model(tokenizer, dtype=torch.float32, seed=0):
+    """Two-layer Gemma 3 text model with random weights"""
+    torch.manual_seed(seed)
+    config = Gemma3TextConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        num_key_value_heads=1,
+        head_dim=32,
+        sliding_window=512,
+        max_position_embeddings=8192,
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    model = Gemma3ForCausalLM(config).to(dtype).eval()
+    model.config.name_or_path = BACKEND_MODEL_IDS["tiny"]
+    model.name_or_path = model.config.name_or_path
+    model.backend = "tiny"
+    return model
+
+
+def load_backend(name, dtype=torch.float32):
+    """Return (model, processor) for an offline backend"""
+    if name not in BACKENDS or name == "medgemma":
+        raise ValueError(f"Unknown offline backend '{name}'. Available: stub, tiny")
+
+    tokenizer = build_tokenizer()
+
+    if name == "stub":
+        model = StubModel(tokenizer, time_scale=float(os.getenv("MEDGEMMA_STUB_TIME_SCALE", "1")))
+    else:
+        model = build_tiny_model(tokenizer, dtype=dtype)
+
+    print(f"✓ Using offline '{name}' backend ({model.name_or_path}, vocab {len(tokenizer)})")
+    return model, LocalProcessor(tokenizer)
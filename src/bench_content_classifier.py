@@ -0,0 +1,119 @@
+"""
+Stage 1 Classifier Micro-Benchmark
+Purpose: Compare StatementClassifier against the C-series normalize_content_v2
+
+The reference function below is copied from test_c_v5 (those scripts load
+the model at import time, so it cannot be imported). LEGACY_CLASSIFIER
+output is checked for an exact match before timings are reported. The
+default classifier segments with segmenter.py and is timed alongside; its
+output differs by design where the legacy split shreds ranges and decimals.
+
+Usage:
+    python bench_content_classifier.py --repeats 400
+"""
+
+import argparse
+import re
+import time
+
+from content_classifier import DEFAULT_CLASSIFIER, LEGACY_CLASSIFIER
+from scenarios import CLINICAL_INPUTS
+
+
+def reference_normalize_content_v2(clinical_input):
+    """normalize_content_v2 as written in test_c_v5_improved_stage1_parser.py"""
+
+    sections = {
+        "medication": [],
+        "instructions": [],
+        "warnings": []
+    }
+
+    statements = re.split(r'[.\-]', clinical_input)
+
+    for statement in statements:
+        statement = statement.strip()
+        if not statement or len(statement) < 10:
+            continue
+
+        medication_indicators = [
+            r'\d+\s*mg',
+            r'tablet',
+            r'daily|BID|twice|TID|QID|q\d+',
+            r'take|continue|prescribed',
+            r'alcohol|NSAID'
+        ]
+
+        if any(re.search(pattern, statement, re.IGNORECASE) for pattern in medication_indicators):
+            sections["medication"].append(statement.strip())
+            continue
+
+        warning_indicators = [
+            r'call|contact|notify',
+            r'if\s+(you|pain|fever|symptoms?)',
+            r'signs? of',
+            r'emergency|urgent|severe|sudden',
+            r'report|monitor for'
+        ]
+
+        if any(re.search(pattern, statement, re.IGNORECASE) for pattern in warning_indicators):
+            sections["warnings"].append(statement.strip())
+            continue
+
+        sections["instructions"].append(statement.strip())
+
+    output = "**MEDICATION**\n"
+    if sections["medication"]:
+        output += " ".join(sections["medication"])
+    else:
+        output += "No specific medication instructions provided."
+
+    output += "\n\n**CARE INSTRUCTIONS**\n"
+    if sections["instructions"]:
+        output += " ".join(sections["instructions"])
+    else:
+        output += "Follow standard post-care guidelines as directed."
+
+    output += "\n\n**URGENT WARNING SIGNS**\n"
+    if sections["warnings"]:
+        output += " ".join(sections["warnings"])
+    else:
+        output += "Contact your provider if you have concerns about your recovery."
+
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled Stage 1 classifier")
+    parser.add_argument("--repeats", type=int, default=400)
+    args = parser.parse_args()
+
+    corpus = [f"Note {i}: {text}" for i in range(args.repeats) for text in CLINICAL_INPUTS.values()]
+    start = time.perf_counter()
+    reference = [reference_normalize_content_v2(note) for note in corpus]
+    reference_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = LEGACY_CLASSIFIER.normalize_many(corpus)
+    compiled_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    DEFAULT_CLASSIFIER.normalize_many(corpus)
+    range_safe_s = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(reference, compiled) if a != b)
+
+    print("=" * 70)
+    print(f"STAGE 1 CLASSIFIER BENCHMARK - {len(corpus)} notes")
+    print("=" * 70)
+    print(f"Output mismatches:        {mismatches}")
+    print(f"normalize_content_v2:     {reference_s:.3f}s")
+    print(f"Legacy split classifier:  {compiled_s:.3f}s")
+    print(f"Speedup:                  {reference_s / compiled_s:.1f}x")
+    print(f"Range-safe (default):     {range_safe_s:.3f}s")
+    print(f"Speedup:                  {reference_s / range_safe_s:.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Generation Benchmark
+Purpose: Measure latency, throughput and memory of the transform path
+
+Runs the five canonical CLINICAL_INPUTS scenarios through transform_batch
+for every dtype x batch size combination and reports p50/p95 batch
+latency, time to first token (prefill), decode tokens/s, overall tokens/s,
+and peak RSS / VRAM. Results are written as a JSON baseline; pass
+--compare with an earlier baseline to fail (exit 1) when any metric
+regresses beyond --tolerance.
+
+Usage:
+    python bench_generation.py --batch-sizes 1 5 --dtypes bfloat16 --output bench_baseline.json
+    python bench_generation.py --compare bench_baseline.json --tolerance 0.10
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+import torch
+
+from loop_guard import RepetitionLoopCriteria
+from prompts import D_SERIES_PROMPT
+from scenarios import CLINICAL_INPUTS
+from test_medgemma import load_model, transform_batch
+
+DTYPES = {
+    "bfloat16": torch.bfloat16,
+    "float16": torch.float16,
+    "float32": torch.float32,
+}
+
+# (metric, True if higher is better)
+COMPARED_METRICS = [
+    ("latency_p50_s", False),
+    ("latency_p95_s", False),
+    ("ttft_p50_s", False),
+    ("decode_tokens_per_s", True),
+    ("tokens_per_s", True),
+    ("peak_rss_mb", False),
+    ("peak_vram_mb", False),
+]
+
+
+class TimedLoopGuard(RepetitionLoopCriteria):
+    """
+    Loop guard that also timestamps every decode step.
+
+    transform_batch calls start_batch right before each generate call and
+    stopping criteria run after every generated token, so the first call
+    marks the end of prefill. The per-step ``tolist`` in the loop check
+    already synchronizes the GPU, so the timestamps are accurate.
+    """
+
+    def __init__(self, pad_token_id, **kwargs):
+        self.pad_token_id = pad_token_id
+        self.batches = []
+        super().__init__(**kwargs)
+
+    def start_batch(self, row_offset=0):
+        self._finish_batch()
+        super().start_batch(row_offset)
+        self.started = time.perf_counter()
+        self.step_times = []
+        self.last_input_ids = None
+
+    def _finish_batch(self):
+        """Record timing and generated token count of the previous generate call"""
+        if getattr(self, "last_input_ids", None) is None:
+            return
+        generated = self.last_input_ids[:, self.prompt_len:]
+        self.batches.append({
+            "rows": generated.shape[0],
+            "ttft_s": self.step_times[0] - self.started,
+            "decode_s": self.step_times[-1] - self.step_times[0],
+            "latency_s": self.step_times[-1] - self.started,
+            "steps": len(self.step_times),
+            "generated_tokens": int((generated != self.pad_token_id).sum()),
+        })
+        self.last_input_ids = None
+
+    def collect(self):
+        """Return and clear the per-batch measurements"""
+        self._finish_batch()
+        batches, self.batches = self.batches, []
+        return batches
+
+    def __call__(self, input_ids, scores, **kwargs):
+        is_done = super().__call__(input_ids, scores, **kwargs)
+        self.step_times.append(time.perf_counter())
+        self.last_input_ids = input_ids
+        return is_done
+
+
+def peak_rss_mb():
+    """
+    Process-wide RSS high-water mark (ru_maxrss is KB on Linux, bytes on
+    macOS). It cannot be reset, so later configs include earlier peaks.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_config(model, processor, notes, batch_size, max_new_tokens, repeats):
+    """Benchmark one batch size on an already-loaded model"""
+    tokenizer = getattr(processor, "tokenizer", processor)
+
+    def timed_batches():
+        # A fresh guard per call: a loop seen in one run must not cut the next run short
+        guard = TimedLoopGuard(tokenizer.pad_token_id)
+        transform_batch(model, processor, notes, D_SERIES_PROMPT, max_new_tokens, batch_size, loop_guard=guard)
+        return guard.collect()
+
+    # Warm-up pass: kernels, allocator and chat template caches
+    timed_batches()
+
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+    batches = []
+    wall_s = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        repeat_batches = timed_batches()
+        wall_s += time.perf_counter() - start
+        batches.extend(repeat_batches)
+
+    latencies = np.array([b["latency_s"] for b in batches])
+    ttfts = np.array([b["ttft_s"] for b in batches])
+    generated = sum(b["generated_tokens"] for b in batches)
+    decode_tokens = sum(b["generated_tokens"] - b["rows"] for b in batches)
+    decode_s = sum(b["decode_s"] for b in batches)
+
+    return {
+        "batch_size": batch_size,
+        "batches": len(batches),
+        "generated_tokens": generated,
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 4),
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 4),
+        "ttft_p50_s": round(float(np.percentile(ttfts, 50)), 4),
+        "ttft_p95_s": round(float(np.percentile(ttfts, 95)), 4),
+        "decode_tokens_per_s": round(decode_tokens / decode_s, 2) if decode_s else None,
+        "tokens_per_s": round(generated / wall_s, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_vram_mb": round(torch.cuda.max_memory_allocated() / 2**20, 1) if torch.cuda.is_available() else None,
+    }
+
+
+def print_results(results):
+    print("\n" + "=" * 70)
+    print("GENERATION BENCHMARK")
+    print("=" * 70)
+    print("dtype     | batch | p50 s   | p95 s   | TTFT p50 | decode tok/s | tok/s   | RSS MB  | VRAM MB")
+    print("-" * 70)
+    for r in results:
+        decode = f"{r['decode_tokens_per_s']:.1f}" if r["decode_tokens_per_s"] is not None else "-"
+        vram = f"{r['peak_vram_mb']:.0f}" if r["peak_vram_mb"] is not None else "-"
+        print(
+            f"{r['dtype']:<9} | {r['batch_size']:<5} | {r['latency_p50_s']:<7.3f} | {r['latency_p95_s']:<7.3f} | "
+            f"{r['ttft_p50_s']:<8.3f} | {decode:<12} | {r['tokens_per_s']:<7.1f} | {r['peak_rss_mb']:<7.0f} | {vram}"
+        )
+    print("=" * 70)
+
+
+def compare(results, baseline, tolerance):
+    """Print metric changes against a baseline; return the regressions"""
+    reference = {(r["dtype"], r["batch_size"]): r for r in baseline["results"]}
+    regressions = []
+
+    print("\n" + "=" * 70)
+    print(f"COMPARISON WITH BASELINE (tolerance {tolerance:.0%})")
+    print("=" * 70)
+    for r in results:
+        base = reference.get((r["dtype"], r["batch_size"]))
+        if base is None:
+            print(f"⚠ {r['dtype']} batch {r['batch_size']}: not in baseline")
+            continue
+
+        for metric, higher_is_better in COMPARED_METRICS:
+            if r.get(metric) is None or not base.get(metric):
+                continue
+            change = (r[metric] - base[metric]) / base[metric]
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            marker = "✗" if regressed else "✓"
+            print(
+                f"{marker} {r['dtype']:<9} batch {r['batch_size']:<3} {metric:<20} "
+                f"{base[metric]:>10.3f} -> {r[metric]:>10.3f} ({change:+.1%})"
+            )
+            if regressed:
+                regressions.append((r["dtype"], r["batch_size"], metric))
+    print("=" * 70)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latency, throughput and memory of transform_batch")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, len(CLINICAL_INPUTS)])
+    parser.add_argument("--dtypes", nargs="+", choices=list(DTYPES), default=["bfloat16"])
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="bench_generation.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before failing")
+    args = parser.parse_args()
+
+    # Read the baseline up front: --output may overwrite it, and a missing
+    # file should fail before the benchmark rather than after
+    baseline = None
+    if args.compare:
+        if os.path.realpath(args.compare) == os.path.realpath(args.output):
+            parser.error("--compare and --output are the same file; the run would compare against itself")
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    notes = list(CLINICAL_INPUTS.values())
+    results = []
+    model_id = None
+
+    for dtype_name in args.dtypes:
+        model, processor = load_model(use_server=False, dtype=DTYPES[dtype_name])
+        model_id = model.name_or_path
+        for batch_size in args.batch_sizes:
+            print(f"\nBenchmarking {dtype_name}, batch size {batch_size}...")
+            result = run_config(model, processor, notes, batch_size, args.max_new_tokens, args.repeats)
+            results.append({"dtype": dtype_name, **result})
+
+        del model, processor
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    print_results(results)
+
+    report = {
+        "meta": {
+            "model": model_id,
+            "device": torch.cuda.get_device_name() if torch.cuda.is_available() else platform.processor() or "cpu",
+            "torch": torch.__version__,
+            "scenarios": list(CLINICAL_INPUTS),
+            "max_new_tokens": args.max_new_tokens,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"✗ {len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
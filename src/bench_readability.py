@@ -0,0 +1,88 @@
+"""
+Readability Benchmark
+Purpose: Compare readability.readability_batch against per-call textstat
+
+Builds a corpus of distinct discharge-style texts (so textstat's per-text
+cache cannot help), scores it both ways, and reports the largest metric
+difference and the speedup.
+
+Usage:
+    python bench_readability.py --texts 2000
+"""
+
+import argparse
+import random
+import time
+
+import textstat
+
+from readability import METRICS, readability_batch
+from scenarios import CLINICAL_INPUTS
+
+PATIENT_SENTENCES = [
+    "Take one or two pills every six hours if you have pain.",
+    "Do not take more than eight pills in one day.",
+    "Do not drink alcohol while you take this medicine.",
+    "Keep the cut on your hip clean and dry.",
+    "Walk with your walker until your therapist says you can use a cane.",
+    "Weigh yourself every morning at the same time.",
+    "Call your doctor right away if you have chest pain.",
+    "Change the bandage on your wound every day.",
+    "Check your feet every day for sores or color changes.",
+    "Don't lift anything heavier than ten pounds for two weeks.",
+]
+
+
+def build_corpus(size, seed=42):
+    """Distinct texts mixing clinical inputs and patient-level sentences"""
+    rng = random.Random(seed)
+    clinical = [sentence for text in CLINICAL_INPUTS.values() for sentence in text.split(". ")]
+    pool = clinical + PATIENT_SENTENCES
+
+    corpus = []
+    for i in range(size):
+        sentences = rng.sample(pool, rng.randint(3, 10))
+        corpus.append(f"Note {i}. " + " ".join(s if s.endswith(".") else s + "." for s in sentences))
+    return corpus
+
+
+def score_with_textstat(texts):
+    return {metric: [getattr(textstat, metric)(text) for text in texts] for metric in METRICS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch readability against textstat")
+    parser.add_argument("--texts", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.texts)
+
+    # Warm up dictionary loading on both sides so only scoring is timed
+    score_with_textstat(build_corpus(5, seed=0))
+    readability_batch(build_corpus(5, seed=0))
+
+    start = time.perf_counter()
+    reference = score_with_textstat(corpus)
+    textstat_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = readability_batch(corpus)
+    batch_s = time.perf_counter() - start
+
+    print("=" * 70)
+    print(f"READABILITY BENCHMARK - {len(corpus)} texts")
+    print("=" * 70)
+    print("Metric                       | Max Abs Diff")
+    print("-" * 70)
+    for metric in METRICS:
+        diff = max(abs(a - b) for a, b in zip(reference[metric], batch[metric]))
+        print(f"{metric:<28} | {diff:.4f}")
+    print("-" * 70)
+    print(f"textstat (per call):  {textstat_s:.3f}s")
+    print(f"readability_batch:    {batch_s:.3f}s")
+    print(f"Speedup:              {textstat_s / batch_s:.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Shared Clinical Text Patterns
+Purpose: Compiled regexes used by the density router and decomposition stage
+"""
+
+import re
+
+# "Rivaroxaban 10mg", "carvedilol 6.25mg", "Acetaminophen 500mg"
+DOSE_PATTERN = re.compile(
+    r"\b(?P<drug>[A-Za-z][A-Za-z\-]+)\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>mg|mcg|g|units?|mL)\b",
+    re.IGNORECASE,
+)
+
+# Words that precede a dose without naming a drug ("Do not exceed 4000mg")
+NON_DRUG_WORDS = {"exceed", "than", "to", "of", "max", "maximum", "up", "total", "additional", "over", "under"}
+
+# Self-monitoring and restriction items the patient has to track daily
+MONITORING_PATTERN = re.compile(
+    r"\bmonitor\b|\bdaily weights?\b|\bweigh\b|\bcheck\b|\binspection\b|\brestriction\b"
+    r"|\bsodium\b|\bblood (?:glucose|sugar|pressure)\b|\btrack\b",
+    re.IGNORECASE,
+)
+
+# Emergency / contact-your-doctor language
+WARNING_PATTERN = re.compile(
+    r"\bcall\b|\bcontact\b|\bnotify\b|\bseek\b|\bemergency\b|\bgo to the\b",
+    re.IGNORECASE,
+)
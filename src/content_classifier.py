@@ -0,0 +1,122 @@
+"""
+Compiled Stage 1 Content Classifier
+Purpose: Reusable, single-pass version of normalize_content_v2 from the C-series
+
+normalize_content_v2 rebuilds its indicator lists and calls re.search up to
+ten times per statement. StatementClassifier compiles every indicator into
+one alternation with named groups and classifies each statement in a single
+scan, producing the same MEDICATION / CARE INSTRUCTIONS / URGENT WARNING
+SIGNS structure.
+
+Statements are split with segmenter.py, which keeps "1-2 tablets",
+"80-130 mg/dL" and "6.25mg" in one statement where normalize_content_v2's
+split on every "." and "-" shreds them. LEGACY_CLASSIFIER keeps that split
+and reproduces normalize_content_v2 exactly, for comparing against the
+C-series results.
+"""
+
+import re
+
+from segmenter import DEFAULT_SEGMENTER
+
+# Same indicators as normalize_content_v2 in test_c_v1 - test_c_v5, written
+# in lowercase: statements are lowercased once instead of matching with
+# re.IGNORECASE, which disables the regex engine's literal prefix scans
+MEDICATION_PATTERNS = [
+    r'\d+\s*mg',           # "500mg", "40 mg"
+    r'tablet',
+    r'daily|bid|twice|tid|qid|q\d+',  # Frequencies
+    r'take|continue|prescribed',
+    r'alcohol|nsaid'       # Interactions
+]
+
+WARNING_PATTERNS = [
+    r'call|contact|notify',
+    r'if\s+(?:you|pain|fever|symptoms?)',
+    r'signs? of',
+    r'emergency|urgent|severe|sudden',
+    r'report|monitor for'
+]
+
+SECTION_FALLBACKS = {
+    "medication": "No specific medication instructions provided.",
+    "instructions": "Follow standard post-care guidelines as directed.",
+    "warnings": "Contact your provider if you have concerns about your recovery.",
+}
+
+
+class StatementClassifier:
+    """
+    Classifies discharge statements as medication, warnings or instructions.
+
+    Medication indicators take precedence over warning indicators anywhere
+    in the statement, matching normalize_content_v2. The fused pattern is
+    scanned once over the lowercased statement: the first medication hit
+    decides immediately, otherwise any warning hit seen along the way
+    decides. Custom patterns must be lowercase. Statements come from
+    ``segmenter`` (segmenter.Segmenter); None splits on every "." and "-"
+    like normalize_content_v2.
+    """
+
+    def __init__(
+        self, medication_patterns=MEDICATION_PATTERNS, warning_patterns=WARNING_PATTERNS, segmenter=DEFAULT_SEGMENTER
+    ):
+        self.pattern = re.compile(
+            "(?P<medication>" + "|".join(medication_patterns) + ")"
+            "|(?P<warnings>" + "|".join(warning_patterns) + ")"
+        )
+        self.splitter = re.compile(r'[.\-]')
+        self.segmenter = segmenter
+
+    def classify(self, statement):
+        """Return "medication", "warnings" or "instructions" for one statement"""
+        section = "instructions"
+        for match in self.pattern.finditer(statement.lower()):
+            if match.lastgroup == "medication":
+                return "medication"
+            section = "warnings"
+        return section
+
+    def statements(self, clinical_input):
+        """Split clinical text into candidate statements (skipping short fragments)"""
+        if self.segmenter is not None:
+            fragments = self.segmenter.segments(clinical_input)
+        else:
+            fragments = self.splitter.split(clinical_input)
+        for statement in fragments:
+            statement = statement.strip()
+            if len(statement) >= 10:
+                yield statement
+
+    def sections(self, clinical_input):
+        """Group the statements of one note by section"""
+        sections = {"medication": [], "instructions": [], "warnings": []}
+        for statement in self.statements(clinical_input):
+            sections[self.classify(statement)].append(statement)
+        return sections
+
+    def normalize(self, clinical_input):
+        """Structured Stage 1 output in normalize_content_v2's format"""
+        sections = self.sections(clinical_input)
+
+        def body(name):
+            return " ".join(sections[name]) if sections[name] else SECTION_FALLBACKS[name]
+
+        return (
+            "**MEDICATION**\n" + body("medication") +
+            "\n\n**CARE INSTRUCTIONS**\n" + body("instructions") +
+            "\n\n**URGENT WARNING SIGNS**\n" + body("warnings")
+        )
+
+    def normalize_many(self, clinical_inputs):
+        """Normalize a corpus of notes with the same compiled classifier"""
+        return [self.normalize(clinical_input) for clinical_input in clinical_inputs]
+
+
+DEFAULT_CLASSIFIER = StatementClassifier()
+LEGACY_CLASSIFIER = StatementClassifier(segmenter=None)
+
+
+def normalize_content_v2(clinical_input):
+    """Drop-in replacement for the C-series normalize_content_v2, without shredding ranges"""
+    return DEFAULT_CLASSIFIER.normalize(clinical_input)
@@ -0,0 +1,170 @@
+"""
+Structured Decomposition for High-Density Notes
+Purpose: Transform complex notes (e.g. Heart Failure) in bounded time
+
+MedGemma loops on notes that combine several medications with daily
+self-monitoring. Each medication and each monitoring / care statement is
+small and well within the model's stable range on its own, so the note is
+split into single-fact chunks, all chunks are transformed in one padded
+batch with a small token limit, and the outputs are merged back into the
+D-series structure:
+
+**MEDICATION**
+**WHAT TO DO / WHAT NOT TO DO**
+**CALL DOCTOR RIGHT AWAY IF**
+"""
+
+import re
+
+from clinical_patterns import DOSE_PATTERN, MONITORING_PATTERN, NON_DRUG_WORDS, WARNING_PATTERN
+from loop_guard import RepetitionLoopCriteria
+from segmenter import DEFAULT_SEGMENTER
+from test_medgemma import transform_batch
+
+# "Congestive heart failure discharge:" / "Post-operative ... discharge protocol:"
+NOTE_HEADER = re.compile(r"^[^:.\n]{0,80}\bdischarge(?: protocol)?:\s*", re.IGNORECASE)
+CLAUSE_SPLIT = re.compile(r",\s*|;\s*|\s+and\s+")
+LEADING_VERB = re.compile(r"^(continue|take|start|resume|stop)\s+", re.IGNORECASE)
+OUTPUT_BULLET = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s*")
+OUTPUT_HEADER = re.compile(r"^\s*\*\*[^*]+\*\*\s*$")
+
+CHUNK_PROMPTS = {
+    "medication": """Rewrite this one medication instruction for a patient.
+
+RULES:
+- Write 1-2 short sentences using everyday words
+- Keep the medicine name, dose, and timing exactly as written
+- Do NOT add side effects, warnings, or other medicines
+- Do NOT add headings or lists""",
+    "care": """Rewrite this one self-care instruction for a patient.
+
+RULES:
+- Write 1-2 short sentences using everyday words
+- Keep every number and unit exactly as written
+- Do NOT add new instructions, warnings, or symptoms
+- Do NOT add headings or lists""",
+    "warning": """Rewrite these warning signs for a patient.
+
+RULES:
+- Put each warning sign on its own line starting with "- "
+- Use everyday words a patient can see or feel
+- Use ONLY the signs listed; do NOT add new ones
+- Do NOT add headings""",
+}
+
+SECTION_FOR_KIND = {
+    "medication": "**MEDICATION**",
+    "care": "**WHAT TO DO / WHAT NOT TO DO**",
+    "warning": "**CALL DOCTOR RIGHT AWAY IF**",
+}
+
+# Single-fact chunks need a sentence or two; this bounds the worst case
+CHUNK_MAX_NEW_TOKENS = 120
+
+
+def _medication_clauses(statement):
+    """Split a statement naming several dosed drugs into one clause per drug"""
+    clauses = [clause.strip(" .") for clause in CLAUSE_SPLIT.split(statement) if clause.strip(" .")]
+
+    verb_match = LEADING_VERB.match(clauses[0]) if clauses else None
+    verb = verb_match.group(1).capitalize() if verb_match else None
+
+    result = []
+    for clause in clauses:
+        dose = DOSE_PATTERN.search(clause)
+        if dose and dose.group("drug").lower() not in NON_DRUG_WORDS:
+            if verb and not LEADING_VERB.match(clause):
+                clause = f"{verb} {clause}"
+            result.append(clause + ".")
+        elif result:
+            # Frequency or instruction that belongs to the previous drug
+            result[-1] = result[-1].rstrip(".") + f", {clause}."
+
+    return result
+
+
+def decompose_note(clinical_text):
+    """
+    Split a note into single-fact chunks.
+
+    Returns a list of {"kind", "text"} dicts in note order, where kind is
+    "medication", "care" or "warning".
+    """
+    chunks = []
+    # The segmenter drops list bullets and keeps ranges ("2-3 lbs") in one chunk
+    for statement in DEFAULT_SEGMENTER.segments(clinical_text):
+        statement = NOTE_HEADER.sub("", statement)
+        if not statement:
+            continue
+
+        doses = [m for m in DOSE_PATTERN.finditer(statement) if m.group("drug").lower() not in NON_DRUG_WORDS]
+        if len(doses) > 1:
+            chunks.extend({"kind": "medication", "text": clause} for clause in _medication_clauses(statement))
+        elif doses:
+            chunks.append({"kind": "medication", "text": statement})
+        elif WARNING_PATTERN.search(statement) and not MONITORING_PATTERN.search(statement):
+            chunks.append({"kind": "warning", "text": statement})
+        else:
+            chunks.append({"kind": "care", "text": statement})
+
+    return chunks
+
+
+def _clean_chunk_output(kind, output):
+    """Strip headings and bullets the model adds; one item per line for warnings"""
+    lines = [OUTPUT_BULLET.sub("", line).strip() for line in output.splitlines()]
+    lines = [line for line in lines if line and not OUTPUT_HEADER.match(line)]
+    if kind == "warning":
+        return lines
+    return [" ".join(lines)] if lines else []
+
+
+def merge_chunks(chunks):
+    """Deterministically assemble transformed chunks into the D-series sections"""
+    sections = {kind: [] for kind in SECTION_FOR_KIND}
+    for chunk in chunks:
+        for item in _clean_chunk_output(chunk["kind"], chunk["output"]):
+            if item not in sections[chunk["kind"]]:
+                sections[chunk["kind"]].append(item)
+
+    return "\n\n".join(
+        SECTION_FOR_KIND[kind] + "\n" + "\n".join(f"- {item}" for item in items)
+        for kind, items in sections.items()
+        if items
+    )
+
+
+def transform_decomposed(model, processor, notes, batch_size=16):
+    """
+    Decompose notes, transform every chunk of every note as one padded
+    batch, and merge each note back together.
+
+    A chunk that loops keeps its original text in the merged output and
+    marks the note ``needs_review``.
+    """
+    chunks_per_note = [decompose_note(note) for note in notes]
+    all_chunks = [chunk for chunks in chunks_per_note for chunk in chunks]
+
+    loop_guard = RepetitionLoopCriteria()
+    if all_chunks:
+        outputs = transform_batch(
+            model,
+            processor,
+            [chunk["text"] for chunk in all_chunks],
+            [CHUNK_PROMPTS[chunk["kind"]] for chunk in all_chunks],
+            max_new_tokens=CHUNK_MAX_NEW_TOKENS,
+            batch_size=batch_size,
+            loop_guard=loop_guard,
+        )
+        for index, (chunk, output) in enumerate(zip(all_chunks, outputs)):
+            chunk["looped"] = index in loop_guard.detections
+            chunk["output"] = chunk["text"] if chunk["looped"] else output
+
+    results = []
+    for chunks in chunks_per_note:
+        results.append({
+            "output": merge_chunks(chunks),
+            "chunks": chunks,
+            "needs_review": any(chunk["looped"] for chunk in chunks),
+        })
+    return results
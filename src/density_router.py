@@ -0,0 +1,117 @@
+"""
+Content Density Router
+Purpose: Pick a transformation strategy before spending GPU time on a note
+
+Content density decides how MedGemma behaves (see
+docs/discoveries-medgemma-behavioral-patterns.md):
+- Low (single medication): output inflates to 6.5-7.4 grade -> content expansion
+- Medium (2-3 steps): natural sentence flow at 4.5-5.5 grade -> direct D-series prompt
+- High (multiple medications + self-monitoring): over-compression or
+  repetition loops -> structured decomposition (decomposition.py), with
+  human review if any chunk still loops
+
+The profile is purely rule-based (compiled regexes), so routing costs
+microseconds per note.
+"""
+
+from clinical_patterns import DOSE_PATTERN, MONITORING_PATTERN, NON_DRUG_WORDS
+from decomposition import transform_decomposed
+from prompts import CONTENT_EXPANSION_PROMPT, D_SERIES_PROMPT
+from segmenter import DEFAULT_SEGMENTER
+from test_medgemma import transform_batch
+
+# Thresholds taken from the five documented scenarios
+HIGH_DENSITY_MEDICATIONS = 4
+LOOP_RISK_MEDICATIONS = 3
+LOOP_RISK_MONITORING = 2
+
+ROUTE_PROMPTS = {
+    "direct": D_SERIES_PROMPT,
+    "expand": CONTENT_EXPANSION_PROMPT,
+}
+
+
+def profile_density(clinical_text):
+    """Count medications, monitoring items and statements in one note"""
+    medications = []
+    for match in DOSE_PATTERN.finditer(clinical_text):
+        drug = match.group("drug").lower()
+        if drug not in NON_DRUG_WORDS and drug not in medications:
+            medications.append(drug)
+
+    monitoring = [match.group(0).lower() for match in MONITORING_PATTERN.finditer(clinical_text)]
+    statements = DEFAULT_SEGMENTER.segments(clinical_text)
+
+    if len(medications) >= HIGH_DENSITY_MEDICATIONS or (
+        len(medications) >= LOOP_RISK_MEDICATIONS and len(monitoring) >= LOOP_RISK_MONITORING
+    ):
+        density = "high"
+    elif len(medications) <= 1 and not monitoring:
+        density = "low"
+    else:
+        density = "medium"
+
+    return {
+        "medications": medications,
+        "medication_count": len(medications),
+        "monitoring_items": monitoring,
+        "monitoring_count": len(monitoring),
+        "statement_count": len(statements),
+        "density": density,
+    }
+
+
+def route_note(clinical_text):
+    """Decide how a note should be transformed, with the reason"""
+    profile = profile_density(clinical_text)
+
+    if profile["density"] == "high":
+        route = "decompose"
+        reason = (
+            f"{profile['medication_count']} medications with {profile['monitoring_count']} "
+            "monitoring items: documented repetition-loop boundary"
+        )
+    elif profile["density"] == "low":
+        route = "expand"
+        reason = "Single medication with no monitoring: output inflates without content expansion"
+    else:
+        route = "direct"
+        reason = "Medium density: D-series prompt performs in target range"
+
+    return {"route": route, "reason": reason, "profile": profile}
+
+
+def transform_routed(model, processor, notes, max_new_tokens=1000, batch_size=8):
+    """
+    Route every note, then batch-transform each generating route.
+
+    Returns one dict per note with its route, reason, profile and output.
+    High-density notes are decomposed and their chunks batched together;
+    ``needs_review`` is True when any chunk of such a note still looped.
+    """
+    results = []
+    for note in notes:
+        decision = route_note(note)
+        decision["output"] = None
+        decision["needs_review"] = False
+        results.append(decision)
+
+    decompose = [i for i, result in enumerate(results) if result["route"] == "decompose"]
+    if decompose:
+        decomposed = transform_decomposed(model, processor, [notes[i] for i in decompose], batch_size=batch_size)
+        for i, result in zip(decompose, decomposed):
+            results[i]["output"] = result["output"]
+            results[i]["needs_review"] = result["needs_review"]
+
+    for route, prompt in ROUTE_PROMPTS.items():
+        indices = [i for i, result in enumerate(results) if result["route"] == route]
+        if not indices:
+            continue
+
+        outputs = transform_batch(
+            model, processor, [notes[i] for i in indices], prompt, max_new_tokens=max_new_tokens, batch_size=batch_size
+        )
+        for i, output in zip(indices, outputs):
+            results[i]["output"] = output
+
+    return results
@@ -0,0 +1,278 @@
+"""
+Quantitative Fact Extractor
+Purpose: Reject outputs that lost or changed a dose, frequency, duration or threshold
+
+"Rivaroxaban 10mg PO daily x 35 days", "gain >2-3 lbs in 24hr" and
+"<2g daily" have to survive the rewrite exactly, however the wording
+changes ("10 mg once a day for 35 days", "more than 2 to 3 pounds in one
+day", "less than 2 grams a day"). One compiled pattern scans a text once
+and turns every quantitative fact into a typed tuple with normalized
+numbers and units:
+
+- Dose(low, high, unit): 500mg, 1-2 tablets, 1.5-2L, 80-130 mg/dL
+- Frequency(low_hours, high_hours, as_needed): daily, BID, q4-6h PRN
+- Duration(low_days, high_days): x 35 days, 2 weeks, in 24hr
+- Threshold(comparator, low, high, unit): >2-3 lbs, <2g, do not exceed 4000mg,
+  100.4 F or higher
+
+diff_facts compares the facts of a note and its output: a fact missing
+from the output, paired with an output fact of the same kind and unit,
+was altered; otherwise it was lost. Either rejects the output. Facts are
+compared as multisets, so a note with "10mg daily" for two drugs needs
+both in the output.
+
+Usage:
+    diff = diff_facts(clinical_text, output)
+    if diff["rejected"]:
+        print(describe_diff(diff))
+"""
+
+import re
+from collections import Counter, namedtuple
+
+Dose = namedtuple("Dose", ["low", "high", "unit"])
+Frequency = namedtuple("Frequency", ["low_hours", "high_hours", "as_needed"])
+Duration = namedtuple("Duration", ["low_days", "high_days"])
+Threshold = namedtuple("Threshold", ["comparator", "low", "high", "unit"])
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+# Surface unit -> canonical unit; longer spellings first so "mg/dL" wins over "mg"
+UNITS = {
+    "mg/dl": "mg/dL",
+    "milligrams": "mg", "milligram": "mg", "mg": "mg",
+    "micrograms": "mcg", "mcg": "mcg",
+    "grams": "g", "gram": "g", "gm": "g", "g": "g",
+    "milliliters": "mL", "ml": "mL",
+    "liters": "L", "liter": "L", "litres": "L", "l": "L",
+    "pounds": "lb", "pound": "lb", "lbs": "lb", "lb": "lb",
+    "tablets": "tablet", "tablet": "tablet", "tabs": "tablet", "tab": "tablet", "pills": "tablet", "pill": "tablet",
+    "capsules": "tablet", "capsule": "tablet", "caps": "tablet",
+    "units": "unit", "unit": "unit",
+    "degrees fahrenheit": "degrees", "degrees f": "degrees", "degrees": "degrees", "°f": "degrees", "°": "degrees",
+    "f": "degrees",
+}
+
+# Time unit -> days
+TIME_UNITS = {
+    "hours": 1 / 24, "hour": 1 / 24, "hrs": 1 / 24, "hr": 1 / 24, "h": 1 / 24,
+    "days": 1, "day": 1,
+    "weeks": 7, "week": 7, "wks": 7, "wk": 7,
+    "months": 30, "month": 30,
+}
+
+# Fixed schedules -> hours between doses
+SCHEDULES = [
+    (r"bid|b\.i\.d\.|twice\s+(?:a|per|each)\s+day|twice\s+daily|(?:2|two)\s+times\s+(?:a|per|each)\s+day", 12),
+    (r"tid|t\.i\.d\.|(?:3|three)\s+times\s+(?:a|per|each)\s+day", 8),
+    (r"qid|q\.i\.d\.|(?:4|four)\s+times\s+(?:a|per|each)\s+day", 6),
+    (r"weekly|once\s+(?:a|per|each)\s+week|every\s+week", 168),
+    (r"daily|qd|(?:once\s+)?(?:a|per|each|every)\s+day|once\s+daily|every\s+(?:morning|evening|night)", 24),
+]
+
+# "no heavy lifting >10 lbs", "do not lift more than 10 pounds": a negated
+# comparator is the opposite bound. Up to three words may sit between the
+# two, but not a conjunction, so "does not improve or lasts more than 3
+# days" keeps its plain ">"; punctuation ends the window as well
+_CLAUSE_BREAK = r"(?:and|or|but|if|when|unless|until|then|while|because)\b"
+_NEGATION = rf"(?:do\s+not|don't|never|not|no|avoid)\s+(?:(?!{_CLAUSE_BREAK})[\w-]+\s+){{0,3}}?"
+
+# Comparator phrases, negated ones before the plain ones
+COMPARATORS = [
+    (
+        rf"{_NEGATION}(?:>|more\s+than|greater\s+than|higher\s+than|heavier\s+than|longer\s+than|over|above|exceed)"
+        r"|up\s+to|max(?:imum)?(?:\s+of)?",
+        "<=",
+    ),
+    (rf"{_NEGATION}(?:<|less\s+than|fewer\s+than|lower\s+than|under|below)", ">="),
+    (r"≤|<=|=<", "<="),
+    (r"≥|>=|at\s+least", ">="),
+    (r">|more\s+than|greater\s+than|higher\s+than|heavier\s+than|over|above|beyond|longer\s+than|exceeds?", ">"),
+    (r"<|less\s+than|fewer\s+than|lower\s+than|under|below", "<"),
+]
+
+# "100.4 F or higher", "10 pounds or more": the comparator follows the value.
+# Notes write ">100.4F" where instructions say "or higher", so these are
+# read as the same strict bound. "in 24 hours or more than 5 pounds" is two
+# facts, so a following "than" rules the postfix reading out
+POSTFIX_ABOVE = r"or\s+(?:higher|more|above|greater|over|longer)"
+POSTFIX_BELOW = r"or\s+(?:lower|less|below|fewer|under|shorter)"
+
+_NUMBER = r"\d+(?:\.\d+)?|" + "|".join(NUMBER_WORDS)
+
+
+def _alternation(options):
+    return "|".join(sorted((re.escape(option) for option in options), key=len, reverse=True))
+
+
+def _range(name):
+    return rf"(?P<{name}_low>{_NUMBER})(?:\s*(?:-|–|to|or)\s*(?P<{name}_high>{_NUMBER}))?"
+
+
+_AS_NEEDED = r"(?P<{}>\s*,?\s*(?:prn|as\s+needed|if\s+needed|when\s+needed|if\s+you\s+need\s+it))?"
+_UNIT = rf"(?:{_alternation(UNITS)})(?![a-z])"
+_TIME = rf"(?:{_alternation(TIME_UNITS)})\b"
+
+FACT_PATTERN = re.compile(
+    "|".join(
+        [
+            # q6h, q4-6h, q 4-6 hours, every 4 to 6 hours
+            rf"(?P<interval>(?:\bq\s*{_range('q')}\s*(?:h|hrs?|hours?)\b"
+            rf"|\bevery\s+{_range('every')}\s+(?:hours?|hrs?)\b){_AS_NEEDED.format('interval_prn')})",
+        ]
+        + [
+            rf"(?P<schedule{index}>\b(?:{pattern})\b{_AS_NEEDED.format(f'schedule{index}_prn')})"
+            for index, (pattern, _) in enumerate(SCHEDULES)
+        ]
+        + [
+            r"(?P<prn>\b(?:prn|as\s+needed|if\s+needed|when\s+needed)\b)",
+            # >2-3 lbs, do not exceed 4000mg, more than 3 days
+            rf"(?P<threshold>(?P<comparator>{'|'.join(f'(?:{pattern})' for pattern, _ in COMPARATORS)})\s*"
+            rf"{_range('threshold')}\s*(?:(?P<threshold_time>{_TIME})|(?P<threshold_unit>{_UNIT})))",
+            rf"(?P<postfix>\b{_range('postfix')}\s*(?:(?P<postfix_time>{_TIME})|(?P<postfix_unit>{_UNIT}))"
+            rf"\s+(?:(?P<postfix_above>{POSTFIX_ABOVE})|{POSTFIX_BELOW})\b(?!\s+than\b))",
+            rf"(?P<duration>\b{_range('duration')}\s*(?P<duration_unit>{_TIME}))",
+            # "in a day", "in week": a one-unit window without a number
+            r"(?P<window>\b(?:in|within)\s+(?:(?:a|an|one)\s+)?(?P<window_unit>hour|day|week|month)\b)",
+            rf"(?P<dose>\b{_range('dose')}\s*(?P<dose_unit>{_UNIT}))",
+        ]
+    ),
+    re.IGNORECASE,
+)
+
+_COMPARATOR_PATTERNS = [(re.compile(rf"(?:{pattern})$", re.IGNORECASE), symbol) for pattern, symbol in COMPARATORS]
+
+
+def _number(text):
+    text = text.lower()
+    return float(NUMBER_WORDS[text]) if text in NUMBER_WORDS else float(text)
+
+
+def _bounds(match, name, scale=1.0):
+    low = _number(match.group(f"{name}_low"))
+    high = match.group(f"{name}_high")
+    high = _number(high) if high else low
+    return round(low * scale, 4), round(high * scale, 4)
+
+
+def _unit(text):
+    return UNITS[re.sub(r"\s+", " ", text.lower())]
+
+
+def _comparator(text):
+    text = re.sub(r"\s+", " ", text.strip())
+    for pattern, symbol in _COMPARATOR_PATTERNS:
+        if pattern.match(text):
+            return symbol
+    return ">"
+
+
+def _to_fact(match):
+    kind = match.lastgroup
+    if kind == "interval":
+        name = "q" if match.group("q_low") else "every"
+        return Frequency(*_bounds(match, name), bool(match.group("interval_prn")))
+    if kind.startswith("schedule"):
+        hours = SCHEDULES[int(kind[len("schedule"):])][1]
+        return Frequency(hours, hours, bool(match.group(f"{kind}_prn")))
+    if kind == "prn":
+        return Frequency(None, None, True)
+    if kind in ("threshold", "postfix"):
+        if kind == "threshold":
+            comparator = _comparator(match.group("comparator"))
+        else:
+            comparator = ">" if match.group("postfix_above") else "<"
+        if match.group(f"{kind}_time"):
+            scale = TIME_UNITS[match.group(f"{kind}_time").lower()]
+            return Threshold(comparator, *_bounds(match, kind, scale), "days")
+        return Threshold(comparator, *_bounds(match, kind), _unit(match.group(f"{kind}_unit")))
+    if kind == "window":
+        days = TIME_UNITS[match.group("window_unit").lower()]
+        return Duration(round(days, 4), round(days, 4))
+    if kind == "duration":
+        return Duration(*_bounds(match, "duration", TIME_UNITS[match.group("duration_unit").lower()]))
+    return Dose(*_bounds(match, "dose"), _unit(match.group("dose_unit")))
+
+
+def extract_facts(text):
+    """Every quantitative fact in text, as typed tuples in order of appearance"""
+    return [_to_fact(match) for match in FACT_PATTERN.finditer(text)]
+
+
+def _pairing_key(fact):
+    """Facts with the same key are the same kind of statement with possibly different numbers"""
+    if isinstance(fact, Frequency):
+        return Frequency, fact.as_needed
+    if isinstance(fact, Duration):
+        return Duration, None
+    return type(fact), fact.unit
+
+
+def diff_facts(source, output):
+    """
+    Structured diff of the quantitative facts in source and output.
+
+    ``missing`` facts are in the source only, ``altered`` pairs a source
+    fact with the output fact of the same kind and unit that replaced it,
+    and ``added`` facts are in the output only. ``rejected`` is True when
+    anything was missing or altered. A fact stated n times in the source
+    has to appear n times in the output.
+    """
+    source_facts = Counter(extract_facts(source))
+    output_facts = Counter(extract_facts(output))
+    missing = list((source_facts - output_facts).elements())
+    added = list((output_facts - source_facts).elements())
+
+    altered = []
+    for fact in list(missing):
+        for candidate in added:
+            if _pairing_key(candidate) == _pairing_key(fact):
+                altered.append((fact, candidate))
+                missing.remove(fact)
+                added.remove(candidate)
+                break
+
+    return {
+        "missing": missing,
+        "altered": altered,
+        "added": added,
+        "preserved": list((source_facts & output_facts).elements()),
+        "rejected": bool(missing or altered),
+    }
+
+
+def format_fact(fact):
+    """Readable form of one fact, e.g. "q4-6h PRN" or "> 2-3 lb" """
+
+    def span(low, high):
+        low, high = (f"{value:g}" for value in (low, high))
+        return low if low == high else f"{low}-{high}"
+
+    if isinstance(fact, Dose):
+        return f"{span(fact.low, fact.high)} {fact.unit}"
+    if isinstance(fact, Frequency):
+        interval = f"q{span(fact.low_hours, fact.high_hours)}h" if fact.low_hours is not None else ""
+        return " ".join(part for part in (interval, "PRN" if fact.as_needed else "") if part)
+    if isinstance(fact, Duration):
+        return f"{span(fact.low_days, fact.high_days)} days"
+    return f"{fact.comparator} {span(fact.low, fact.high)} {fact.unit}"
+
+
+def list_changes(diff):
+    """Missing, altered and added facts as short strings, for records and reports"""
+    return (
+        [f"missing: {format_fact(fact)}" for fact in diff["missing"]]
+        + [f"altered: {format_fact(old)} -> {format_fact(new)}" for old, new in diff["altered"]]
+        + [f"added: {format_fact(fact)}" for fact in diff["added"]]
+    )
+
+
+def describe_diff(diff):
+    """Format a fact diff for console output"""
+    if not diff["rejected"] and not diff["added"]:
+        return f"✓ All {len(diff['preserved'])} quantitative facts preserved"
+    header = f"{'✗ Rejected' if diff['rejected'] else '⚠ Review'}: quantitative facts changed"
+    return "\n".join([header] + [f"  {change}" for change in list_changes(diff)])
@@ -0,0 +1,211 @@
+"""
+Clinical Entity Extractor
+Purpose: Check that a transformation keeps the note's clinical facts and adds none
+
+The C-series hallucination check set-differences lowercased words against
+the Stage 1 output with a 15-word threshold, and D-v5 looks for six fixed
+phrases. Both flag rewording as hallucination and miss a dropped drug. This
+extractor maps every drug, condition, symptom, procedure and self-care
+term in LEXICON, clinical or lay ("edema" / "swelling", "dyspnea" /
+"short of breath"), to one canonical concept with a single Aho-Corasick
+pass (aho_corasick.py). Comparing the concepts of the input and the output
+gives the facts the output dropped and the ones it added.
+
+Synonyms must not be ordinary words ("red", "scale", "salt" in any
+sentence would count as a clinical fact), so the lexicon uses phrases
+such as "skin turns red" instead. Abbreviations are written in capitals
+in LEXICON and, as in jargon.py, only match in capitals ("PE" is
+pulmonary embolism, "pe" in "pet" or "PE class" is not).
+
+Usage:
+    python entity_extractor.py                 # fact check every stored run
+    diff = compare_entities(clinical_text, output)
+    diff["dropped"], diff["added"]
+"""
+
+import argparse
+import time
+
+from aho_corasick import AhoCorasick, leftmost_longest
+
+# canonical concept -> (type, lay and clinical synonyms); all-capital synonyms are case-sensitive
+LEXICON = {
+    # Medications
+    "acetaminophen": ("medication", ["tylenol", "paracetamol"]),
+    "rivaroxaban": ("medication", ["xarelto"]),
+    "oxycodone": ("medication", ["oxycontin", "opioid pain medicine"]),
+    "metformin": ("medication", ["glucophage"]),
+    "furosemide": ("medication", ["lasix", "water pill", "water pills"]),
+    "carvedilol": ("medication", ["coreg"]),
+    "lisinopril": ("medication", ["zestril", "prinivil"]),
+    "nsaids": ("medication", [
+        "nsaid", "ibuprofen", "naproxen", "advil", "motrin", "aleve", "aspirin",
+        "anti-inflammatory", "anti-inflammatories", "anti-inflammatory medicines",
+    ]),
+    "anticoagulant": ("medication", ["anticoagulation", "blood thinner", "blood thinners", "blood-thinning medicine"]),
+    "antibiotic ointment": ("medication", ["antibiotic cream", "germ-killing cream"]),
+    "insulin": ("medication", []),
+    "normal saline": ("medication", ["saline", "salt water", "saltwater"]),
+    # Conditions
+    "deep vein thrombosis": ("condition", ["DVT", "blood clot", "blood clots", "clot in your leg", "clots in your legs"]),
+    "pulmonary embolism": ("condition", ["PE", "clot in your lung", "clot in your lungs", "blood clot in the lungs"]),
+    "infection": ("condition", ["infected", "infections"]),
+    "diabetes": ("condition", ["diabetic", "type 2 diabetes", "high blood sugar disease"]),
+    "heart failure": ("condition", ["congestive heart failure", "CHF", "weak heart"]),
+    "hypoglycemia": ("condition", ["low blood sugar"]),
+    "hyperglycemia": ("condition", ["high blood sugar"]),
+    "ulcers": ("condition", ["ulcer", "sores", "open sores", "open sore"]),
+    "calluses": ("condition", ["callus", "thick skin", "hard skin"]),
+    "bleeding": ("condition", ["bleed", "bleeds", "bleeding risk"]),
+    # Symptoms
+    "fever": ("symptom", ["fevers", "high temperature", "running a temperature", "febrile"]),
+    "pain": ("symptom", ["hurts", "hurting", "aches", "ache", "painful"]),
+    "chest pain": ("symptom", ["chest hurts", "pain in your chest", "chest discomfort"]),
+    "dyspnea": ("symptom", [
+        "shortness of breath", "short of breath", "trouble breathing", "hard to breathe",
+        "difficulty breathing", "breathless", "out of breath",
+    ]),
+    "edema": ("symptom", ["swelling", "swollen", "swells", "fluid buildup"]),
+    "erythema": ("symptom", ["redness", "reddish", "red skin", "skin turns red", "turns red", "looks red"]),
+    "purulent drainage": ("symptom", ["pus", "purulent", "yellow or green drainage", "cloudy drainage"]),
+    "dehiscence": ("symptom", ["wound opens", "wound opening", "opens up", "splits open", "comes apart"]),
+    "warmth": ("symptom", ["increased warmth", "warm to the touch", "feels warm", "feels hot"]),
+    "weight gain": ("symptom", ["rapid weight gain", "gain weight", "gained weight", "weight goes up"]),
+    "color changes": ("symptom", ["color change", "changes in color", "skin color"]),
+    # Procedures and appointments
+    "hip arthroplasty": ("procedure", ["total hip arthroplasty", "hip replacement", "hip surgery", "new hip"]),
+    "suture removal": ("procedure", [
+        "stitches removed", "stitches out", "remove your stitches", "remove the stitches", "taking out stitches",
+        "take out your stitches",
+    ]),
+    "radiographic assessment": ("procedure", ["x-ray", "x-rays", "xray", "radiograph", "radiographs"]),
+    "physical therapy": ("procedure", ["physical therapist", "PT"]),
+    "follow-up": ("procedure", ["follow up", "follow-up visit", "follow-up appointment", "check-up", "checkup"]),
+    "orthopedic clinic": ("procedure", ["orthopedic", "orthopedics", "bone doctor", "bone and joint doctor"]),
+    "endocrinology": ("procedure", ["endocrinologist", "diabetes doctor", "hormone doctor"]),
+    # Self-care and monitoring
+    "hip precautions": ("care", ["hip rules", "protect your hip", "protect your new hip"]),
+    "walker": ("care", []),
+    "cane": ("care", []),
+    "dressing change": ("care", ["change dressing", "change the dressing", "change your dressing", "change your bandage", "new bandage"]),
+    "blood glucose monitoring": ("care", [
+        "blood glucose", "blood sugar", "check your sugar", "check your blood sugar", "glucose",
+    ]),
+    "foot inspection": ("care", ["check your feet", "look at your feet", "foot check", "foot inspection"]),
+    "daily weights": ("care", ["daily weight", "weigh yourself", "weigh every day", "weigh each day", "bathroom scale"]),
+    "fluid restriction": ("care", ["limit fluids", "drink less", "limit how much you drink", "fluid limit"]),
+    "low sodium diet": ("care", ["low sodium", "sodium", "low salt", "less salt", "salt intake"]),
+    "carbohydrate counting": ("care", ["count carbs", "counting carbs", "carbohydrates", "carbs"]),
+    "alcohol": ("care", ["alcoholic drinks", "drink alcohol", "beer", "wine", "liquor"]),
+    "heavy lifting": ("care", ["lift heavy", "lifting heavy", "heavy things", "heavy objects"]),
+    "soaking": ("care", ["soak", "bath", "baths", "swimming", "hot tub"]),
+}
+
+
+def build_matcher(lexicon=LEXICON):
+    """
+    Aho-Corasick automata mapping every surface form to its canonical
+    concept: (case-insensitive terms, case-sensitive abbreviations)
+    """
+    terms, abbreviations = {}, {}
+    for concept, (_, synonyms) in lexicon.items():
+        for term in [concept] + list(synonyms):
+            (abbreviations if term.isupper() else terms).setdefault(term, concept)
+    return AhoCorasick(terms), AhoCorasick(abbreviations, ignore_case=False)
+
+
+class EntityExtractor:
+    """Canonical clinical concepts in text, from one compiled lexicon"""
+
+    def __init__(self, lexicon=LEXICON):
+        self.types = {concept: entity_type for concept, (entity_type, _) in lexicon.items()}
+        self.terms, self.abbreviations = build_matcher(lexicon)
+
+    def _matches(self, text):
+        """Non-overlapping (start, end, concept) over both automata"""
+        return leftmost_longest(list(self.terms.iter_all(text)) + list(self.abbreviations.iter_all(text)))
+
+    def mentions(self, text):
+        """(start, end, surface text, concept) for every mention"""
+        return [(start, end, text[start:end], concept) for start, end, concept in self._matches(text)]
+
+    def extract(self, text):
+        """Distinct concepts in order of first mention"""
+        return list(dict.fromkeys(concept for _, _, concept in self._matches(text)))
+
+    def compare(self, source, output):
+        """
+        Concepts the output kept, dropped and added relative to the source.
+
+        Each list holds canonical concepts; ``types`` maps every concept seen
+        to its LEXICON type.
+        """
+        source_concepts = self.extract(source)
+        output_concepts = self.extract(output)
+        output_set = set(output_concepts)
+        source_set = set(source_concepts)
+        return {
+            "preserved": [concept for concept in source_concepts if concept in output_set],
+            "dropped": [concept for concept in source_concepts if concept not in output_set],
+            "added": [concept for concept in output_concepts if concept not in source_set],
+            "types": {concept: self.types[concept] for concept in source_concepts + output_concepts},
+        }
+
+    def compare_many(self, pairs):
+        """compare() over (source, output) pairs with the same compiled matcher"""
+        return [self.compare(source, output) for source, output in pairs]
+
+
+DEFAULT_EXTRACTOR = EntityExtractor()
+
+
+def compare_entities(source, output):
+    """Dropped / added / preserved concepts using the default lexicon"""
+    return DEFAULT_EXTRACTOR.compare(source, output)
+
+
+def main():
+    from results_store import DEFAULT_STORE_DIR, ResultsStore
+    from scenarios import CLINICAL_INPUTS
+
+    parser = argparse.ArgumentParser(description="Fact-preservation check over stored transformation runs")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--prompt-version", help="Only check runs of this prompt version")
+    args = parser.parse_args()
+
+    equals = {"prompt_version": args.prompt_version} if args.prompt_version else {}
+    frame = ResultsStore(args.store).load(columns=["prompt", "prompt_version", "scenario", "output"], **equals)
+    frame = frame[frame["scenario"].isin(list(CLINICAL_INPUTS)) & frame["output"].notna()]
+    if frame.empty:
+        print(f"✗ No stored runs of the built-in scenarios in {args.store}")
+        return
+
+    start = time.perf_counter()
+    diffs = DEFAULT_EXTRACTOR.compare_many(zip(frame["scenario"].map(CLINICAL_INPUTS), frame["output"]))
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "=" * 70)
+    print("FACT PRESERVATION")
+    print("=" * 70)
+    print("Prompt           | Scenario       | Runs | Dropped/run | Added/run | Most dropped")
+    print("-" * 70)
+    frame = frame.assign(
+        dropped=[diff["dropped"] for diff in diffs],
+        added=[diff["added"] for diff in diffs],
+    )
+    for (prompt, scenario), group in frame.groupby(["prompt", "scenario"], observed=True):
+        counts = {}
+        for dropped in group["dropped"]:
+            for concept in dropped:
+                counts[concept] = counts.get(concept, 0) + 1
+        most = ", ".join(sorted(counts, key=counts.get, reverse=True)[:3]) or "-"
+        print(
+            f"{prompt:<16} | {scenario:<14} | {len(group):<4} | {group['dropped'].map(len).mean():<11.1f} | "
+            f"{group['added'].map(len).mean():<9.1f} | {most}"
+        )
+    print("=" * 70)
+    print(f"✓ Checked {len(frame)} outputs in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
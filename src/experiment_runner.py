@@ -0,0 +1,341 @@
+"""
+Experiment Runner
+Purpose: Run a prompt x scenario x generation-params matrix in one command
+
+Replaces the "change SCENARIO_NAME and BASELINE_GRADE, re-run" loop of the
+A-D test scripts. The model is loaded once, every cell that shares
+generation params is sent through transform_batch together, and each cell
+is written as one JSON line and to the Parquet results store
+(results_store.py) for cross-run queries.
+
+The output file doubles as a journal (sweep_journal.py): results are
+fsynced after every batch, and re-running the same command resumes from
+the last completed cell. Cells and records carry the model id and backend,
+so switching MEDGEMMA_BACKEND (or the server) never resumes another
+model's results. Pass --fresh to start over: it drops this run's cells for
+the current model from both the journal and the store.
+
+Generation goes through the persistent result cache (result_cache.py), so
+re-running a matrix only sends new (model, prompt, note, params)
+combinations to the GPU. Pass --no-cache to regenerate everything, e.g.
+after a change to the generation code.
+
+Usage:
+    python experiment_runner.py experiments/d_series_regression.json
+    python experiment_runner.py experiments/d_series_regression.json --fresh
+
+Matrix file (JSON, or YAML if PyYAML is installed):
+    {
+      "name": "d_series_regression",
+      "prompts": ["d_v5", {"name": "draft", "file": "draft_prompt.txt"}],
+      "scenarios": "all",
+      "generation": [{"max_new_tokens": 1000}],
+      "batch_size": 8,
+      "output": "results/d_series_regression.jsonl"
+    }
+
+Prompts are names from prompts.PROMPTS or {"name", "text" | "file"};
+scenarios are "all", names from scenarios.CLINICAL_INPUTS, or
+{"name", "input", "baseline"}. "max_new_tokens": "auto" gives every cell
+its own limit from the token budget planner (token_budget.py), and
+"preprocess": ["expand_abbreviations", "plain_language"] rewrites each
+note with those PREPROCESSORS stages, in order, before its prompt is
+built. Outputs are still scored against the original note.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from abbreviations import expand_abbreviations
+from dose_extractor import diff_facts, list_changes
+from entity_extractor import compare_entities
+from jargon import substitute_plain_language
+from loop_guard import RepetitionLoopCriteria
+from prompts import PROMPTS
+from prefix_cache import prompt_version
+from readability import flesch_kincaid_grades
+from result_cache import DEFAULT_CACHE_PATH, ResultCache, cached_transform_batch
+from results_store import DEFAULT_STORE_DIR, ResultsStore
+from scenarios import BASELINE_GRADES, CLINICAL_INPUTS
+from sweep_journal import SweepJournal, cell_key
+from token_budget import DEFAULT_PLAN_PATH, FEATURES_VERSION, TokenBudgetPlanner, note_features
+from test_medgemma import load_model, model_identity, transform_batch
+
+GENERATION_PARAMS = {"max_new_tokens", "preprocess"}
+
+# Deterministic note rewrites applied before the prompt is built, in order
+PREPROCESSORS = {
+    "expand_abbreviations": expand_abbreviations,
+    "plain_language": substitute_plain_language,
+}
+TARGET_RANGE = (4.5, 5.5)
+
+
+def load_matrix(path):
+    """Read a matrix file (JSON, or YAML when the extension says so)"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def resolve_prompts(entries, base_dir):
+    prompts = []
+    for entry in entries:
+        if isinstance(entry, str):
+            if entry not in PROMPTS:
+                raise ValueError(f"Unknown prompt '{entry}'. Available: {', '.join(PROMPTS)}")
+            prompts.append({"name": entry, "text": PROMPTS[entry]})
+        elif "file" in entry:
+            with open(os.path.join(base_dir, entry["file"]), encoding="utf-8") as f:
+                prompts.append({"name": entry["name"], "text": f.read()})
+        else:
+            prompts.append({"name": entry["name"], "text": entry["text"]})
+    return prompts
+
+
+def resolve_scenarios(entries):
+    if entries == "all":
+        entries = list(CLINICAL_INPUTS)
+
+    scenarios = []
+    for entry in entries:
+        if isinstance(entry, str):
+            if entry not in CLINICAL_INPUTS:
+                raise ValueError(f"Unknown scenario '{entry}'. Available: {', '.join(CLINICAL_INPUTS)}")
+            scenarios.append({"name": entry, "input": CLINICAL_INPUTS[entry], "baseline": BASELINE_GRADES[entry]})
+        else:
+            scenarios.append({"name": entry["name"], "input": entry["input"], "baseline": entry.get("baseline")})
+    return scenarios
+
+
+def build_cells(matrix, base_dir=".", identity=None):
+    """
+    Expand a matrix into one cell per (params, prompt, scenario) for the
+    model ``identity`` (model id, backend), by default the one load_model
+    would use.
+    """
+    model_id, backend = identity or model_identity()
+    prompts = resolve_prompts(matrix["prompts"], base_dir)
+    scenarios = resolve_scenarios(matrix.get("scenarios", "all"))
+
+    cells = []
+    for params in matrix.get("generation", [{"max_new_tokens": 1000}]):
+        unknown = set(params) - GENERATION_PARAMS
+        if unknown:
+            raise ValueError(f"Unsupported generation params: {', '.join(sorted(unknown))}")
+        stages = set(params.get("preprocess", [])) - set(PREPROCESSORS)
+        if stages:
+            raise ValueError(f"Unknown preprocess stages: {', '.join(sorted(stages))}. Available: {', '.join(PREPROCESSORS)}")
+
+        for prompt in prompts:
+            for scenario in scenarios:
+                cells.append({
+                    "key": cell_key(
+                        prompt_version(prompt["text"]), scenario["name"], scenario["input"], params, model_id, backend
+                    ),
+                    "model_id": model_id,
+                    "backend": backend,
+                    "params": params,
+                    "prompt": prompt,
+                    "scenario": scenario,
+                })
+    return cells
+
+
+def preprocess(clinical_text, stages):
+    """Apply the named PREPROCESSORS stages to one note"""
+    for stage in stages:
+        clinical_text = PREPROCESSORS[stage](clinical_text)
+    return clinical_text
+
+
+def count_tokens(processor, text):
+    """Token count under the model's tokenizer (None when using the server)"""
+    if processor is None:
+        return None
+    return len(processor.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def cell_record(
+    run_name,
+    cell,
+    output,
+    grade,
+    loop,
+    elapsed_s,
+    input_tokens=None,
+    input_statements=None,
+    output_tokens=None,
+    max_new_tokens=None,
+):
+    baseline = cell["scenario"]["baseline"]
+    entities = compare_entities(cell["scenario"]["input"], output)
+    facts = diff_facts(cell["scenario"]["input"], output)
+    return {
+        "cell_key": cell["key"],
+        "run": run_name,
+        "model_id": cell["model_id"],
+        "backend": cell["backend"],
+        "prompt": cell["prompt"]["name"],
+        "prompt_version": prompt_version(cell["prompt"]["text"]),
+        "scenario": cell["scenario"]["name"],
+        "params": cell["params"],
+        "baseline": baseline,
+        "grade": round(grade, 2),
+        "reduction": round(baseline - grade, 2) if baseline is not None else None,
+        "target_met": TARGET_RANGE[0] <= grade <= TARGET_RANGE[1],
+        "loop": loop,
+        "dropped_entities": entities["dropped"],
+        "added_entities": entities["added"],
+        "facts_rejected": facts["rejected"],
+        "fact_changes": list_changes(facts),
+        "output": output,
+        "input_tokens": input_tokens,
+        "input_statements": input_statements,
+        "features_version": FEATURES_VERSION,
+        "max_new_tokens": max_new_tokens,
+        "output_tokens": output_tokens,
+        "elapsed_s": round(elapsed_s, 3),
+    }
+
+
+def run_cells(model, processor, run_name, cells, batch_size=8, planner=None, cache=None):
+    """
+    Generate and score cells, batching every group that shares params.
+
+    With a ResultCache as ``cache``, only cells whose output is not cached
+    are generated. Yields the records of one batch at a time so callers can
+    persist them before the next batch starts.
+    """
+    planner = planner or TokenBudgetPlanner.load()
+
+    groups = {}
+    for cell in cells:
+        groups.setdefault(json.dumps(cell["params"], sort_keys=True), []).append(cell)
+
+    for params_key, group in groups.items():
+        params = json.loads(params_key)
+        print(f"\nRunning {len(group)} cells with {params}")
+
+        for start_index in range(0, len(group), batch_size):
+            batch = group[start_index:start_index + batch_size]
+
+            notes = [preprocess(cell["scenario"]["input"], params.get("preprocess", [])) for cell in batch]
+            prompts = [cell["prompt"]["text"] for cell in batch]
+            limits = params.get("max_new_tokens", 1000)
+            if limits == "auto":
+                limits = planner.budgets(notes, processor, prompts)
+            else:
+                limits = [limits] * len(batch)
+
+            loop_guard = RepetitionLoopCriteria()
+            start = time.perf_counter()
+            if cache is not None:
+                outputs = cached_transform_batch(
+                    cache, model, processor, notes, prompts, limits, batch_size=batch_size, loop_guard=loop_guard
+                )
+            else:
+                outputs = transform_batch(
+                    model,
+                    processor,
+                    notes,
+                    prompts,
+                    max_new_tokens=limits,
+                    batch_size=batch_size,
+                    loop_guard=loop_guard,
+                )
+            # Cells in a batch share one generate call, so report the per-cell average
+            elapsed_s = (time.perf_counter() - start) / len(batch)
+            grades = flesch_kincaid_grades(outputs)
+
+            yield [
+                cell_record(
+                    run_name,
+                    cell,
+                    output,
+                    float(grade),
+                    loop_guard.detections.get(index),
+                    elapsed_s,
+                    # Both features describe the preprocessed note the model was given
+                    input_tokens=count_tokens(processor, note),
+                    input_statements=note_features(note)[1],
+                    output_tokens=count_tokens(processor, output),
+                    max_new_tokens=limit,
+                )
+                for index, (cell, note, output, grade, limit) in enumerate(zip(batch, notes, outputs, grades, limits))
+            ]
+
+
+def print_summary(records):
+    print("\n" + "=" * 70)
+    print("EXPERIMENT SUMMARY")
+    print("=" * 70)
+    print("Prompt           | Scenario       | Baseline | Grade | Reduction | Target | Loop")
+    print("-" * 70)
+    for r in records:
+        baseline = f"{r['baseline']:.1f}" if r["baseline"] is not None else "-"
+        reduction = f"{r['reduction']:.1f}" if r["reduction"] is not None else "-"
+        print(
+            f"{r['prompt']:<16} | {r['scenario']:<14} | {baseline:<8} | {r['grade']:<5.1f} | "
+            f"{reduction:<9} | {'✓' if r['target_met'] else '✗':<6} | {'⚠' if r['loop'] else '-'}"
+        )
+    met = sum(1 for r in records if r["target_met"])
+    print("-" * 70)
+    print(f"Target met: {met}/{len(records)}")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a prompt x scenario experiment matrix")
+    parser.add_argument("matrix", help="Path to a JSON or YAML matrix file")
+    parser.add_argument("--output", help="JSON lines output path (overrides the matrix)")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR, help="Parquet results store directory")
+    parser.add_argument("--budget-plan", default=DEFAULT_PLAN_PATH, help="Calibrated token budget plan")
+    parser.add_argument("--fresh", action="store_true", help="Discard previous results instead of resuming")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Persistent transformation result cache")
+    parser.add_argument("--no-cache", action="store_true", help="Generate every cell even if its output is cached")
+    args = parser.parse_args()
+
+    matrix = load_matrix(args.matrix)
+    run_name = matrix.get("name", os.path.splitext(os.path.basename(args.matrix))[0])
+    output_path = args.output or matrix.get("output") or os.path.join("results", f"{run_name}.jsonl")
+    identity = model_identity()
+    cells = build_cells(matrix, os.path.dirname(os.path.abspath(args.matrix)), identity)
+
+    journal = SweepJournal(output_path)
+    store = ResultsStore(args.store)
+    if args.fresh:
+        journal.discard(cell["key"] for cell in cells)
+        model_id, backend = identity
+        removed = store.delete(run=run_name, model_id=model_id, backend=backend)
+        print(f"Discarded previous results for {model_id} ({backend}): {removed} stored rows")
+
+    pending = [cell for cell in cells if not journal.is_complete(cell["key"])]
+
+    print(f"Experiment '{run_name}': {len(cells)} cells, {len(cells) - len(pending)} already complete")
+
+    if pending:
+        model, processor = load_model()
+        if model_identity(model) != identity:
+            raise RuntimeError(f"Loaded model {model_identity(model)} does not match the planned cells {identity}")
+        planner = TokenBudgetPlanner.load(args.budget_plan)
+        cache = None if args.no_cache else ResultCache(args.cache)
+        for records in run_cells(model, processor, run_name, pending, matrix.get("batch_size", 8), planner, cache):
+            journal.append(records)
+            store.append(records)
+        if cache is not None:
+            stats = cache.stats()
+            print(f"✓ Result cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%})")
+            cache.close()
+    journal.close()
+
+    print_summary([journal.records[cell["key"]] for cell in cells])
+    print(f"\n✓ Results written to {output_path} and {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Jargon Detector and Plain-Language Substitution
+Purpose: Find medical terminology left in outputs, and replace it in inputs before generation
+
+Every prompt tells MedGemma "Do NOT use medical terminology", but outputs
+were only checked by grade level. JARGON maps each clinical term to a
+plain equivalent; an Aho-Corasick automaton (aho_corasick.py) over the
+whole table finds every term in one pass. Abbreviations only count in
+capitals ("PO" is jargon, "po" is not), so they get their own
+case-sensitive automaton over the abbreviations.py tables; their expansion
+depends on context and is left to that stage.
+
+Substituting the plain terms into the note before the prompt is built
+leaves the model less rewriting to do, so shorter outputs reach the
+target grade.
+
+Usage:
+    find_jargon(output)                  # ["erythema", "PRN"]
+    substitute_plain_language(note)      # "... signs of infection (redness, pus, wound opening)"
+"""
+
+import abbreviations
+from aho_corasick import AhoCorasick, leftmost_longest
+
+# Clinical term -> plain equivalent (longest match wins, so phrases can
+# override their parts)
+JARGON = {
+    "anticoagulation": "blood thinner",
+    "prophylactic anticoagulation": "blood thinner to prevent clots",
+    "prophylactic": "preventive",
+    "prophylaxis": "prevention",
+    "arthroplasty": "joint replacement",
+    "total hip arthroplasty": "hip replacement",
+    "post-operative": "after surgery",
+    "postoperative": "after surgery",
+    "post-surgical": "after surgery",
+    "adduction past midline": "crossing your legs",
+    "adduction": "moving your leg inward",
+    "abduction": "moving your leg outward",
+    "flexion": "bending",
+    "internal rotation": "turning your leg inward",
+    "weight-bearing": "putting weight on your leg",
+    "hepatotoxicity": "liver damage",
+    "hypoglycemia": "low blood sugar",
+    "hyperglycemia": "high blood sugar",
+    "hemoglobin a1c": "A1C blood sugar test",
+    "blood glucose": "blood sugar",
+    "diuretic": "water pill",
+    "dyspnea": "shortness of breath",
+    "edema": "swelling",
+    "orthopnea": "trouble breathing when lying down",
+    "erythema": "redness",
+    "purulent drainage": "pus",
+    "purulent": "pus-filled",
+    "dehiscence": "wound opening",
+    "debridement": "wound cleaning",
+    "subcutaneous": "under the skin",
+    "titrate": "adjust",
+    "contraindicated": "not safe",
+    "post-prandial": "after eating",
+    "postprandial": "after eating",
+    "radiographic assessment": "x-ray",
+    "cleanse": "wash",
+    "incision": "cut from surgery",
+    "suture removal": "taking out stitches",
+    "ambulate": "walk",
+    "orally": "by mouth",
+}
+
+# Everything the abbreviation stage expands, plus the interval forms it
+# rewrites by pattern
+ABBREVIATIONS = (
+    list(abbreviations.ABBREVIATIONS)
+    + list(abbreviations.AMBIGUOUS)
+    + [schedule.upper() for schedule in abbreviations.SCHEDULES]
+    + ["q4h", "q6h", "q8h", "q12h", "q4-6h"]
+)
+
+
+class JargonDetector:
+    """Compiled jargon and abbreviation automata with a substitution table"""
+
+    def __init__(self, jargon=JARGON, abbreviations=ABBREVIATIONS):
+        self.jargon = {term.lower(): plain for term, plain in jargon.items()}
+        self.terms = AhoCorasick(list(self.jargon))
+        self.abbreviations = AhoCorasick(abbreviations, ignore_case=False)
+
+    def matches(self, text):
+        """Non-overlapping (start, end, term) for every jargon term and abbreviation"""
+        return leftmost_longest(list(self.terms.iter_all(text)) + list(self.abbreviations.iter_all(text)))
+
+    def find(self, text):
+        """Distinct jargon in text as written, in order of first appearance"""
+        found = {}
+        for start, end, term in self.matches(text):
+            found.setdefault(term, text[start:end])
+        return list(found.values())
+
+    def substitute(self, text):
+        """Replace every jargon term that has a plain equivalent, keeping a leading capital"""
+        parts = []
+        position = 0
+        for start, end, term in self.terms.find(text):
+            plain = self.jargon[term]
+            if text[start].isupper():
+                plain = plain[0].upper() + plain[1:]
+            parts.append(text[position:start])
+            parts.append(plain)
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
+
+
+DEFAULT_DETECTOR = JargonDetector()
+
+
+def find_jargon(text):
+    """Distinct jargon terms and abbreviations in text, in order of first appearance"""
+    return DEFAULT_DETECTOR.find(text)
+
+
+def substitute_plain_language(text):
+    """Note with clinical terms swapped for plain equivalents"""
+    return DEFAULT_DETECTOR.substitute(text)
@@ -0,0 +1,95 @@
+"""
+Repetition Loop Guard
+Purpose: Stop MedGemma generation as soon as the output starts cycling
+
+The Heart Failure scenario loops "80+ times until token limit", which costs
+a full max_new_tokens decode for every looping note. This stopping criterion
+watches the tail of each generated row and halts that row once the same
+token cycle has repeated enough times, recording where the loop started.
+
+Each row feeds a RepetitionTracker (repetition.py) one token per decode
+step, so checking a row costs amortized O(1) per token instead of scanning
+every candidate period over the tail.
+"""
+
+import torch
+from transformers import StoppingCriteria
+
+from repetition import RepetitionTracker
+
+
+class RepetitionLoopCriteria(StoppingCriteria):
+    """
+    Per-row repeating cycle detector for model.generate.
+
+    A row is stopped when its most recent tokens consist of a cycle of
+    ``min_period``-``max_period`` tokens repeated at least ``min_repeats``
+    times, covering at least ``min_span`` tokens. Detections are stored in
+    ``self.detections`` keyed by row (plus ``row_offset``), each with the
+    loop ``period``, the generated-token ``offset`` where the cycle began,
+    the ``repeats`` observed, and the token count at which it ``stopped_at``.
+
+    A row already in ``detections`` is stopped at once, so detections must
+    not outlive the call that made them: transform_text, transform_batch
+    and stream_transform_text reset() the guard first, and its detections
+    describe the most recent call only.
+    """
+
+    def __init__(self, min_period=3, max_period=80, min_repeats=3, min_span=30):
+        self.min_period = min_period
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.min_span = min_span
+        self.reset()
+
+    def reset(self):
+        """Forget earlier detections before a new top-level transform call"""
+        self.detections = {}
+        self.start_batch()
+
+    def start_batch(self, row_offset=0):
+        """Prepare for a new generate call (one chunk of a call) whose rows start at row_offset"""
+        self.row_offset = row_offset
+        self.prompt_len = None
+        self._trackers = {}
+
+    def tracker(self):
+        """A RepetitionTracker with this guard's thresholds, for one sequence"""
+        return RepetitionTracker(self.min_period, self.max_period, self.min_repeats, self.min_span)
+
+    def find_cycle(self, tokens):
+        """Return (period, offset, repeats) for a cycle ending the sequence"""
+        return self.tracker().extend(tokens)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.prompt_len is None:
+            # First call happens after the first generated token
+            self.prompt_len = input_ids.shape[-1] - 1
+
+        is_done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+        for row in range(input_ids.shape[0]):
+            key = self.row_offset + row
+            if key in self.detections:
+                is_done[row] = True
+                continue
+
+            if row not in self._trackers:
+                self._trackers[row] = self.tracker()
+            tracker = self._trackers[row]
+            tracker.extend(input_ids[row, self.prompt_len + len(tracker):].tolist())
+
+            if tracker.loop is not None:
+                self.detections[key] = tracker.loop
+                is_done[row] = True
+
+        return is_done
+
+
+def describe_loop(detection):
+    """Format a loop detection for console output"""
+    return (
+        f"⚠ Repetition loop detected: {detection['period']}-token cycle "
+        f"starting at generated token {detection['offset']} "
+        f"(x{detection['repeats']}), stopped at {detection['stopped_at']} tokens"
+    )
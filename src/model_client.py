@@ -0,0 +1,88 @@
+"""
+MedGemma Server Client
+Purpose: Thin HTTP client for the long-lived model server in model_server.py
+
+The client has no torch or transformers dependency, so scripts that talk to
+a running server start instantly instead of reloading the 4B weights.
+Every request carries an X-Request-ID header (the caller's tracing request
+when there is one), so server spans and logs line up with the client's.
+"""
+
+import json
+import os
+import urllib.error
+import urllib.request
+import uuid
+
+import tracing
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+
+class MedGemmaClient:
+    """Client for a running model_server.py instance"""
+
+    def __init__(self, url=None, timeout=900):
+        self.url = (url or os.getenv("MEDGEMMA_SERVER_URL") or DEFAULT_SERVER_URL).rstrip("/")
+        self.timeout = timeout
+        self._info = None
+        self.last_request_id = None
+
+    @property
+    def info(self):
+        """/health of the server, fetched once: model id, backend and dtype do not change"""
+        if self._info is None:
+            self._info = self.health()
+        return self._info
+
+    @property
+    def model_id(self):
+        """Model id reported by the server (fetched once)"""
+        return self.info["model_id"]
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request_id = tracing.current_request_id() or uuid.uuid4().hex[:12]
+        request = urllib.request.Request(
+            self.url + path,
+            data=data,
+            headers={"Content-Type": "application/json", "X-Request-ID": request_id},
+            method="GET" if data is None else "POST",
+        )
+        self.last_request_id = request_id
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def health(self):
+        """Server status: model id, backend, dtype, device, uptime and request count"""
+        return self._request("/health")
+
+    def is_available(self):
+        """True if a server is listening and has its model loaded"""
+        try:
+            return self.health().get("status") == "ok"
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+
+    def transform(self, clinical_text, prompt_instructions, max_new_tokens=1000):
+        """Transform one note; returns the server's JSON response"""
+        return self._request(
+            "/transform",
+            {
+                "clinical_text": clinical_text,
+                "prompt_instructions": prompt_instructions,
+                "max_new_tokens": max_new_tokens,
+            },
+        )
+
+    def transform_batch(self, notes, prompt_instructions, max_new_tokens=1000, batch_size=8):
+        """Transform many notes (one prompt, or one prompt per note) on the server"""
+        return self._request(
+            "/transform_batch",
+            {
+                "notes": notes,
+                "prompt_instructions": prompt_instructions,
+                "max_new_tokens": max_new_tokens,
+                "batch_size": batch_size,
+            },
+        )
@@ -0,0 +1,281 @@
+"""
+MedGemma Model Server
+Purpose: Load MedGemma 1.5 4B once and serve transformations over localhost HTTP
+
+Usage:
+    python model_server.py --port 8765
+    python model_server.py --port 8765 --continuous --max-batch-tokens 16384
+    python model_server.py --port 8765 --no-prefix-cache --no-cache
+    MEDGEMMA_SERVER_URL=http://127.0.0.1:8765 python test_medgemma.py
+
+Endpoints:
+    GET  /health           model id, backend, dtype, device, uptime, request count
+    GET  /metrics          per-stage latency histograms (Prometheus text format)
+    GET  /trace            recent spans as a Chrome trace (chrome://tracing, Perfetto)
+    POST /transform        {"clinical_text", "prompt_instructions", "max_new_tokens"}
+    POST /transform_batch  {"notes", "prompt_instructions", "max_new_tokens", "batch_size"}
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+from loop_guard import RepetitionLoopCriteria
+from prefix_cache import PromptPrefixCache
+from result_cache import (
+    DEFAULT_CACHE_PATH,
+    ResultCache,
+    cached_transform_batch,
+    cached_transform_text,
+    is_cacheable,
+    transform_key,
+)
+from scheduler import ContinuousBatchScheduler
+from test_medgemma import load_model, model_identity, transform_batch, transform_text
+
+
+class ModelService:
+    """
+    Owns the model and processor.
+
+    Without a scheduler, requests are serialized behind a lock and
+    /transform reuses the prefilled prompt from ``prefix_cache`` when one is
+    given. With a ContinuousBatchScheduler, concurrent requests share the
+    running batch. With a ResultCache as ``cache``, notes whose output is
+    cached are answered without touching the model.
+    """
+
+    def __init__(self, model, processor, scheduler=None, prefix_cache=None, cache=None):
+        self.model = model
+        self.processor = processor
+        self.scheduler = scheduler
+        self.prefix_cache = prefix_cache
+        self.cache = cache
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def health(self):
+        model_id, backend = model_identity(self.model)
+        return {
+            "status": "ok",
+            "model_id": model_id,
+            "backend": backend,
+            "dtype": str(self.model.dtype),
+            "device": str(self.model.device),
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+        }
+
+    def transform(self, payload):
+        if self.scheduler is not None:
+            return self._schedule([payload["clinical_text"]], payload)[0]
+
+        loop_guard = RepetitionLoopCriteria()
+        start = time.perf_counter()
+
+        with self._lock:
+            self.requests += 1
+            args = (
+                self.model,
+                self.processor,
+                payload["clinical_text"],
+                payload["prompt_instructions"],
+                payload.get("max_new_tokens", 1000),
+            )
+            if self.cache is not None:
+                output = cached_transform_text(
+                    self.cache, *args, loop_guard=loop_guard, prefix_cache=self.prefix_cache
+                )
+            else:
+                output = transform_text(*args, loop_guard=loop_guard, prefix_cache=self.prefix_cache)
+
+        return {
+            "output": output,
+            "loop": loop_guard.detections.get(0),
+            "elapsed_s": round(time.perf_counter() - start, 3),
+        }
+
+    def transform_batch(self, payload):
+        if self.scheduler is not None:
+            results = self._schedule(payload["notes"], payload)
+            return {
+                "outputs": [result["output"] for result in results],
+                "loops": [result["loop"] for result in results],
+                "elapsed_s": max(result["elapsed_s"] for result in results) if results else 0.0,
+            }
+
+        loop_guard = RepetitionLoopCriteria()
+        start = time.perf_counter()
+
+        with self._lock:
+            self.requests += 1
+            args = (
+                self.model,
+                self.processor,
+                payload["notes"],
+                payload["prompt_instructions"],
+                payload.get("max_new_tokens", 1000),
+            )
+            batch_size = payload.get("batch_size", 8)
+            if self.cache is not None:
+                outputs = cached_transform_batch(self.cache, *args, batch_size=batch_size, loop_guard=loop_guard)
+            else:
+                outputs = transform_batch(*args, batch_size=batch_size, loop_guard=loop_guard)
+
+        return {
+            "outputs": outputs,
+            "loops": [loop_guard.detections.get(index) for index in range(len(outputs))],
+            "elapsed_s": round(time.perf_counter() - start, 3),
+        }
+
+    def _schedule(self, notes, payload):
+        with self._lock:
+            self.requests += 1
+
+        prompts = payload["prompt_instructions"]
+        if isinstance(prompts, str):
+            prompts = [prompts] * len(notes)
+
+        limits = payload.get("max_new_tokens", 1000)
+        if isinstance(limits, int):
+            limits = [limits] * len(notes)
+
+        keys = [None] * len(notes)
+        results = [None] * len(notes)
+        if self.cache is not None:
+            keys = [transform_key(self.model, *row) for row in zip(notes, prompts, limits)]
+            for index, key in enumerate(keys):
+                output = self.cache.get(key)
+                if output is not None:
+                    results[index] = {"output": output, "loop": None, "latency_s": 0.0}
+
+        # The decode loop runs on the scheduler thread, outside this request's
+        # context, so time its two ends here: tokenize + enqueue, then the wait
+        with tracing.span("schedule_submit", rows=len(notes)):
+            futures = {
+                index: self.scheduler.submit(note, prompt, limit)
+                for index, (note, prompt, limit) in enumerate(zip(notes, prompts, limits))
+                if results[index] is None
+            }
+        with tracing.span("schedule_wait", rows=len(futures)):
+            for index, future in futures.items():
+                results[index] = future.result()
+                if keys[index] is not None and is_cacheable(results[index]["output"], results[index]["loop"]):
+                    self.cache.put(keys[index], results[index]["output"])
+
+        return [
+            {
+                "output": result["output"],
+                "loop": result["loop"],
+                "elapsed_s": round(result["latency_s"], 3),
+            }
+            for result in results
+        ]
+
+
+def make_handler(service):
+    """Build a request handler class bound to one ModelService"""
+
+    class Handler(BaseHTTPRequestHandler):
+        routes = {
+            "/transform": service.transform,
+            "/transform_batch": service.transform_batch,
+        }
+
+        def _send(self, status, body, content_type="application/json", request_id=None):
+            data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            if request_id is not None:
+                self.send_header("X-Request-ID", request_id)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, service.health())
+            elif self.path == "/metrics":
+                self._send(200, tracing.TRACER.prometheus_text(), "text/plain; version=0.0.4")
+            elif self.path == "/trace":
+                self._send(200, tracing.TRACER.chrome_trace())
+            else:
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            route = self.routes.get(self.path)
+            if route is None:
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+                return
+
+            with tracing.request(self.headers.get("X-Request-ID")) as request_id:
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length).decode("utf-8"))
+                    self._send(200, route(payload), request_id=request_id)
+                except (KeyError, ValueError) as e:
+                    self._send(400, {"error": f"Bad request: {e}"}, request_id=request_id)
+                except Exception as e:
+                    # Without a response the client would only see a dropped connection
+                    print(f"✗ {self.path} failed ({request_id}): {e}")
+                    self._send(500, {"error": f"Generation failed: {e}"}, request_id=request_id)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve MedGemma transformations on localhost")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--continuous", action="store_true", help="Use iteration-level continuous batching")
+    parser.add_argument("--max-batch-tokens", type=int, default=16384)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument(
+        "--no-prefix-cache", action="store_true", help="Prefill the full prompt on every /transform request"
+    )
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Persistent transformation result cache")
+    parser.add_argument("--no-cache", action="store_true", help="Always generate, even if the output is cached")
+    args = parser.parse_args()
+
+    model, processor = load_model(use_server=False)
+
+    if args.continuous and not getattr(model, "supports_forward", True):
+        # Fail at startup instead of answering every request with a 500
+        parser.error(
+            f"--continuous needs a model with a forward pass; {model.name_or_path} only implements generate(). "
+            "Use MEDGEMMA_BACKEND=tiny, or drop --continuous."
+        )
+
+    scheduler = None
+    if args.continuous:
+        scheduler = ContinuousBatchScheduler(
+            model, processor, max_batch_tokens=args.max_batch_tokens, max_batch_size=args.max_batch_size
+        )
+        scheduler.start()
+        print(f"✓ Continuous batching enabled ({args.max_batch_tokens} token budget)")
+
+    prefix_cache = None if args.no_prefix_cache else PromptPrefixCache()
+    cache = None if args.no_cache else ResultCache(args.cache)
+    service = ModelService(model, processor, scheduler, prefix_cache, cache)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"✓ MedGemma server listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down MedGemma server")
+    finally:
+        server.server_close()
+        if scheduler is not None:
+            scheduler.stop()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Prompt Prefix KV Cache
+Purpose: Prefill the static transformation prompt once per prompt version
+
+TRANSFORMATION_PROMPT and UNIVERSAL_PATIENT_PROMPT are hundreds of tokens
+that are identical for every discharge note. This cache runs the chat
+template prefix (everything before the clinical text) through the model
+once, keeps its past_key_values, and hands a copy to each generate call so
+only the note-specific suffix is prefilled.
+
+It applies to the single-note paths (transform_text, stream_transform_text,
+the server's /transform without --continuous and the review app). Batches
+are left-padded, so the shared prefix starts at a different offset in each
+row and transform_batch prefills in full.
+"""
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+import torch
+from transformers import DynamicCache
+
+from test_medgemma import build_messages
+
+# Placeholder used to locate where the clinical text starts in the template
+CLINICAL_TEXT_SENTINEL = "\x00CLINICAL_TEXT\x00"
+
+
+def prompt_version(prompt_instructions):
+    """Short stable hash identifying a prompt version"""
+    return hashlib.sha256(prompt_instructions.encode("utf-8")).hexdigest()[:12]
+
+
+class PromptPrefixCache:
+    """
+    In-memory cache of prefilled prompt prefixes, one per (model, prompt).
+
+    Keeps at most ``max_prompts`` prefixes, evicting the least recently
+    used. ``hits`` and ``misses`` count prefix lookups. One cache can be
+    shared between threads (the review app's sessions).
+    """
+
+    def __init__(self, max_prompts=8):
+        self.max_prompts = max_prompts
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _prefix_text(self, processor, prompt_instructions):
+        """Render the chat template and cut it where the clinical text begins"""
+        rendered = processor.apply_chat_template(
+            build_messages(CLINICAL_TEXT_SENTINEL, prompt_instructions),
+            add_generation_prompt=True,
+            tokenize=False,
+        )
+        return rendered[:rendered.index(CLINICAL_TEXT_SENTINEL)]
+
+    def lookup(self, model, processor, prompt_instructions):
+        """Return the prefilled prefix entry, building it on first use"""
+        key = (getattr(model.config, "name_or_path", ""), prompt_version(prompt_instructions))
+
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        tokenizer = getattr(processor, "tokenizer", processor)
+        prefix_ids = tokenizer(
+            self._prefix_text(processor, prompt_instructions),
+            add_special_tokens=False,
+            return_tensors="pt",
+        )["input_ids"].to(model.device)
+
+        with torch.inference_mode():
+            past_key_values = model(
+                input_ids=prefix_ids,
+                past_key_values=DynamicCache(),
+                use_cache=True,
+            ).past_key_values
+
+        entry = {"input_ids": prefix_ids, "past_key_values": past_key_values}
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_prompts:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def past_for(self, model, processor, input_ids, prompt_instructions):
+        """
+        Return a private copy of the cached prefix for one tokenized request.
+
+        The copy is cropped to the tokens the request actually shares with
+        the cached prefix, so a tokenizer merge across the prefix boundary
+        only costs the few tokens that differ. Returns None when nothing
+        can be reused, or when the model has no forward pass (the stub
+        backend).
+        """
+        if not getattr(model, "supports_forward", True):
+            return None
+
+        entry = self.lookup(model, processor, prompt_instructions)
+        prefix_ids = entry["input_ids"][0]
+        request_ids = input_ids[0]
+
+        # Always leave at least one token for generate to prefill
+        limit = min(prefix_ids.shape[-1], request_ids.shape[-1] - 1)
+        mismatch = (prefix_ids[:limit] != request_ids[:limit]).nonzero()
+        shared = int(mismatch[0]) if len(mismatch) else limit
+
+        if shared == 0:
+            return None
+
+        past_key_values = copy.deepcopy(entry["past_key_values"])
+        if shared < past_key_values.get_seq_length():
+            past_key_values.crop(shared)
+
+        return past_key_values
@@ -0,0 +1,121 @@
+"""
+Prompt Versions
+Purpose: Named transformation prompts shared by the routing and sweep tools
+
+The test scripts define their prompts inline and load the model at import
+time, so the prompt text is kept here verbatim for reuse.
+"""
+
+# A-v6: Stabilized reading-level prompt (test_a_v6_readig_level_optimization.py)
+A_V6_PROMPT = """
+Transform this clinical discharge instruction into patient-level guidance.
+
+GOAL:
+Produce clear, simple instructions at a 4.5–5.5 grade reading level.
+
+ABSOLUTE RULE:
+Do NOT show your reasoning, planning, steps, or thoughts.
+Produce ONLY the final patient instructions.
+
+SENTENCE RULES:
+- Use short, clear sentences (10–16 words each)
+- Acceptable range: 8–18 words per sentence
+- Do NOT use very short phrases like “Rest your body” or “You feel very sick”
+
+LANGUAGE RULES:
+- Use everyday words only (no medical terms unless unavoidable)
+- Use clear adult language with simple vocabulary
+- Avoid complex phrases like “potential side effects”, “specific recommendations”,
+  “as directed by your doctor”, “as instructed”, “follow the instructions on the label”
+
+CONTENT PRESERVATION:
+- Keep ALL essential actions and warnings
+- Do NOT remove any clinical step unless clearly non-essential
+- Do NOT merge multiple steps into one sentence
+- Keep all medication names, doses, and monitoring steps when present
+- Do NOT add new warnings or new risks that are not in the original text
+- Do NOT repeat the same warning in different words
+
+CONTENT FLOOR:
+- Each section must contain 6–8 sentences
+
+STRUCTURE (ONLY these three sections, no extras):
+
+1. MEDICATION (if applicable):
+- What to take
+- When to take it
+- How much to take
+- Maximum daily amount
+- One key safety warning
+
+2. WHAT TO DO / WHAT NOT TO DO:
+- 4–8 clear action steps
+- Use simple verbs (“Do…”, “Do not…”)
+
+3. CALL DOCTOR RIGHT AWAY IF:
+- List EXACTLY 3 urgent signs the patient can see or feel
+- No repetition
+- No medical terminology
+- No open-ended lists
+
+AVOID:
+- Reassurance
+- Explanations of “why”
+- Long sentences beyond the allowed range
+- Lists longer than required
+- Extra sections (do NOT add new headings)
+- New warnings or risks not present in the original text
+
+Clinical Input:
+"""
+
+# D-v5: Simplified prompt, no grade-level framing (test_d_v5_simplified_prompt.py)
+D_SERIES_PROMPT = """Transform these discharge instructions into clear, patient-friendly format.
+
+LANGUAGE REQUIREMENTS:
+- Use simple, everyday words that any adult can understand
+- Write sentences that are 8-15 words long
+- Vary sentence length naturally (some shorter, some longer)
+- Avoid medical jargon - use common terms instead
+- Maintain a respectful, adult tone (not childish)
+
+STRUCTURE:
+**MEDICATION**
+[Simple medication instructions - what to take, when, how much]
+
+**WHAT TO DO / WHAT NOT TO DO**
+[4-5 clear action items patients should follow]
+
+**CALL DOCTOR RIGHT AWAY IF**
+[Exactly 4 warning signs patients can see or feel]
+
+CRITICAL RULES:
+- Use ONLY information from the discharge instructions below
+- Do NOT add symptoms, warnings, or advice not mentioned
+- Do NOT repeat the same information
+- Do NOT expose your reasoning process
+- Do NOT use medical terminology
+
+Discharge instructions to transform:
+
+"""
+
+# Low-density notes (single medication) inflate to 6.5-7.4 grade because sparse
+# content triggers a formal, explanatory tone. This variant asks for concrete
+# everyday context around the existing instructions instead of new content.
+CONTENT_EXPANSION_PROMPT = D_SERIES_PROMPT.replace(
+    "STRUCTURE:",
+    """CONTENT EXPANSION:
+- These instructions are short. Explain each one with a concrete, everyday example
+  (for example: "every 6 hours (morning, afternoon, evening, bedtime)")
+- Say what each instruction looks like in daily life
+- Do NOT add new medicines, warnings, or symptoms
+
+STRUCTURE:""",
+)
+
+PROMPTS = {
+    "a_v6": A_V6_PROMPT,
+    "d_v5": D_SERIES_PROMPT,
+    "d_v5_expansion": CONTENT_EXPANSION_PROMPT,
+}
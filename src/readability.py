@@ -0,0 +1,153 @@
+"""
+Batch Readability Engine
+Purpose: Score many texts at once with textstat-compatible formulas
+
+Each text is tokenized into words and sentences once, syllables come from a
+memoized per-word lookup shared across the whole batch, and the grade
+formulas are evaluated as NumPy arrays. Word, sentence and syllable rules
+follow textstat (CMUdict via nltk, then pyphen, then a vowel-group
+fallback), so grades match textstat.flesch_kincaid_grade within rounding.
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+_NONCONTRACTION_APOSTROPHE = re.compile(r"'(?![tsd]|ve|ll|re)")
+_PUNCTUATION = re.compile(r"[^\w\s']")
+_NON_LETTER = re.compile(r"\W")
+_WHITESPACE = re.compile(r"\s")
+_SENTENCE = re.compile(r"\b[^.!?]+[.!?]*")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+
+METRICS = (
+    "flesch_kincaid_grade",
+    "flesch_reading_ease",
+    "coleman_liau_index",
+    "automated_readability_index",
+    "smog_index",
+)
+
+
+def _load_pronunciations():
+    try:
+        import nltk
+        return nltk.corpus.cmudict.dict()
+    except (ImportError, LookupError):
+        return {}
+
+
+def _load_hyphenator():
+    try:
+        from pyphen import Pyphen
+        return Pyphen(lang="en_US")
+    except ImportError:
+        return None
+
+
+_PRONUNCIATIONS = None
+_HYPHENATOR = None
+
+
+@lru_cache(maxsize=None)
+def syllable_count(word):
+    """Syllables in one lowercase word (memoized across all texts)"""
+    global _PRONUNCIATIONS, _HYPHENATOR
+    if _PRONUNCIATIONS is None:
+        _PRONUNCIATIONS = _load_pronunciations()
+        _HYPHENATOR = _load_hyphenator()
+
+    phones = _PRONUNCIATIONS.get(word)
+    if phones:
+        return sum(1 for phone in phones[0] if phone[-1].isdigit())
+
+    if _HYPHENATOR is not None:
+        return len(_HYPHENATOR.positions(word)) + 1
+
+    return max(1, len(_VOWEL_GROUP.findall(word)))
+
+
+def _words(text):
+    return _PUNCTUATION.sub("", _NONCONTRACTION_APOSTROPHE.sub("", text)).split()
+
+
+def _sentence_count(text):
+    if not text:
+        return 0
+    sentences = _SENTENCE.findall(text)
+    short = sum(1 for sentence in sentences if len(_words(sentence)) <= 2)
+    return max(1, len(sentences) - short)
+
+
+def text_statistics(texts):
+    """Raw counts for each text as NumPy arrays"""
+    n = len(texts)
+    counts = {
+        name: np.zeros(n)
+        for name in ("words", "sentences", "syllables", "polysyllables", "letters", "chars", "raw_words")
+    }
+
+    for i, text in enumerate(texts):
+        words = _words(text)
+        syllables = [syllable_count(word.lower()) for word in words]
+
+        counts["words"][i] = len(words)
+        counts["sentences"][i] = _sentence_count(text)
+        counts["syllables"][i] = sum(syllables)
+        counts["polysyllables"][i] = sum(1 for s in syllables if s >= 3)
+        counts["letters"][i] = len(_NON_LETTER.sub("", text))
+        counts["chars"][i] = len(_WHITESPACE.sub("", text))
+        counts["raw_words"][i] = len(text.split())
+
+    return counts
+
+
+def _ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def readability_batch(texts):
+    """
+    Readability metrics for a batch of texts.
+
+    Returns a dict mapping each name in METRICS to an array aligned with
+    ``texts``. Like textstat, a metric is 0.0 when its inputs are empty.
+    """
+    counts = text_statistics(texts)
+
+    words_per_sentence = _ratio(counts["words"], counts["sentences"])
+    syllables_per_word = _ratio(counts["syllables"], counts["words"])
+    letters_per_100 = _ratio(counts["letters"], counts["words"]) * 100
+    sentences_per_100 = _ratio(counts["sentences"], counts["words"]) * 100
+    chars_per_word = _ratio(counts["chars"], counts["raw_words"])
+    has_words = (words_per_sentence > 0) & (syllables_per_word > 0)
+
+    return {
+        "flesch_kincaid_grade": np.where(
+            has_words, 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 0.0
+        ),
+        "flesch_reading_ease": np.where(
+            has_words, 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 0.0
+        ),
+        "coleman_liau_index": np.where(
+            (letters_per_100 > 0) & (sentences_per_100 > 0),
+            0.058 * letters_per_100 - 0.296 * sentences_per_100 - 15.8,
+            0.0,
+        ),
+        "automated_readability_index": np.where(
+            (chars_per_word > 0) & (words_per_sentence > 0),
+            4.71 * chars_per_word + 0.5 * words_per_sentence - 21.43,
+            0.0,
+        ),
+        "smog_index": np.where(
+            counts["sentences"] > 0,
+            1.043 * np.sqrt(30 * _ratio(counts["polysyllables"], counts["sentences"])) + 3.1291,
+            0.0,
+        ),
+    }
+
+
+def flesch_kincaid_grades(texts):
+    """Flesch-Kincaid grade for each text"""
+    return readability_batch(texts)["flesch_kincaid_grade"]
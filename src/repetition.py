@@ -0,0 +1,215 @@
+"""
+Repeated-Substring Detection
+Purpose: Find and localize repetition in generated token sequences in linear time
+
+The scripts' check ``len(result.split()) != len(set(result.split()))``
+flags any output that uses a word twice, which is nearly all of them, and
+cannot say where a loop is. This module builds a suffix automaton over the
+token IDs one token at a time. Each new token yields, in amortized O(1),
+the longest suffix that already occurred earlier and the distance back to
+that earlier copy, from which the longest repeated span so far is tracked.
+
+Loops are found separately and exactly: for every distance up to
+max_period the tracker keeps how long the tail has matched the tokens that
+far back, updating only the distances at which the new token occurred
+within the last max_period tokens (so a token costs as many steps as it
+occurred there, a few microseconds even inside a loop). A cycle is reported at the first token
+where it qualifies, with the offset where it began, even when the same
+text already appeared earlier in the sequence (the longest repeated suffix
+then points at that older copy and would hide the loop until it outgrew it).
+
+RepetitionTracker is the incremental form the generate stopping criterion
+and the continuous batching scheduler feed one token per decode step;
+analyze_repetition is the post-hoc form for finished outputs. Both accept
+any hashable tokens, so words of decoded text work as well as token IDs.
+
+Usage:
+    tracker = RepetitionTracker()
+    for token in generated_ids:
+        cycle = tracker.push(token)        # (period, offset, repeats) or None
+    report = analyze_repetition(processor.tokenizer(result)["input_ids"])
+    report["longest"], report["loop"]
+"""
+
+
+class SuffixAutomaton:
+    """
+    Online suffix automaton over a token sequence.
+
+    Besides the usual length / suffix link / transitions per state, each
+    state keeps the end position of its latest occurrence, updated only when
+    the state is the longest repeated suffix of a newly added token (walking
+    every suffix link would make periodic input quadratic). That is exact
+    for a new longest repeat and for a cycle repeating at the tail; a short
+    repeat that was last seen inside a longer one may report an older copy.
+    """
+
+    def __init__(self):
+        self.length = [0]
+        self.link = [-1]
+        self.next = [{}]
+        self.last_end = [-1]
+        self.last = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _add_state(self, length, link, transitions, last_end):
+        self.length.append(length)
+        self.link.append(link)
+        self.next.append(transitions)
+        self.last_end.append(last_end)
+        return len(self.length) - 1
+
+    def extend(self, token):
+        """
+        Append one token; return (repeat_length, previous_end).
+
+        ``repeat_length`` is the length of the longest suffix of the sequence
+        that also occurred earlier (0 if none) and ``previous_end`` the index
+        of the last token of its latest recorded earlier occurrence (-1 if none).
+        """
+        position = self.size
+        self.size += 1
+
+        cur = self._add_state(self.length[self.last] + 1, -1, {}, position)
+        state = self.last
+        while state != -1 and token not in self.next[state]:
+            self.next[state][token] = cur
+            state = self.link[state]
+
+        if state == -1:
+            self.link[cur] = 0
+        else:
+            target = self.next[state][token]
+            if self.length[state] + 1 == self.length[target]:
+                self.link[cur] = target
+            else:
+                clone = self._add_state(
+                    self.length[state] + 1, self.link[target], dict(self.next[target]), self.last_end[target]
+                )
+                while state != -1 and self.next[state].get(token) == target:
+                    self.next[state][token] = clone
+                    state = self.link[state]
+                self.link[target] = self.link[cur] = clone
+        self.last = cur
+
+        repeated = self.link[cur]
+        if repeated <= 0:
+            return 0, -1
+        previous_end = self.last_end[repeated]
+        self.last_end[repeated] = position
+        return self.length[repeated], previous_end
+
+
+class RepetitionTracker:
+    """
+    Incremental repetition detector for one generated sequence.
+
+    ``push`` reports a cycle of ``min_period``-``max_period`` tokens that
+    ends the sequence, repeats at least ``min_repeats`` times and covers at
+    least ``min_span`` tokens, as ``(period, offset, repeats)`` with the
+    offset where the cycle began. The first such cycle is kept in ``loop``
+    (plus ``stopped_at``, the sequence length when it was found), and the
+    longest repeated span seen so far in ``longest``.
+    """
+
+    def __init__(self, min_period=3, max_period=80, min_repeats=3, min_span=30):
+        self.min_period = min_period
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.min_span = min_span
+        self.automaton = SuffixAutomaton()
+        self.loop = None
+        self._longest = (0, -1, -1)
+        # token -> its positions among the last max_period tokens (pruned on access)
+        self._recent = {}
+        # distance -> how many tokens at the tail equal the tokens that distance back
+        self._runs = {}
+
+    def __len__(self):
+        return len(self.automaton)
+
+    def push(self, token):
+        """Add one token; return (period, offset, repeats) if the sequence now ends in a loop"""
+        repeat_length, previous_end = self.automaton.extend(token)
+        end = len(self.automaton) - 1
+        if repeat_length > self._longest[0]:
+            self._longest = (repeat_length, end, previous_end)
+
+        positions = [position for position in self._recent.get(token, ()) if end - position <= self.max_period]
+        self._runs = {end - position: self._runs.get(end - position, 0) + 1 for position in positions}
+        positions.append(end)
+        self._recent[token] = positions
+
+        cycle = self._cycle(end)
+        if cycle is not None and self.loop is None:
+            self.loop = {"period": cycle[0], "offset": cycle[1], "repeats": cycle[2], "stopped_at": end + 1}
+        return cycle
+
+    def _cycle(self, end):
+        """The shortest qualifying cycle ending at ``end``, or None"""
+        # A tail of one token repeated is padding after EOS (or a run of one
+        # character), not a content loop, at whatever distance it matches
+        constant = self._runs.get(1, 0) + 1
+        for distance in sorted(self._runs):
+            run = self._runs[distance] + distance
+            if distance == 1 or run <= constant:
+                continue
+            period = distance * -(-self.min_period // distance)
+            if period <= self.max_period and run >= max(period * self.min_repeats, self.min_span):
+                return period, end + 1 - run, run // period
+        return None
+
+    def extend(self, tokens):
+        """Push several tokens; return the cycle ending the sequence, if any"""
+        cycle = None
+        for token in tokens:
+            cycle = self.push(token)
+        return cycle
+
+    @property
+    def longest(self):
+        """
+        Longest span that occurs at least twice, or None.
+
+        ``start`` and ``previous_start`` locate the span and its most recent
+        earlier copy; ``period`` is the distance between them. When the copies
+        touch or overlap, ``repeats`` counts back-to-back copies of the
+        period-long cycle they form, otherwise it is 2.
+        """
+        length, end, previous_end = self._longest
+        if not length:
+            return None
+        period = end - previous_end
+        return {
+            "length": length,
+            "start": end + 1 - length,
+            "previous_start": previous_end + 1 - length,
+            "period": period,
+            "repeats": max(2, (length + period) // period),
+        }
+
+
+def analyze_repetition(tokens, **loop_kwargs):
+    """
+    Post-hoc repetition report for a finished sequence.
+
+    ``loop`` is where a RepetitionTracker (with ``loop_kwargs``) would first
+    have stopped generation, extended forward to the full run: ``period``,
+    ``offset``, ``repeats`` and the ``end`` of the run.
+    """
+    tokens = list(tokens)
+    tracker = RepetitionTracker(**loop_kwargs)
+    tracker.extend(tokens)
+
+    loop = None
+    if tracker.loop is not None:
+        period, offset = tracker.loop["period"], tracker.loop["offset"]
+        end = tracker.loop["stopped_at"]
+        while end < len(tokens) and tokens[end] == tokens[end - period]:
+            end += 1
+        loop = {"period": period, "offset": offset, "repeats": (end - offset) // period, "end": end}
+
+    return {"tokens": len(tokens), "longest": tracker.longest, "loop": loop}
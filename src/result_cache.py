@@ -0,0 +1,207 @@
+"""
+Persistent Transformation Result Cache
+Purpose: Skip the GPU for transformations that have already been generated
+
+Generation is greedy (do_sample=False), so the output is a pure function of
+the model weights (id, backend and dtype), prompt, clinical input and
+generation parameters. Results are stored in SQLite under a content hash of
+those inputs, with least recently used entries evicted once the stored
+outputs exceed ``max_bytes``. Outputs cut short by the repetition loop
+guard and empty outputs are returned but never stored, so a cached answer
+is always a complete one.
+
+experiment_runner.py and model_server.py put a cache in front of the model
+by default (--no-cache to turn it off).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from loop_guard import RepetitionLoopCriteria
+from model_client import MedGemmaClient
+from test_medgemma import NO_OUTPUT, model_identity, transform_batch, transform_text
+
+# Bump when a code change alters outputs for identical inputs
+CACHE_SCHEMA_VERSION = 2
+
+DEFAULT_CACHE_PATH = "transform_cache.sqlite3"
+
+
+def cache_key(model_key, prompt_instructions, clinical_text, generation_params):
+    """Content-addressed key for one deterministic transformation"""
+    payload = json.dumps(
+        {
+            "schema": CACHE_SCHEMA_VERSION,
+            "model": model_key,
+            "prompt": prompt_instructions,
+            "input": clinical_text,
+            "params": generation_params,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed LRU cache of transformation outputs"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                output TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached output for key, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT output FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, output):
+        """Store an output and evict least recently used entries over budget"""
+        size = len(output.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, output, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, output, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Hit/miss counters and current cache size"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def model_key(model):
+    """Identity of the weights behind a model or server client: id, backend and dtype"""
+    if isinstance(model, MedGemmaClient):
+        info = model.info
+        return {"model_id": info["model_id"], "backend": info.get("backend", "medgemma"), "dtype": info.get("dtype")}
+    model_id, backend = model_identity(model)
+    return {"model_id": model_id, "backend": backend, "dtype": str(model.dtype)}
+
+
+def transform_key(model, clinical_text, prompt_instructions, max_new_tokens):
+    """cache_key of one transform_text / transform_batch row"""
+    params = {"max_new_tokens": max_new_tokens, "do_sample": False}
+    return cache_key(model_key(model), prompt_instructions, clinical_text, params)
+
+
+def is_cacheable(output, loop):
+    """Only complete outputs are stored: not loop-truncated, not the empty-output placeholder"""
+    return loop is None and output != NO_OUTPUT
+
+
+def cached_transform_text(
+    cache, model, processor, clinical_text, prompt_instructions, max_new_tokens=1000, loop_guard=None, **kwargs
+):
+    """transform_text with a persistent result cache in front of the GPU"""
+    key = transform_key(model, clinical_text, prompt_instructions, max_new_tokens)
+
+    output = cache.get(key)
+    if output is not None:
+        if loop_guard is not None:
+            loop_guard.reset()
+        return output
+
+    loop_guard = loop_guard if loop_guard is not None else RepetitionLoopCriteria()
+    output = transform_text(
+        model, processor, clinical_text, prompt_instructions, max_new_tokens, loop_guard=loop_guard, **kwargs
+    )
+    if is_cacheable(output, loop_guard.detections.get(0)):
+        cache.put(key, output)
+    return output
+
+
+def cached_transform_batch(
+    cache, model, processor, notes, prompt_instructions, max_new_tokens=1000, loop_guard=None, **kwargs
+):
+    """
+    transform_batch that only sends cache misses to the model.
+
+    As for transform_batch, ``prompt_instructions`` and ``max_new_tokens``
+    may be lists with one entry per note; each note is keyed on its own
+    prompt and limit, and the misses are sent with their own entries.
+    ``loop_guard.detections`` is keyed by index into ``notes``; cached
+    notes never looped.
+    """
+    prompts = [prompt_instructions] * len(notes) if isinstance(prompt_instructions, str) else list(prompt_instructions)
+    limits = [max_new_tokens] * len(notes) if isinstance(max_new_tokens, int) else list(max_new_tokens)
+    loop_guard = loop_guard if loop_guard is not None else RepetitionLoopCriteria()
+
+    keys = [transform_key(model, note, prompt, limit) for note, prompt, limit in zip(notes, prompts, limits)]
+    outputs = [cache.get(key) for key in keys]
+
+    missing = [index for index, output in enumerate(outputs) if output is None]
+    if not missing:
+        loop_guard.reset()
+        return outputs
+
+    generated = transform_batch(
+        model,
+        processor,
+        [notes[index] for index in missing],
+        prompt_instructions if isinstance(prompt_instructions, str) else [prompts[index] for index in missing],
+        max_new_tokens if isinstance(max_new_tokens, int) else [limits[index] for index in missing],
+        loop_guard=loop_guard,
+        **kwargs,
+    )
+    # Detections are keyed by position among the misses; report them by note
+    loop_guard.detections = {missing[row]: loop for row, loop in loop_guard.detections.items()}
+
+    for index, output in zip(missing, generated):
+        outputs[index] = output
+        if is_cacheable(output, loop_guard.detections.get(index)):
+            cache.put(keys[index], output)
+
+    return outputs
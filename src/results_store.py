@@ -0,0 +1,187 @@
+"""
+Results Store
+Purpose: Persist every transformation result to a Parquet dataset for querying
+
+Replaces the printed SUMMARY tables and the hand-copied previous_results
+dicts: each batch of records is written as one Parquet file under the store
+directory, and the whole directory is read back as a single pandas
+DataFrame. Comparing prompt versions across thousands of runs becomes a
+groupby instead of copying numbers between scripts.
+
+Usage:
+    store = ResultsStore()
+    store.summary()                                  # per model x prompt version x scenario
+    store.compare("3f2a9c1d0b4e", "8e1d7f0a2c6b")   # grade delta per scenario
+"""
+
+import functools
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_STORE_DIR = os.path.join("results", "store")
+
+COLUMNS = {
+    "run": "string",
+    "model_id": "string",
+    "backend": "string",
+    "recorded_at": "datetime64[ns, UTC]",
+    "prompt": "string",
+    "prompt_version": "string",
+    "scenario": "string",
+    "params": "string",
+    "baseline": "float64",
+    "grade": "float64",
+    "reduction": "float64",
+    "target_met": "bool",
+    "looped": "bool",
+    "loop_period": "Int64",
+    "dropped_entities": "string",
+    "added_entities": "string",
+    "facts_rejected": "boolean",
+    "fact_changes": "string",
+    "input_tokens": "Int64",
+    "input_statements": "Int64",
+    "features_version": "Int64",
+    "max_new_tokens": "Int64",
+    "output_tokens": "Int64",
+    "elapsed_s": "float64",
+    "output": "string",
+}
+
+
+def _flatten(record, recorded_at):
+    loop = record.get("loop")
+    return {
+        "run": record["run"],
+        "model_id": record.get("model_id"),
+        "backend": record.get("backend"),
+        "recorded_at": recorded_at,
+        "prompt": record["prompt"],
+        "prompt_version": record["prompt_version"],
+        "scenario": record["scenario"],
+        "params": json.dumps(record.get("params", {}), sort_keys=True),
+        "baseline": record.get("baseline"),
+        "grade": record["grade"],
+        "reduction": record.get("reduction"),
+        "target_met": record["target_met"],
+        "looped": bool(loop),
+        "loop_period": loop["period"] if loop else None,
+        "dropped_entities": json.dumps(record.get("dropped_entities") or []),
+        "added_entities": json.dumps(record.get("added_entities") or []),
+        "facts_rejected": record.get("facts_rejected"),
+        "fact_changes": json.dumps(record.get("fact_changes") or []),
+        "input_tokens": record.get("input_tokens"),
+        "input_statements": record.get("input_statements"),
+        "features_version": record.get("features_version"),
+        "max_new_tokens": record.get("max_new_tokens"),
+        "output_tokens": record.get("output_tokens"),
+        "elapsed_s": record.get("elapsed_s"),
+        "output": record.get("output"),
+    }
+
+
+def records_to_frame(records, recorded_at=None):
+    """Convert experiment_runner records into a typed DataFrame"""
+    recorded_at = recorded_at or datetime.now(timezone.utc)
+    frame = pd.DataFrame([_flatten(record, recorded_at) for record in records], columns=list(COLUMNS))
+    return frame.astype(COLUMNS)
+
+
+@functools.lru_cache(maxsize=1)
+def _schema():
+    return pa.Schema.from_pandas(records_to_frame([]), preserve_index=False)
+
+
+class ResultsStore:
+    """Directory of Parquet files read and queried as one dataset"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def append(self, records):
+        """Write a batch of records as a new Parquet file; returns its path"""
+        if not records:
+            return None
+        os.makedirs(self.root, exist_ok=True)
+        frame = records_to_frame(records)
+        stamp = frame["recorded_at"].iloc[0].strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.root, f"{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+        frame.to_parquet(path, index=False)
+        return path
+
+    def load(self, columns=None, **equals):
+        """
+        Read the dataset, optionally restricted to columns and filtered on
+        equality, e.g. ``load(scenario="Heart Failure", looped=True)``.
+        """
+        if not os.path.isdir(self.root) or not any(name.endswith(".parquet") for name in os.listdir(self.root)):
+            empty = records_to_frame([])
+            return empty if columns is None else empty[list(columns)]
+
+        filters = [(name, "==", value) for name, value in equals.items()] or None
+        # Explicit schema so files written before a column existed read it as null
+        return pd.read_parquet(self.root, columns=columns, filters=filters, schema=_schema())
+
+    def delete(self, **equals):
+        """
+        Remove the rows matching every equality, e.g. ``delete(run="d_series",
+        model_id="stub-medgemma")``; returns how many were removed.
+        """
+        if not equals or not os.path.isdir(self.root):
+            return 0
+
+        removed = 0
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.root, name)
+            frame = pd.read_parquet(path, schema=_schema())
+            matches = pd.Series(True, index=frame.index)
+            for column, value in equals.items():
+                matches &= (frame[column] == value).fillna(False).astype(bool)
+            if not matches.any():
+                continue
+
+            removed += int(matches.sum())
+            if matches.all():
+                os.remove(path)
+            else:
+                # pyarrow skips "_"-prefixed files, so a rewrite cut short never joins the dataset
+                tmp_path = os.path.join(self.root, f"_{name}.tmp")
+                frame[~matches].to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+        return removed
+
+    def summary(self, by=("model_id", "prompt", "prompt_version", "scenario"), **equals):
+        """Aggregate grade, reduction, target and loop rates per group"""
+        frame = self.load(**equals)
+        return (
+            # dropna=False keeps rows stored before model ids were recorded
+            frame.groupby(list(by), observed=True, dropna=False)
+            .agg(
+                runs=("grade", "size"),
+                grade_mean=("grade", "mean"),
+                grade_std=("grade", "std"),
+                reduction_mean=("reduction", "mean"),
+                target_rate=("target_met", "mean"),
+                loop_rate=("looped", "mean"),
+                reject_rate=("facts_rejected", "mean"),
+                output_tokens_mean=("output_tokens", "mean"),
+                elapsed_p50=("elapsed_s", "median"),
+            )
+            .reset_index()
+        )
+
+    def compare(self, version_a, version_b, **equals):
+        """Mean grade per scenario for two prompt versions, with the b - a delta"""
+        frame = self.load(**equals)
+        frame = frame[frame["prompt_version"].isin([version_a, version_b])]
+        table = frame.pivot_table(index="scenario", columns="prompt_version", values="grade", aggfunc="mean", observed=True)
+        table = table.reindex(columns=[version_a, version_b])
+        table["delta"] = table[version_b] - table[version_a]
+        return table
@@ -0,0 +1,31 @@
+"""
+Canonical Discharge Scenarios
+Purpose: The five clinical inputs and baseline grades used across the A-D test series
+
+Kept in one place so tools that do not load the model (benchmarks,
+routers, parsers) can import them without running a test script.
+"""
+
+CLINICAL_INPUTS = {
+    "Acetaminophen": """Acetaminophen 500mg tablets. Take 1-2 tablets orally every 6 hours as needed for pain. Do not exceed 4000mg in 24 hours. Avoid alcohol while taking this medication. Contact provider if pain persists beyond 72 hours or if fever develops.""",
+    "Hip Surgery": """Post-operative total hip arthroplasty discharge protocol:
+- Maintain hip precautions: avoid flexion >90°, adduction past midline, and internal rotation
+- Prophylactic anticoagulation: Rivaroxaban 10mg PO daily x 35 days for DVT/PE prevention
+- Wound care: Keep incision clean and dry. Monitor for signs of infection (erythema, purulent drainage, dehiscence)
+- Pain management: Oxycodone 5mg PO q4-6h PRN. Avoid NSAIDs due to bleeding risk
+- PT: WBAT with walker. Progress to cane per PT recommendation
+- Follow-up: Orthopedic clinic in 2 weeks for suture removal and radiographic assessment""",
+    "Diabetes": """Type 2 diabetes discharge: Continue metformin 500mg BID with meals. Monitor blood glucose fasting and 2 hours post-prandial. Target range 80-130 mg/dL fasting, <180 mg/dL postprandial. Diabetic diet: carbohydrate counting, limit simple sugars. Daily foot inspection for ulcers, calluses, or color changes. Follow-up endocrinology in 1 month.""",
+    "Heart Failure": """Congestive heart failure discharge: Fluid restriction 1.5-2L daily. Daily weights at same time, report gain >2-3 lbs in 24hr or >5 lbs in week. Continue furosemide 40mg daily, carvedilol 6.25mg BID, lisinopril 10mg daily. Low sodium diet <2g daily. Call for: severe dyspnea, chest pain, rapid weight gain, edema worsening.""",
+    "Wound Care": """Post-surgical wound care: Change dressing daily. Cleanse with normal saline, pat dry, apply antibiotic ointment if prescribed. Keep wound clean and dry. Monitor for infection signs: erythema, increased warmth, purulent drainage, dehiscence, fever >100.4F. Avoid soaking in water until cleared by surgeon. Activity restrictions: no heavy lifting >10 lbs x 2 weeks.""",
+}
+
+BASELINE_GRADES = {
+    "Acetaminophen": 9.5,
+    "Hip Surgery": 9.6,
+    "Diabetes": 10.2,
+    "Heart Failure": 9.7,
+    "Wound Care": 8.6,
+}
+
+scenarios = [{"name": name, "input": text} for name, text in CLINICAL_INPUTS.items()]
@@ -0,0 +1,360 @@
+"""
+Continuous Batching Scheduler
+Purpose: Iteration-level batching of MedGemma transformations
+
+Discharge notes arrive unevenly, and per-request generate calls leave the
+GPU idle between requests. This scheduler runs its own greedy decode loop:
+every iteration it admits waiting requests into the running batch (within a
+token budget), decodes one token for every running sequence, and retires
+sequences as soon as they hit EOS, their max_new_tokens, or a repetition
+loop. Finished rows leave the batch immediately instead of padding out a
+static batch until its longest member is done. If a forward pass raises,
+the requests it was computing get the exception through their futures and
+the loop keeps serving the rest.
+
+Usage:
+    scheduler = ContinuousBatchScheduler(model, processor, max_batch_tokens=16384)
+    scheduler.start()
+    future = scheduler.submit(clinical_text, TRANSFORMATION_PROMPT)
+    result = future.result()
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.nn.functional as F
+from transformers import DynamicCache
+
+from loop_guard import RepetitionLoopCriteria
+from test_medgemma import build_messages, decode_output
+
+
+def _cache_layers(cache):
+    """List of (keys, values) tensors per layer, shaped [batch, heads, seq, dim]"""
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def _left_pad(tensor, length, dim):
+    """Left-pad a tensor with zeros along dim up to length"""
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    pad = [0, 0] * (tensor.dim() - dim - 1) + [missing, 0]
+    return F.pad(tensor, pad)
+
+
+class ContinuousBatchScheduler:
+    """
+    Iteration-level scheduler in front of the MedGemma decode loop.
+
+    A request reserves ``prompt tokens + max_new_tokens`` from
+    ``max_batch_tokens`` while it runs; waiting requests are admitted in
+    arrival order whenever the running batch has room. A request larger
+    than the whole budget still runs, alone.
+    """
+
+    def __init__(self, model, processor, max_batch_tokens=16384, max_batch_size=16, loop_guard=True):
+        if not getattr(model, "supports_forward", True):
+            raise ValueError(
+                f"{model.name_or_path} has no forward pass to decode with; "
+                "continuous batching needs MedGemma or MEDGEMMA_BACKEND=tiny"
+            )
+        self.model = model
+        self.processor = processor
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.loop_guard = RepetitionLoopCriteria() if loop_guard else None
+        self.eos_token_ids = self._eos_token_ids()
+
+        self._waiting = queue.Queue()
+        self._pending = None
+        self._running = []
+        self._cache = None
+        self._attention_mask = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {"admitted": 0, "completed": 0, "failed": 0, "iterations": 0, "max_running": 0}
+
+    def _eos_token_ids(self):
+        # Copy: the generation config list belongs to the shared model
+        eos = getattr(self.model.generation_config, "eos_token_id", None)
+        eos = set() if eos is None else set(eos) if isinstance(eos, (list, tuple)) else {eos}
+        tokenizer = getattr(self.processor, "tokenizer", self.processor)
+        if tokenizer.eos_token_id is not None:
+            eos.add(tokenizer.eos_token_id)
+        return eos
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, clinical_text, prompt_instructions, max_new_tokens=1000):
+        """Queue one note; returns a Future resolving to a result dict"""
+        input_ids = self.processor.apply_chat_template(
+            build_messages(clinical_text, prompt_instructions),
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+        )["input_ids"][0]
+
+        request = {
+            "future": Future(),
+            "input_ids": input_ids,
+            "max_new_tokens": max_new_tokens,
+            "generated": [],
+            "submitted": time.perf_counter(),
+            "first_token": None,
+            "loop": None,
+            "repetition": self.loop_guard.tracker() if self.loop_guard is not None else None,
+        }
+        self._waiting.put(request)
+        return request["future"]
+
+    def transform(self, clinical_text, prompt_instructions, max_new_tokens=1000):
+        """Blocking convenience wrapper returning only the output text"""
+        return self.submit(clinical_text, prompt_instructions, max_new_tokens).result()["output"]
+
+    def start(self):
+        """Run the scheduling loop in a background thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._serve, name="continuous-batching", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background loop after the current iteration"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_until_idle(self):
+        """Process everything queued so far in the calling thread"""
+        while self._has_work():
+            self.step()
+
+    # ------------------------------------------------------------------
+    # Scheduling loop
+    # ------------------------------------------------------------------
+
+    def _serve(self):
+        while not self._stop.is_set():
+            if not self._has_work():
+                try:
+                    self._pending = self._waiting.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+            try:
+                self.step()
+            except Exception as e:
+                # step() already failed the requests a forward pass broke;
+                # anything else must not kill the thread and strand every future
+                print(f"✗ Scheduler iteration failed: {e}")
+                self._fail(self._running, e)
+                self._reset_batch()
+
+    def _has_work(self):
+        return bool(self._running) or self._pending is not None or not self._waiting.empty()
+
+    def _reserved_tokens(self, request):
+        return len(request["input_ids"]) + request["max_new_tokens"]
+
+    def _admit(self):
+        """Pull waiting requests into the batch while the token budget allows"""
+        admitted = []
+        reserved = sum(self._reserved_tokens(request) for request in self._running)
+
+        while len(self._running) + len(admitted) < self.max_batch_size:
+            if self._pending is None:
+                try:
+                    self._pending = self._waiting.get_nowait()
+                except queue.Empty:
+                    break
+
+            cost = self._reserved_tokens(self._pending)
+            if reserved + cost > self.max_batch_tokens and (self._running or admitted):
+                break
+
+            admitted.append(self._pending)
+            reserved += cost
+            self._pending = None
+
+        return admitted
+
+    def step(self):
+        """One scheduler iteration: admit, decode one token, retire"""
+        with torch.inference_mode():
+            admitted = self._admit()
+            if admitted:
+                try:
+                    self._prefill(admitted)
+                except Exception as e:
+                    # The running batch is untouched until _merge, so only the new group fails
+                    self._fail(admitted, e)
+            if self._running:
+                try:
+                    self._decode()
+                except Exception as e:
+                    # The shared cache and mask may be half-updated: fail the whole batch
+                    self._fail(self._running, e)
+                    self._reset_batch()
+            self._retire()
+
+        self.stats["iterations"] += 1
+        self.stats["max_running"] = max(self.stats["max_running"], len(self._running))
+
+    def _fail(self, requests, error):
+        """Resolve requests with an exception instead of a result"""
+        for request in requests:
+            if not request["future"].done():
+                request["future"].set_exception(error)
+                self.stats["failed"] += 1
+
+    def _reset_batch(self):
+        self._running, self._cache, self._attention_mask = [], None, None
+
+    def _prefill(self, requests):
+        """Prefill new requests as a left-padded group and merge them in"""
+        device = self.model.device
+        length = max(len(request["input_ids"]) for request in requests)
+        pad_id = getattr(self.processor, "tokenizer", self.processor).pad_token_id or 0
+
+        input_ids = torch.full((len(requests), length), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(requests), length), dtype=torch.long)
+        for row, request in enumerate(requests):
+            n = len(request["input_ids"])
+            input_ids[row, length - n:] = request["input_ids"]
+            attention_mask[row, length - n:] = 1
+
+        input_ids = input_ids.to(device)
+        attention_mask = attention_mask.to(device)
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=DynamicCache(),
+            use_cache=True,
+        )
+        next_tokens = outputs.logits[:, -1].argmax(-1).tolist()
+
+        now = time.perf_counter()
+        for request, token in zip(requests, next_tokens):
+            request["generated"].append(token)
+            request["first_token"] = now
+            request["position"] = len(request["input_ids"])
+
+        self._merge(requests, outputs.past_key_values, attention_mask)
+        self.stats["admitted"] += len(requests)
+
+    def _merge(self, requests, cache, attention_mask):
+        """Append a prefilled group to the running batch, aligning on the right"""
+        if not self._running:
+            self._running = list(requests)
+            self._cache = cache
+            self._attention_mask = attention_mask
+            return
+
+        length = max(self._attention_mask.shape[-1], attention_mask.shape[-1])
+        layers = [
+            (
+                torch.cat([_left_pad(k_run, length, 2), _left_pad(k_new, length, 2)]),
+                torch.cat([_left_pad(v_run, length, 2), _left_pad(v_new, length, 2)]),
+            )
+            for (k_run, v_run), (k_new, v_new) in zip(_cache_layers(self._cache), _cache_layers(cache))
+        ]
+
+        self._cache = DynamicCache(layers)
+        self._attention_mask = torch.cat(
+            [_left_pad(self._attention_mask, length, 1), _left_pad(attention_mask, length, 1)]
+        )
+        self._running.extend(requests)
+
+    def _decode(self):
+        """Feed each running sequence's last token and pick the next greedily"""
+        device = self.model.device
+        input_ids = torch.tensor([[request["generated"][-1]] for request in self._running], device=device)
+        position_ids = torch.tensor([[request["position"]] for request in self._running], device=device)
+        self._attention_mask = F.pad(self._attention_mask, (0, 1), value=1)
+
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=self._attention_mask,
+            position_ids=position_ids,
+            past_key_values=self._cache,
+            use_cache=True,
+        )
+        self._cache = outputs.past_key_values
+
+        for request, token in zip(self._running, outputs.logits[:, -1].argmax(-1).tolist()):
+            if self._is_finished(request):
+                # Finished rows still ride along until _retire removes them
+                continue
+            request["generated"].append(token)
+            request["position"] += 1
+
+    def _is_finished(self, request):
+        generated = request["generated"]
+        if generated[-1] in self.eos_token_ids or len(generated) >= request["max_new_tokens"]:
+            return True
+
+        tracker = request["repetition"]
+        if tracker is not None and request["loop"] is None:
+            # Only the tokens decoded since the last check are new to the tracker
+            tracker.extend(generated[len(tracker):])
+            request["loop"] = tracker.loop
+
+        return request["loop"] is not None
+
+    def _retire(self):
+        """Resolve finished requests and drop their rows from the batch"""
+        keep = [row for row, request in enumerate(self._running) if not self._is_finished(request)]
+        if len(keep) == len(self._running):
+            return
+
+        now = time.perf_counter()
+        for row, request in enumerate(self._running):
+            if row not in keep:
+                request["future"].set_result(self._result(request, now))
+                self.stats["completed"] += 1
+
+        if not keep:
+            self._reset_batch()
+            return
+
+        index = torch.tensor(keep, device=self._attention_mask.device)
+        attention_mask = self._attention_mask.index_select(0, index)
+
+        # Drop leading columns that are padding for every remaining row
+        first = int(attention_mask.any(0).nonzero()[0])
+
+        self._running = [self._running[row] for row in keep]
+        self._attention_mask = attention_mask[:, first:]
+        self._cache = DynamicCache(
+            [
+                (k.index_select(0, index)[:, :, first:], v.index_select(0, index)[:, :, first:])
+                for k, v in _cache_layers(self._cache)
+            ]
+        )
+
+    def _result(self, request, now):
+        generated = request["generated"]
+        if generated and generated[-1] in self.eos_token_ids:
+            generated = generated[:-1]
+
+        return {
+            "output": decode_output(self.processor, generated),
+            "loop": request["loop"],
+            "prompt_tokens": len(request["input_ids"]),
+            "generated_tokens": len(request["generated"]),
+            "ttft_s": request["first_token"] - request["submitted"],
+            "latency_s": now - request["submitted"],
+        }
@@ -0,0 +1,123 @@
+"""
+Range-Safe Clinical Segmenter
+Purpose: Split notes into statements without breaking ranges, decimals or abbreviations
+
+normalize_content_v2 splits on every "." and "-", so "Take 1-2 tablets"
+becomes "Take 1" and "2 tablets", "80-130 mg/dL" and ">2-3 lbs" lose
+their upper bound, and "6.25mg" / "100.4F" are cut at the decimal point.
+This segmenter only cuts at real boundaries: sentence ends ("." or "!"
+followed by whitespace, unless it closes a title such as "Dr." or a dotted
+abbreviation such as "b.i.d." or "e.g."), line breaks, bullet markers at
+the start of a line ("- ", "•", "2.") and spaced dashes between words; a
+hyphen inside a word ("Follow-up") or a range ("2 - 3") is not one.
+
+The boundary pattern is one compiled regex whose alternatives all start
+with a single character class ([.!?\\n] or a dash), so the engine skips
+ordinary text with a fast scan and decides the boundary with lookarounds
+only at those characters. It is applied with re.split, which keeps
+segmenting in C and close to the cost of the plain "[.\\-]" split.
+
+stream() segments text arriving in chunks (a file read in blocks, a
+generation stream) and yields each statement once the boundary after it
+is certain, so a corpus is never held in memory as a whole.
+
+Usage:
+    list(segment_statements(note))
+    for statement in stream_statements(chunks):
+        ...
+"""
+
+import re
+
+# Dotted abbreviations that do not end a sentence unless a capital follows
+ABBREVIATIONS = ["e.g", "i.e", "etc", "vs", "approx", "b.i.d", "t.i.d", "q.i.d", "q.d", "p.o", "p.r.n", "a.m", "p.m", "h.s"]
+
+# Titles never end a sentence ("Dr. Patel")
+TITLES = ["Dr", "Mr", "Mrs", "Ms", "St"]
+
+# "- Maintain ...", "• Keep ...", "2. Take ..." at the start of a line
+BULLET = r"[ \t]*(?:[-–—•*]|\d{1,2}[.)])[ \t]+"
+
+_NOT_TITLE = "".join(rf"(?<!\b{title}\.)" for title in TITLES)
+_NOT_ABBREVIATION = "".join(rf"(?<!(?i:\b{re.escape(term)}\.))" for term in ABBREVIATIONS)
+
+# Every boundary consumes one of these first; the branch is then chosen by lookbehind
+BOUNDARIES = [
+    # Line breaks, with a bullet that starts the next line
+    rf"(?<=\n)\n*(?:{BULLET})?",
+    r"(?<=[!?])[.!?]*(?=\s|\Z)",
+    # "." ends a sentence unless it closes a title, or an abbreviation without a capital after it
+    rf"(?<=\.){_NOT_TITLE}(?:{_NOT_ABBREVIATION}|(?=\s+[A-Z]))[.!?]*(?=\s|\Z)",
+    # A spaced dash, unless it joins two numbers ("2 - 3")
+    r"(?<=[ \t][-–—])(?=[ \t])(?:(?<!\d[ \t].)|(?![ \t]+\d))",
+]
+
+# Text after a boundary that may still extend it once more text arrives
+PENDING = r"[ \t]*(?:[-–—•*]|\d{1,2}[.)]?)?[ \t]*"
+
+
+class Segmenter:
+    """Compiled statement splitter; boundaries are found in a single left-to-right scan"""
+
+    def __init__(self, boundaries=BOUNDARIES):
+        self.pattern = re.compile(r"[.!?\n\-–—](?:" + "|".join(boundaries) + ")")
+        self.pending = re.compile(PENDING)
+
+    def segments(self, text):
+        """Statements of one text, stripped, in order"""
+        # The leading newline makes a bullet on the first line a boundary like any other
+        return [statement for statement in map(str.strip, self.pattern.split("\n" + text)) if statement]
+
+    def _cut(self, buffer, start, final):
+        """
+        Statements between ``start`` and the last certain boundary, and the
+        position after it. Unless ``final``, a boundary followed only by
+        text that could still extend it ("6." may continue as "6.25", "\\n1"
+        as a "\\n12. " bullet) is not certain yet.
+        """
+        statements = []
+        for match in self.pattern.finditer(buffer, start):
+            if not final and self.pending.fullmatch(buffer, match.end()):
+                break
+            statement = buffer[start:match.start()].strip()
+            if statement:
+                statements.append(statement)
+            start = match.end()
+        if final:
+            statement = buffer[start:].strip()
+            if statement:
+                statements.append(statement)
+            start = len(buffer)
+        return statements, start
+
+    def stream(self, chunks):
+        """
+        Statements of text arriving in chunks, yielded as soon as they are
+        complete. Segmentation is the same as for the joined text.
+        """
+        buffer, start = "\n", 0
+        for chunk in chunks:
+            buffer += chunk
+            statements, start = self._cut(buffer, start, final=False)
+            yield from statements
+            # Keep the line around start, so lookbehinds and bullets see what segments() sees
+            cut = max(buffer.rfind("\n", 0, start), 0)
+            buffer, start = buffer[cut:], start - cut
+        yield from self._cut(buffer, start, final=True)[0]
+
+    def segments_many(self, texts):
+        """segments() over a corpus of notes with the same compiled pattern"""
+        return [self.segments(text) for text in texts]
+
+
+DEFAULT_SEGMENTER = Segmenter()
+
+
+def segment_statements(text):
+    """Statements of one note with the default segmenter"""
+    return DEFAULT_SEGMENTER.segments(text)
+
+
+def stream_statements(chunks):
+    """Statements of chunked text with the default segmenter, as a generator"""
+    return DEFAULT_SEGMENTER.stream(chunks)
@@ -0,0 +1,138 @@
+"""
+Streaming Transformation
+Purpose: Show MedGemma's output while it decodes instead of after 1000 tokens
+
+stream_transform_text is the generator form of transform_text: generate
+runs in a background thread feeding a TextIteratorStreamer, and text is
+yielded as soon as it decodes. Time to first token and total time are
+written into a caller-supplied metrics dict. A reviewer can stop an
+obviously bad output early by closing the generator (or breaking out of
+the loop) or by setting the ``abort`` event from another thread; the
+decode stops at the next token.
+
+Usage:
+    metrics = {}
+    for text in stream_transform_text(model, processor, note, D_SERIES_PROMPT, metrics=metrics):
+        print(text, end="", flush=True)
+    print(f"\\nTTFT {metrics['ttft_s']:.2f}s")
+"""
+
+import threading
+import time
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+import tracing
+from loop_guard import RepetitionLoopCriteria, describe_loop
+from model_client import MedGemmaClient
+from test_medgemma import build_messages
+
+
+class AbortCriteria(StoppingCriteria):
+    """Stop every row once ``event`` is set"""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def stream_transform_text(
+    model,
+    processor,
+    clinical_text,
+    prompt_instructions,
+    max_new_tokens=1000,
+    loop_guard=None,
+    metrics=None,
+    abort=None,
+    prefix_cache=None,
+):
+    """
+    Transform clinical text, yielding output text as it is generated.
+
+    ``metrics`` (a dict) receives ``ttft_s``, ``elapsed_s``, ``aborted``
+    and ``loop``. As for transform_text, a PromptPrefixCache as
+    ``prefix_cache`` skips prefilling the prompt instructions. With a
+    server client there is no token stream, so the whole output is yielded
+    once when it is ready.
+    """
+    metrics = {} if metrics is None else metrics
+    abort = abort or threading.Event()
+    if loop_guard is None:
+        loop_guard = RepetitionLoopCriteria()
+    loop_guard.reset()
+
+    start = time.perf_counter()
+    metrics.update({"ttft_s": None, "elapsed_s": None, "aborted": False, "loop": None})
+
+    if isinstance(model, MedGemmaClient):
+        response = model.transform(clinical_text, prompt_instructions, max_new_tokens)
+        metrics["ttft_s"] = metrics["elapsed_s"] = time.perf_counter() - start
+        metrics["loop"] = response["loop"]
+        yield response["output"]
+        return
+
+    with tracing.span("apply_chat_template"):
+        inputs = processor.apply_chat_template(
+            build_messages(clinical_text, prompt_instructions),
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+        )
+
+    with tracing.span("to_device"):
+        inputs = inputs.to(model.device, dtype=model.dtype)
+
+    if prefix_cache is not None:
+        past_key_values = prefix_cache.past_for(model, processor, inputs["input_ids"], prompt_instructions)
+        if past_key_values is not None:
+            inputs["past_key_values"] = past_key_values
+
+    tokenizer = getattr(processor, "tokenizer", processor)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    errors = []
+
+    def generate():
+        try:
+            with torch.inference_mode():
+                model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    stopping_criteria=StoppingCriteriaList([loop_guard, AbortCriteria(abort)]),
+                    streamer=streamer,
+                )
+        except Exception as e:
+            errors.append(e)
+            # Unblock the consumer; generate never reached streamer.end()
+            streamer.end()
+
+    thread = threading.Thread(target=generate, name="medgemma-stream", daemon=True)
+    thread.start()
+
+    completed = False
+    try:
+        for text in streamer:
+            if not text:
+                continue
+            if metrics["ttft_s"] is None:
+                metrics["ttft_s"] = time.perf_counter() - start
+            yield text
+        completed = True
+    finally:
+        # The caller closed the generator (or broke out of its loop) mid-stream
+        if not completed:
+            abort.set()
+        thread.join()
+        metrics["aborted"] = abort.is_set()
+        metrics["elapsed_s"] = time.perf_counter() - start
+        metrics["loop"] = loop_guard.detections.get(0)
+
+    if errors:
+        raise errors[0]
+    if metrics["loop"]:
+        print(describe_loop(metrics["loop"]))
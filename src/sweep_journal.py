@@ -0,0 +1,101 @@
+"""
+Sweep Journal
+Purpose: Durable, append-only record of completed experiment cells
+
+Each completed (prompt, scenario, params, model) cell is appended as one JSON line
+and fsynced before the next batch starts, so a preempted session loses at
+most the batch in flight. On restart the journal is read back and finished
+cells are skipped. Cells are keyed on the model id and backend too, so a
+stub or tiny-model sweep never marks a MedGemma cell as done.
+"""
+
+import hashlib
+import json
+import os
+
+
+def cell_key(prompt_version, scenario_name, clinical_text, params, model_id, backend):
+    """Stable identity of one experiment cell"""
+    payload = json.dumps(
+        {
+            "model_id": model_id,
+            "backend": backend,
+            "prompt_version": prompt_version,
+            "scenario": scenario_name,
+            "input": hashlib.sha256(clinical_text.encode("utf-8")).hexdigest(),
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class SweepJournal:
+    """Append-only JSON lines file keyed by ``cell_key``"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.records = self._recover()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _recover(self):
+        """Load completed records, truncating a line torn by a crash"""
+        if not os.path.exists(self.path):
+            return {}
+
+        records = {}
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                records[record["cell_key"]] = record
+                valid_bytes += len(line)
+
+        if valid_bytes < os.path.getsize(self.path):
+            print(f"⚠ Discarding incomplete journal entry in {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+        return records
+
+    def is_complete(self, key):
+        return key in self.records
+
+    def append(self, records):
+        """Durably append completed records"""
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.records[record["cell_key"]] = record
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def discard(self, keys):
+        """Durably drop the records of ``keys``; returns how many were dropped"""
+        keys = set(keys) & set(self.records)
+        if not keys:
+            return 0
+
+        self._file.close()
+        for key in keys:
+            del self.records[key]
+
+        # Rewrite beside the journal and swap, so a crash leaves the old or the new file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        return len(keys)
+
+    def close(self):
+        self._file.close()
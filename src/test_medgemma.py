@@ -8,6 +8,11 @@ from dotenv import load_dotenv
 from transformers import AutoProcessor, AutoModelForImageTextToText
 import torch
 import textstat  # For readability scoring
+from transformers import StoppingCriteriaList
+
+import tracing
+from loop_guard import RepetitionLoopCriteria, describe_loop
+from model_client import MedGemmaClient
 
 # Load environment variables
 load_dotenv()
@@ -15,20 +20,44 @@ load_dotenv()
 # Set reproducibility seed
 torch.manual_seed(42)
 
+MODEL_ID = "google/medgemma-1.5-4b-it"
 
-def load_model():
-    """Load MedGemma model and processor"""
-    print("Loading MedGemma 1.5 4B...")
+# decode_output's placeholder when the model generated nothing
+NO_OUTPUT = "⚠ No output generated. Check model or prompt formatting."
+
+
+def load_model(use_server=True, dtype=torch.bfloat16, backend=None):
+    """
+    Load MedGemma model and processor.
+
+    If MEDGEMMA_SERVER_URL is set and a model_server.py instance is
+    reachable there, returns (client, None) instead of loading weights;
+    transform_text and transform_batch accept the client as the model.
+    MEDGEMMA_BACKEND (or ``backend``) set to "stub" or "tiny" returns an
+    offline backend from backends.py instead of MedGemma.
+    """
+    server_url = os.getenv("MEDGEMMA_SERVER_URL")
+    if use_server and server_url:
+        client = MedGemmaClient(server_url)
+        if client.is_available():
+            print(f"✓ Using MedGemma server at {client.url}")
+            return client, None
+        print(f"⚠ MedGemma server not reachable at {client.url}; loading model locally")
 
-    model_id = "google/medgemma-1.5-4b-it"
+    backend = backend or os.getenv("MEDGEMMA_BACKEND", "medgemma")
+    if backend != "medgemma":
+        from backends import load_backend
+        return load_backend(backend, dtype=dtype)
+
+    print("Loading MedGemma 1.5 4B...")
 
     model = AutoModelForImageTextToText.from_pretrained(
-        model_id,
-        dtype=torch.bfloat16,
+        MODEL_ID,
+        dtype=dtype,
         device_map="auto",
     )
 
-    processor = AutoProcessor.from_pretrained(model_id)
+    processor = AutoProcessor.from_pretrained(MODEL_ID)
 
     print("✓ Model loaded successfully")
     print(f"Running on device: {model.device}")
@@ -39,8 +68,33 @@ def load_model():
     return model, processor
 
 
-def transform_text(model, processor, clinical_text, prompt_instructions):
-    """Transform clinical text using MedGemma"""
+def model_identity(model=None, backend=None):
+    """
+    (model id, backend) of a loaded model or server client, or of the model
+    load_model would return when ``model`` is None (no weights are loaded).
+    Stored results are keyed on it so stub and real outputs never mix.
+    """
+    if model is None:
+        server_url = os.getenv("MEDGEMMA_SERVER_URL")
+        if server_url and MedGemmaClient(server_url).is_available():
+            model = MedGemmaClient(server_url)
+        else:
+            backend = backend or os.getenv("MEDGEMMA_BACKEND", "medgemma")
+            if backend == "medgemma":
+                return MODEL_ID, backend
+            from backends import BACKEND_MODEL_IDS
+            if backend not in BACKEND_MODEL_IDS:
+                raise ValueError(f"Unknown backend '{backend}'. Available: medgemma, {', '.join(BACKEND_MODEL_IDS)}")
+            return BACKEND_MODEL_IDS[backend], backend
+
+    if isinstance(model, MedGemmaClient):
+        health = model.health()
+        return health["model_id"], health.get("backend", "medgemma")
+    return getattr(model.config, "name_or_path", ""), getattr(model, "backend", "medgemma")
+
+
+def build_messages(clinical_text, prompt_instructions):
+    """Build the chat messages for a single transformation request"""
 
     full_prompt = f"""{prompt_instructions}
 
@@ -49,45 +103,190 @@ ORIGINAL DISCHARGE INSTRUCTIONS:
 
 PATIENT-FRIENDLY VERSION:"""
 
-    messages = [
+    return [
         {
             "role": "user",
             "content": [{"type": "text", "text": full_prompt}],
         }
     ]
 
-    inputs = processor.apply_chat_template(
-        messages,
-        add_generation_prompt=True,
-        tokenize=True,
-        return_dict=True,
-        return_tensors="pt",
-    ).to(model.device, dtype=torch.bfloat16)
+
+def decode_output(processor, generation):
+    """Decode generated token IDs, flagging empty outputs"""
+
+    with tracing.span("decode"):
+        output = processor.decode(generation, skip_special_tokens=True).strip()
+
+    if not output:
+        return NO_OUTPUT
+
+    return output
+
+
+@tracing.traced_request
+def transform_text(
+    model, processor, clinical_text, prompt_instructions, max_new_tokens=1000, loop_guard=None, prefix_cache=None
+):
+    """
+    Transform clinical text using MedGemma.
+
+    Generation stops early if the output falls into a repetition loop; pass
+    a RepetitionLoopCriteria as ``loop_guard`` to read its ``detections``.
+    Pass a PromptPrefixCache as ``prefix_cache`` to reuse the prefilled
+    prompt instructions across calls. streaming.stream_transform_text is
+    the generator form that yields text while it decodes.
+    """
+
+    if loop_guard is None:
+        loop_guard = RepetitionLoopCriteria()
+    loop_guard.reset()
+
+    if isinstance(model, MedGemmaClient):
+        response = model.transform(clinical_text, prompt_instructions, max_new_tokens)
+        if response["loop"]:
+            loop_guard.detections[0] = response["loop"]
+            print(describe_loop(response["loop"]))
+        return response["output"]
+
+    messages = build_messages(clinical_text, prompt_instructions)
+
+    with tracing.span("apply_chat_template"):
+        inputs = processor.apply_chat_template(
+            messages,
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+        )
+
+    with tracing.span("to_device"):
+        inputs = inputs.to(model.device, dtype=model.dtype)
 
     input_len = inputs["input_ids"].shape[-1]
 
+    if prefix_cache is not None:
+        past_key_values = prefix_cache.past_for(model, processor, inputs["input_ids"], prompt_instructions)
+        if past_key_values is not None:
+            inputs["past_key_values"] = past_key_values
+
     print("Generating transformation...")
 
-    with torch.inference_mode():
+    with torch.inference_mode(), tracing.span("generate", input_tokens=input_len):
         generation = model.generate(
             **inputs,
-            max_new_tokens=1000,
+            max_new_tokens=max_new_tokens,
             do_sample=False,
+            stopping_criteria=StoppingCriteriaList([loop_guard]),
         )
         generation = generation[0][input_len:]
 
-    output = processor.decode(generation, skip_special_tokens=True).strip()
+    if 0 in loop_guard.detections:
+        print(describe_loop(loop_guard.detections[0]))
 
-    if not output:
-        return "⚠ No output generated. Check model or prompt formatting."
+    return decode_output(processor, generation)
 
-    return output
+
+@tracing.traced_request
+def transform_batch(
+    model, processor, notes, prompt_instructions, max_new_tokens=1000, batch_size=8, loop_guard=None
+):
+    """
+    Transform many clinical notes with one generate call per batch.
+
+    Notes are left-padded so every row's prompt ends at the same column;
+    the generated tokens for each row therefore start at the padded
+    input length. Outputs are returned in the same order as ``notes``.
+    Looping rows are stopped individually; ``loop_guard.detections`` is
+    keyed by note index. ``prompt_instructions`` may be a single prompt or
+    a list with one prompt per note, and ``max_new_tokens`` a single limit
+    or a list with one limit per note (see token_budget.py).
+    """
+
+    if loop_guard is None:
+        loop_guard = RepetitionLoopCriteria()
+    loop_guard.reset()
+
+    if isinstance(prompt_instructions, str):
+        prompts = [prompt_instructions] * len(notes)
+    else:
+        prompts = list(prompt_instructions)
+
+    if isinstance(model, MedGemmaClient):
+        response = model.transform_batch(notes, prompts, max_new_tokens, batch_size)
+        for index, loop in enumerate(response["loops"]):
+            if loop:
+                loop_guard.detections[index] = loop
+                print(f"Note {index + 1}: {describe_loop(loop)}")
+        return response["outputs"]
+
+    if isinstance(max_new_tokens, int):
+        limits = None
+    else:
+        from token_budget import RowTokenLimit
+        limits = list(max_new_tokens)
+
+    tokenizer = getattr(processor, "tokenizer", processor)
+    original_padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+
+    outputs = []
+
+    try:
+        for start in range(0, len(notes), batch_size):
+            chunk = notes[start:start + batch_size]
+            conversations = [
+                build_messages(note, prompt) for note, prompt in zip(chunk, prompts[start:start + batch_size])
+            ]
+
+            with tracing.span("apply_chat_template", rows=len(chunk)):
+                inputs = processor.apply_chat_template(
+                    conversations,
+                    add_generation_prompt=True,
+                    tokenize=True,
+                    return_dict=True,
+                    return_tensors="pt",
+                    padding=True,
+                )
+
+            with tracing.span("to_device", rows=len(chunk)):
+                inputs = inputs.to(model.device, dtype=model.dtype)
+
+            input_len = inputs["input_ids"].shape[-1]
+
+            print(f"Generating transformations {start + 1}-{start + len(chunk)} of {len(notes)}...")
+
+            loop_guard.start_batch(row_offset=start)
+            stopping_criteria = StoppingCriteriaList([loop_guard])
+            chunk_max_new_tokens = max_new_tokens
+
+            if limits is not None:
+                chunk_limits = limits[start:start + batch_size]
+                chunk_max_new_tokens = max(chunk_limits)
+                stopping_criteria.append(RowTokenLimit(chunk_limits, row_offset=start))
+
+            with torch.inference_mode(), tracing.span("generate", rows=len(chunk), input_tokens=input_len):
+                generation = model.generate(
+                    **inputs,
+                    max_new_tokens=chunk_max_new_tokens,
+                    do_sample=False,
+                    stopping_criteria=stopping_criteria,
+                )
+
+            for index, row in enumerate(generation, start=start):
+                if index in loop_guard.detections:
+                    print(f"Note {index + 1}: {describe_loop(loop_guard.detections[index])}")
+                outputs.append(decode_output(processor, row[input_len:]))
+    finally:
+        tokenizer.padding_side = original_padding_side
+
+    return outputs
 
 
 def calculate_readability(text):
     """Calculate Flesch-Kincaid Grade Level"""
     try:
-        return textstat.flesch_kincaid_grade(text)
+        with tracing.span("readability"):
+            return textstat.flesch_kincaid_grade(text)
     except Exception:
         return None
 
@@ -0,0 +1,303 @@
+"""
+Token Budget Planner
+Purpose: Set max_new_tokens per note from its size instead of a fixed 600-1000
+
+A patient-friendly rewrite is roughly proportional to the note it came
+from: more input tokens and more statements (items in the MEDICATION /
+INSTRUCTIONS / WARNINGS sections) mean a longer output. A linear model
+predicts output tokens from those two features, and the budget is the
+prediction plus a safety margin, clamped to [min_tokens, max_tokens].
+A runaway output on a short note is now cut at a few hundred tokens
+instead of running to 1000.
+
+Coefficients are fitted by least squares on stored runs (results_store.py)
+that ended on their own; looped or truncated runs are excluded. The
+margin is widened to cover the 95th percentile under-prediction seen
+during calibration. Runs and plans record FEATURES_VERSION, so a plan fitted
+on statements counted a different way is never applied to the new counts.
+
+Stored input tokens always come from the model's tokenizer, so a calibrated
+plan records token_count "tokenizer". Without a tokenizer (server clients)
+tokens can only be estimated from characters; such a plan is then not
+applied to the estimate, and the uncalibrated defaults are used instead.
+
+Usage:
+    python token_budget.py --calibrate     # fit from results/store, write token_budget.json
+    planner = TokenBudgetPlanner.load()
+    budgets = planner.budgets(notes, processor, prompt)
+    transform_batch(model, processor, notes, prompt, max_new_tokens=budgets)
+"""
+
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, StoppingCriteria
+
+from content_classifier import DEFAULT_CLASSIFIER
+from prefix_cache import prompt_version
+
+DEFAULT_PLAN_PATH = "token_budget.json"
+
+# Bump when note_features counts differently (2: range-safe statement segmentation)
+FEATURES_VERSION = 2
+
+# Uncalibrated starting point: (intercept, per input token, per statement)
+DEFAULT_COEFFICIENTS = (60.0, 1.5, 8.0)
+DEFAULT_MARGIN = 0.25
+MIN_CALIBRATION_RUNS = 5
+# Rough English average when no tokenizer is available (server clients)
+CHARS_PER_TOKEN = 4
+# How input tokens were counted
+TOKENIZER_COUNT = "tokenizer"
+CHARS_COUNT = "chars"
+
+
+def note_features(clinical_text, tokenizer=None):
+    """(input tokens, statements) for one note"""
+    if tokenizer is None:
+        input_tokens = max(1, len(clinical_text) // CHARS_PER_TOKEN)
+    else:
+        input_tokens = len(tokenizer(clinical_text, add_special_tokens=False)["input_ids"])
+    return input_tokens, sum(1 for _ in DEFAULT_CLASSIFIER.statements(clinical_text))
+
+
+def token_count_method(tokenizer=None):
+    """How note_features counts input tokens with this tokenizer"""
+    return CHARS_COUNT if tokenizer is None else TOKENIZER_COUNT
+
+
+def _params_limit(params):
+    value = json.loads(params).get("max_new_tokens")
+    return float(value) if isinstance(value, (int, float)) else math.inf
+
+
+def _least_squares(features, targets):
+    design = np.column_stack([np.ones(len(features)), features])
+    coefficients, *_ = np.linalg.lstsq(design, targets, rcond=None)
+    predictions = design @ coefficients
+    return tuple(float(c) for c in coefficients), predictions
+
+
+class TokenBudgetPlanner:
+    """
+    Predicts output length per note and turns it into a max_new_tokens.
+
+    ``per_prompt`` maps a prompt_version to its own coefficients and
+    margin; prompts without an entry use the global fit. ``token_count``
+    is how the input tokens of the fit were counted (None for the
+    uncalibrated defaults, which are used with either count).
+    """
+
+    def __init__(
+        self,
+        coefficients=DEFAULT_COEFFICIENTS,
+        margin=DEFAULT_MARGIN,
+        min_tokens=128,
+        max_tokens=1000,
+        per_prompt=None,
+        token_count=None,
+    ):
+        self.coefficients = tuple(coefficients)
+        self.margin = margin
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.per_prompt = per_prompt or {}
+        self.token_count = token_count
+        self._mixed_warned = False
+
+    def predict(self, input_tokens, statements, version=None):
+        """Expected output tokens"""
+        entry = self.per_prompt.get(version)
+        intercept, per_token, per_statement = entry["coefficients"] if entry else self.coefficients
+        return max(0.0, intercept + per_token * input_tokens + per_statement * statements)
+
+    def _planner_for(self, tokenizer):
+        """This plan, or the uncalibrated defaults if it was fitted on tokens counted another way"""
+        method = token_count_method(tokenizer)
+        if self.token_count in (None, method):
+            return self
+        if not self._mixed_warned:
+            print(
+                f"⚠ Token budget plan was fitted on {self.token_count} counts but only {method} counts are "
+                "available; using defaults"
+            )
+            self._mixed_warned = True
+        return TokenBudgetPlanner(min_tokens=self.min_tokens, max_tokens=self.max_tokens)
+
+    def budget(self, clinical_text, tokenizer=None, prompt_instructions=None):
+        """max_new_tokens for one note"""
+        planner = self._planner_for(tokenizer)
+        if planner is not self:
+            return planner.budget(clinical_text, tokenizer, prompt_instructions)
+
+        version = prompt_version(prompt_instructions) if prompt_instructions is not None else None
+        entry = self.per_prompt.get(version)
+        margin = entry["margin"] if entry else self.margin
+
+        predicted = self.predict(*note_features(clinical_text, tokenizer), version=version)
+        return int(min(self.max_tokens, max(self.min_tokens, math.ceil(predicted * (1 + margin)))))
+
+    def budgets(self, notes, processor=None, prompt_instructions=None):
+        """max_new_tokens per note; prompt_instructions may be one prompt or one per note"""
+        tokenizer = getattr(processor, "tokenizer", processor)
+        if isinstance(prompt_instructions, str) or prompt_instructions is None:
+            prompt_instructions = [prompt_instructions] * len(notes)
+        return [self.budget(note, tokenizer, prompt) for note, prompt in zip(notes, prompt_instructions)]
+
+    def fit(self, frame):
+        """
+        Calibrate from a ResultsStore DataFrame; returns fit statistics.
+
+        Only runs that ended before their token limit and did not loop are
+        used, since a truncated output says nothing about its natural length,
+        and only runs whose statements were counted under FEATURES_VERSION.
+        Stored input_tokens are tokenizer counts (runs without a tokenizer
+        store none), so the fitted plan is for tokenizer counts.
+        """
+        # Runs stored before budgets were recorded only have the matrix param
+        limit = frame["max_new_tokens"].astype("Float64").fillna(frame["params"].map(_params_limit))
+        usable = frame[
+            (frame["features_version"] == FEATURES_VERSION).fillna(False).astype(bool)
+            & ~frame["looped"]
+            & frame["output_tokens"].notna()
+            & frame["input_tokens"].notna()
+            & frame["input_statements"].notna()
+            & (frame["output_tokens"] < limit)
+        ]
+        if len(usable) < MIN_CALIBRATION_RUNS:
+            raise ValueError(f"Need at least {MIN_CALIBRATION_RUNS} completed runs to calibrate, found {len(usable)}")
+
+        def fit_group(group):
+            features = group[["input_tokens", "input_statements"]].to_numpy(dtype=float)
+            targets = group["output_tokens"].to_numpy(dtype=float)
+            coefficients, predictions = _least_squares(features, targets)
+            under = targets / np.maximum(predictions, 1.0) - 1
+            margin = max(DEFAULT_MARGIN, float(np.percentile(under, 95)))
+            ss_res = float(((targets - predictions) ** 2).sum())
+            ss_tot = float(((targets - targets.mean()) ** 2).sum())
+            return {
+                "coefficients": coefficients,
+                "margin": round(margin, 4),
+                "runs": len(group),
+                "r2": round(1 - ss_res / ss_tot, 4) if ss_tot else None,
+            }
+
+        overall = fit_group(usable)
+        self.coefficients = overall["coefficients"]
+        self.margin = overall["margin"]
+        self.token_count = TOKENIZER_COUNT
+
+        self.per_prompt = {}
+        for version, group in usable.groupby("prompt_version", observed=True):
+            if len(group) >= MIN_CALIBRATION_RUNS:
+                self.per_prompt[version] = fit_group(group)
+
+        return {"overall": overall, "per_prompt": self.per_prompt}
+
+    def save(self, path=DEFAULT_PLAN_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "features_version": FEATURES_VERSION,
+                    "coefficients": self.coefficients,
+                    "margin": self.margin,
+                    "min_tokens": self.min_tokens,
+                    "max_tokens": self.max_tokens,
+                    "per_prompt": self.per_prompt,
+                    "token_count": self.token_count,
+                },
+                f,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, path=DEFAULT_PLAN_PATH):
+        """Load a calibrated plan, or the uncalibrated defaults if there is none"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            plan = json.load(f)
+
+        version = plan.pop("features_version", 1)
+        if version != FEATURES_VERSION:
+            print(
+                f"⚠ {path} was fitted on note features v{version} (now v{FEATURES_VERSION}); "
+                "using defaults until recalibrated"
+            )
+            return cls()
+        # Plans saved before token_count was recorded were all fitted on tokenizer counts
+        plan.setdefault("token_count", TOKENIZER_COUNT)
+        return cls(**plan)
+
+
+class RowTokenLimit(StoppingCriteria):
+    """
+    Stop each row of a batched generate call at its own max_new_tokens.
+
+    generate() only takes one max_new_tokens, so it is given the largest
+    budget in the batch and this criterion ends the other rows early.
+    ``exhausted`` collects the rows (plus ``row_offset``) that hit their limit.
+    """
+
+    def __init__(self, limits, row_offset=0):
+        self.limits = torch.tensor(limits)
+        self.row_offset = row_offset
+        self.prompt_len = None
+        self.exhausted = set()
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.prompt_len is None:
+            # First call happens after the first generated token
+            self.prompt_len = input_ids.shape[-1] - 1
+
+        is_done = (input_ids.shape[-1] - self.prompt_len) >= self.limits
+        self.exhausted.update(self.row_offset + row for row in is_done.nonzero().flatten().tolist())
+        return is_done.to(input_ids.device)
+
+
+def main():
+    from results_store import DEFAULT_STORE_DIR, ResultsStore
+    from scenarios import CLINICAL_INPUTS
+    from test_medgemma import MODEL_ID
+
+    parser = argparse.ArgumentParser(description="Calibrate the max_new_tokens planner from stored runs")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--output", default=DEFAULT_PLAN_PATH)
+    parser.add_argument("--calibrate", action="store_true", help="Fit from the results store and save")
+    parser.add_argument("--model-id", default=MODEL_ID, help="Only fit on runs of this model")
+    parser.add_argument(
+        "--tokenizer", default=MODEL_ID, help="Tokenizer to count input tokens with (the one the plan was fitted on)"
+    )
+    args = parser.parse_args()
+
+    planner = TokenBudgetPlanner.load(args.output)
+    if args.calibrate:
+        # Stub and tiny-model runs have unrelated output lengths
+        stats = planner.fit(ResultsStore(args.store).load(model_id=args.model_id))
+        planner.save(args.output)
+        overall = stats["overall"]
+        print(f"✓ Calibrated on {overall['runs']} runs (R² {overall['r2']}), margin {overall['margin']:.0%}")
+        print(f"  {len(stats['per_prompt'])} prompt version(s) with their own fit; saved to {args.output}")
+
+    # Count with the same tokenizer the stored runs were counted with, never a character estimate
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    print("\n" + "=" * 70)
+    print(f"TOKEN BUDGETS ({args.tokenizer} tokenizer)")
+    print("=" * 70)
+    print("Scenario       | Input Tokens | Statements | Predicted | Budget")
+    print("-" * 70)
+    for name, text in CLINICAL_INPUTS.items():
+        input_tokens, statements = note_features(text, tokenizer)
+        predicted = planner.predict(input_tokens, statements)
+        budget = planner.budget(text, tokenizer)
+        print(f"{name:<14} | {input_tokens:<12} | {statements:<10} | {predicted:<9.0f} | {budget}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
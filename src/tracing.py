@@ -0,0 +1,160 @@
+"""
+Request Tracing
+Purpose: Show where each discharge note's time goes inside the transform path
+
+Records timed spans (apply_chat_template, to_device, generate, decode,
+readability) tagged with a per-request ID carried in a context variable,
+so nested calls and server threads attribute their spans to the right
+note. Completed spans are kept in a bounded buffer for Chrome trace export
+(chrome://tracing, Perfetto) and folded into per-span histograms for a
+Prometheus text endpoint (model_server.py GET /metrics).
+
+Usage:
+    with tracing.request():
+        output = transform_text(model, processor, note, prompt)
+    tracing.TRACER.write_chrome_trace("trace.json")
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds in seconds; generate on a T4 runs from ~1s to the 1000-token limit
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class Tracer:
+    """
+    Collects spans and per-span latency histograms.
+
+    Recording a span costs two perf_counter_ns calls and a lock; set
+    MEDGEMMA_TRACE=0 to turn spans into no-ops.
+    """
+
+    def __init__(self, max_spans=10000, enabled=True):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._epoch_ns = time.perf_counter_ns()
+
+    @contextmanager
+    def request(self, request_id=None):
+        """Tag every span in this context with a request ID (reuses an active one)"""
+        if _request_id.get() is not None and request_id is None:
+            yield _request_id.get()
+            return
+
+        token = _request_id.set(request_id or uuid.uuid4().hex[:12])
+        try:
+            with self.span("request"):
+                yield _request_id.get()
+        finally:
+            _request_id.reset(token)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block as one span"""
+        if not self.enabled:
+            yield
+            return
+
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._record(name, start_ns, time.perf_counter_ns() - start_ns, attrs)
+
+    def _record(self, name, start_ns, duration_ns, attrs):
+        seconds = duration_ns / 1e9
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "request_id": _request_id.get(),
+                "start_ns": start_ns - self._epoch_ns,
+                "duration_ns": duration_ns,
+                "thread_id": threading.get_ident(),
+                "attrs": attrs,
+            })
+
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {"buckets": [0] * len(HISTOGRAM_BUCKETS), "count": 0, "sum": 0.0}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+
+    def chrome_trace(self):
+        """Spans as a Chrome trace event dict (complete "X" events, microseconds)"""
+        with self._lock:
+            spans = list(self.spans)
+
+        events = [
+            {
+                "name": span["name"],
+                "cat": "medgemma",
+                "ph": "X",
+                "ts": span["start_ns"] / 1000,
+                "dur": span["duration_ns"] / 1000,
+                "pid": os.getpid(),
+                "tid": span["thread_id"],
+                "args": {"request_id": span["request_id"], **span["attrs"]},
+            }
+            for span in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def prometheus_text(self):
+        """Span histograms in the Prometheus text exposition format"""
+        lines = [
+            "# HELP medgemma_span_seconds Time spent in each transform stage",
+            "# TYPE medgemma_span_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(HISTOGRAM_BUCKETS, histogram["buckets"]):
+                    lines.append(f'medgemma_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'medgemma_span_seconds_bucket{{span="{name}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'medgemma_span_seconds_sum{{span="{name}"}} {histogram["sum"]:.6f}')
+                lines.append(f'medgemma_span_seconds_count{{span="{name}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.histograms.clear()
+
+
+TRACER = Tracer(enabled=os.getenv("MEDGEMMA_TRACE", "1") != "0")
+span = TRACER.span
+request = TRACER.request
+
+
+def current_request_id():
+    """Request ID of the active context, or None outside a request"""
+    return _request_id.get()
+
+
+def traced_request(func):
+    """Run each call of func inside its own (or the caller's) request"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with TRACER.request():
+            return func(*args, **kwargs)
+
+    return wrapper
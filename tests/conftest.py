@@ -0,0 +1,6 @@
+"""Put src/ on the import path; the modules there import each other flatly."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,28 @@
+from abbreviations import expand_abbreviations
+from dose_extractor import diff_facts
+from jargon import find_jargon
+from scenarios import CLINICAL_INPUTS
+
+
+def test_physical_exam_pe_is_not_a_clot():
+    assert expand_abbreviations("PE: normal. Follow up in 2 weeks.") == "PE: normal. Follow up in 2 weeks."
+    assert expand_abbreviations("Exam: PE unremarkable") == "Exam: PE unremarkable"
+
+
+def test_pe_expands_next_to_clot_wording():
+    assert expand_abbreviations("On heparin; watch for PE") == "On heparin; watch for blood clot in the lungs"
+    assert "PE" not in expand_abbreviations(CLINICAL_INPUTS["Hip Surgery"])
+
+
+def test_pt_needs_a_therapy_context():
+    assert expand_abbreviations("PT/INR in 3 days") == "PT/INR in 3 days"
+    assert expand_abbreviations(CLINICAL_INPUTS["Hip Surgery"]).count("Physical therapy:") == 1
+
+
+def test_expansion_keeps_every_fact():
+    for clinical_text in CLINICAL_INPUTS.values():
+        assert not diff_facts(clinical_text, expand_abbreviations(clinical_text))["rejected"]
+
+
+def test_jargon_detects_the_expanded_abbreviations():
+    assert find_jargon("Take 5mg PO q4-6h PRN, WBAT") == ["PO", "q4-6h", "PRN", "WBAT"]
@@ -0,0 +1,25 @@
+import pytest
+
+from backends import load_backend
+from bench_generation import run_config
+from scenarios import CLINICAL_INPUTS
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("MEDGEMMA_STUB_TIME_SCALE", "0")
+        return load_backend("stub")
+
+
+def test_looping_note_generates_the_same_tokens_every_repeat(stub):
+    model, processor = stub
+    # The stub loops on Heart Failure until the loop guard stops it
+    notes = [CLINICAL_INPUTS["Heart Failure"], CLINICAL_INPUTS["Acetaminophen"]]
+
+    once = run_config(model, processor, notes, batch_size=1, max_new_tokens=400, repeats=1)
+    three = run_config(model, processor, notes, batch_size=1, max_new_tokens=400, repeats=3)
+
+    assert once["batches"] == 2
+    assert once["generated_tokens"] > 2 * 30
+    assert three["generated_tokens"] == 3 * once["generated_tokens"]
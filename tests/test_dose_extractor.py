@@ -0,0 +1,78 @@
+from dose_extractor import Dose, Duration, Frequency, Threshold, diff_facts, extract_facts
+from scenarios import CLINICAL_INPUTS
+
+
+def test_postfix_comparator_matches_prefix_symbol():
+    assert extract_facts("a fever of 100.4 F or higher") == extract_facts("fever >100.4F")
+    assert extract_facts("if you gain 5 pounds or more") == [Threshold(">", 5.0, 5.0, "lb")]
+
+
+def test_heavier_than_is_a_comparator():
+    assert extract_facts("anything heavier than 10 pounds") == [Threshold(">", 10.0, 10.0, "lb")]
+    assert extract_facts("Do not lift anything heavier than 10 pounds") == [Threshold("<=", 10.0, 10.0, "lb")]
+
+
+def test_wound_care_lay_rewrite_is_not_rejected():
+    output = (
+        "Change your bandage every day. Wash the wound with salt water. "
+        "Call your doctor if you have a fever of 100.4 F or higher. "
+        "Do not lift anything heavier than 10 pounds for 2 weeks."
+    )
+    diff = diff_facts(CLINICAL_INPUTS["Wound Care"], output)
+    assert not diff["rejected"], diff
+
+
+def test_heart_failure_lay_rewrite_is_not_rejected():
+    output = (
+        "Drink only 1.5 to 2 liters of fluid a day. Weigh yourself every day. "
+        "Call if you gain more than 2 to 3 pounds in one day or more than 5 pounds in a week. "
+        "Take furosemide 40 mg once a day, carvedilol 6.25 mg twice a day, and lisinopril 10 mg once a day. "
+        "Eat less than 2 grams of salt a day."
+    )
+    diff = diff_facts(CLINICAL_INPUTS["Heart Failure"], output)
+    assert not diff["missing"] and not diff["altered"], diff
+
+
+def test_changed_dose_is_altered():
+    diff = diff_facts("Take metformin 500mg BID", "Take metformin 850 mg twice a day")
+    assert diff["altered"] == [(Dose(500.0, 500.0, "mg"), Dose(850.0, 850.0, "mg"))]
+    assert diff["rejected"]
+
+
+def test_dropped_duration_is_missing():
+    diff = diff_facts("Rivaroxaban 10mg daily x 35 days", "Take rivaroxaban 10 mg once a day")
+    assert diff["missing"] == [Duration(35.0, 35.0)]
+
+
+def test_bare_exceed_is_a_lower_bound():
+    assert extract_facts("Call if readings exceed 180 mg/dL") == [Threshold(">", 180.0, 180.0, "mg/dL")]
+    assert extract_facts("Do not exceed 4000mg")[0] == Threshold("<=", 4000.0, 4000.0, "mg")
+    diff = diff_facts("Call if glucose >180 mg/dL", "Call if readings exceed 180 mg/dL")
+    assert not diff["rejected"], diff
+
+
+def test_negation_does_not_cross_a_conjunction():
+    facts = extract_facts("Call if pain does not improve or lasts more than 3 days")
+    assert facts == [Threshold(">", 3.0, 3.0, "days")]
+    assert extract_facts("Call if it does not heal, lasts more than 3 days") == facts
+    assert extract_facts("no heavy lifting >10 lbs") == [Threshold("<=", 10.0, 10.0, "lb")]
+
+
+def test_or_more_than_starts_a_new_fact():
+    facts = extract_facts("gain more than 2-3 pounds in 24 hours or more than 5 pounds in week")
+    assert Threshold(">", 5.0, 5.0, "lb") in facts
+    assert Duration(1.0, 1.0) in facts
+
+
+def test_repeated_fact_must_be_kept_every_time():
+    source = "Lisinopril 10mg daily. Rivaroxaban 10mg daily."
+    diff = diff_facts(source, "Take lisinopril 10 mg once a day.")
+    assert diff["missing"] == [Dose(10.0, 10.0, "mg"), Frequency(24, 24, False)]
+    assert diff["rejected"]
+    assert not diff_facts(source, "Take lisinopril 10 mg once a day and rivaroxaban 10 mg once a day.")["rejected"]
+
+
+def test_tab_abbreviation_is_a_count_unit():
+    assert extract_facts("Take 1 tab") == [Dose(1.0, 1.0, "tablet")]
+    assert extract_facts("Take 1-2 tabs PRN") == [Dose(1.0, 2.0, "tablet"), Frequency(None, None, True)]
+    assert diff_facts("Take 1 tab", "Take 1 tablet")["preserved"] == [Dose(1.0, 1.0, "tablet")]
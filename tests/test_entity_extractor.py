@@ -0,0 +1,25 @@
+from entity_extractor import DEFAULT_EXTRACTOR, compare_entities
+from scenarios import CLINICAL_INPUTS
+
+
+def test_ordinary_words_are_not_clinical_facts():
+    text = "Put the red bag on the scale, check the room temperature and add salt to taste."
+    assert DEFAULT_EXTRACTOR.extract(text) == []
+
+
+def test_abbreviations_only_match_in_capitals():
+    assert DEFAULT_EXTRACTOR.extract("Watch for signs of DVT or PE. Start PT next week.") == [
+        "deep vein thrombosis",
+        "pulmonary embolism",
+        "physical therapy",
+    ]
+    assert DEFAULT_EXTRACTOR.extract("Skip pe class, the pt said") == []
+
+
+def test_lay_rewrite_keeps_hip_replacement_concepts():
+    output = (
+        "Take your blood thinner (rivaroxaban 10 mg) every day for 35 days to prevent blood clots in your legs "
+        "or a clot in your lungs. Go to physical therapy twice a day."
+    )
+    diff = compare_entities(CLINICAL_INPUTS["Hip Surgery"], output)
+    assert {"deep vein thrombosis", "pulmonary embolism", "physical therapy", "rivaroxaban"} <= set(diff["preserved"])
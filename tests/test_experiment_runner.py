@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from backends import load_backend
+from experiment_runner import build_cells, run_cells
+from results_store import ResultsStore
+from scenarios import CLINICAL_INPUTS
+from sweep_journal import SweepJournal
+from test_medgemma import MODEL_ID, model_identity
+from token_budget import DEFAULT_COEFFICIENTS, FEATURES_VERSION, TokenBudgetPlanner, note_features
+
+MATRIX = {"prompts": ["d_v5"], "scenarios": ["Acetaminophen", "Diabetes"], "generation": [{"max_new_tokens": 20}]}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("MEDGEMMA_STUB_TIME_SCALE", "0")
+        return load_backend("stub")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.delenv("MEDGEMMA_SERVER_URL", raising=False)
+    monkeypatch.delenv("MEDGEMMA_BACKEND", raising=False)
+
+
+def test_planned_identity_matches_loaded_backend(stub, offline):
+    assert model_identity() == (MODEL_ID, "medgemma")
+    assert model_identity(backend="stub") == model_identity(stub[0]) == ("stub-medgemma", "stub")
+
+
+def test_cells_are_keyed_on_model(offline):
+    real = build_cells(MATRIX)
+    stubbed = build_cells(MATRIX, identity=model_identity(backend="stub"))
+
+    assert [cell["model_id"] for cell in real] == [MODEL_ID, MODEL_ID]
+    assert not {cell["key"] for cell in real} & {cell["key"] for cell in stubbed}
+
+
+def test_stub_results_are_kept_apart_and_fresh_clears_them(stub, tmp_path):
+    model, processor = stub
+    cells = build_cells(MATRIX, identity=model_identity(model))
+    store = ResultsStore(str(tmp_path / "store"))
+    journal = SweepJournal(str(tmp_path / "run.jsonl"))
+
+    for records in run_cells(model, processor, "regression", cells):
+        journal.append(records)
+        store.append(records)
+
+    assert set(store.load()["model_id"]) == {"stub-medgemma"}
+    # Calibration only reads runs of the real model
+    assert store.load(model_id=MODEL_ID).empty
+
+    assert journal.discard(cell["key"] for cell in cells[:1]) == 1
+    assert store.delete(run="regression", model_id="stub-medgemma", scenario="Acetaminophen") == 1
+    assert list(store.load()["scenario"]) == ["Diabetes"]
+    journal.close()
+
+    reopened = SweepJournal(journal.path)
+    assert [reopened.is_complete(cell["key"]) for cell in cells] == [False, True]
+    reopened.close()
+
+
+def test_budget_plan_from_other_features_version_is_ignored(tmp_path):
+    path = str(tmp_path / "plan.json")
+    planner = TokenBudgetPlanner(coefficients=(1.0, 2.0, 3.0))
+    planner.save(path)
+    assert TokenBudgetPlanner.load(path).coefficients == (1.0, 2.0, 3.0)
+
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    plan["features_version"] = FEATURES_VERSION - 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f)
+    assert TokenBudgetPlanner.load(path).coefficients == DEFAULT_COEFFICIENTS
+
+
+def test_input_features_describe_the_preprocessed_note(stub, monkeypatch):
+    import experiment_runner
+
+    monkeypatch.setitem(experiment_runner.PREPROCESSORS, "first_sentence", lambda text: text.split(". ")[0] + ".")
+    matrix = {**MATRIX, "generation": [{"max_new_tokens": 20, "preprocess": ["first_sentence"]}]}
+    model, processor = stub
+    cells = build_cells(matrix, identity=model_identity(model))
+
+    records = [record for records in run_cells(model, processor, "regression", cells) for record in records]
+
+    for cell, record in zip(cells, records):
+        sent = cell["scenario"]["input"].split(". ")[0] + "."
+        assert record["input_statements"] == note_features(sent)[1]
+        assert record["input_statements"] < note_features(cell["scenario"]["input"])[1]
+
+
+def test_tokenizer_plan_is_not_applied_to_character_estimates(stub, tmp_path):
+    _, processor = stub
+    path = str(tmp_path / "plan.json")
+    TokenBudgetPlanner(coefficients=(0.0, 10.0, 0.0), min_tokens=1, max_tokens=10_000, token_count="tokenizer").save(path)
+    planner = TokenBudgetPlanner.load(path)
+    defaults = TokenBudgetPlanner(min_tokens=1, max_tokens=10_000)
+    note = CLINICAL_INPUTS["Acetaminophen"]
+
+    assert planner.budget(note, processor.tokenizer) != defaults.budget(note, processor.tokenizer)
+    assert planner.budget(note) == defaults.budget(note)
+
+
+def test_interrupted_delete_leaves_the_store_readable(stub, tmp_path, monkeypatch):
+    model, processor = stub
+    cells = build_cells(MATRIX, identity=model_identity(model))
+    store = ResultsStore(str(tmp_path / "store"))
+    store.append([record for records in run_cells(model, processor, "regression", cells) for record in records])
+
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("os.replace", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        store.delete(scenario="Acetaminophen")
+    monkeypatch.undo()
+
+    assert sorted(store.load()["scenario"]) == ["Acetaminophen", "Diabetes"]
+    assert store.delete(scenario="Acetaminophen") == 1
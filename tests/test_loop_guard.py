@@ -0,0 +1,39 @@
+import torch
+
+from backends import load_backend
+from loop_guard import RepetitionLoopCriteria
+from scenarios import CLINICAL_INPUTS
+from test_medgemma import transform_text
+
+PROMPT = "Rewrite for a patient."
+
+
+def _cycle(period, length, prompt_len=4):
+    return torch.tensor([[7] * prompt_len + [10 + i % period for i in range(length)]])
+
+
+def test_detects_cycle_and_forgets_it_on_reset():
+    guard = RepetitionLoopCriteria()
+    guard.start_batch()
+    for length in range(1, 40):
+        ids = _cycle(4, length)
+        if guard(ids, None)[0]:
+            break
+    assert guard.detections[0]["period"] == 4
+
+    guard.reset()
+    assert guard.detections == {}
+    assert not guard(torch.tensor([[7, 7, 7, 7, 11]]), None)[0]
+
+
+def test_reused_guard_does_not_stop_the_next_note():
+    model, processor = load_backend("tiny", dtype=torch.float32)
+    note = CLINICAL_INPUTS["Diabetes"]
+    expected = transform_text(model, processor, note, PROMPT, max_new_tokens=12)
+
+    guard = RepetitionLoopCriteria()
+    # A loop left over from an earlier note on row 0
+    guard.detections[0] = {"period": 3, "offset": 0, "repeats": 3, "stopped_at": 9}
+
+    assert transform_text(model, processor, note, PROMPT, max_new_tokens=12, loop_guard=guard) == expected
+    assert guard.detections == {}
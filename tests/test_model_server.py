@@ -0,0 +1,70 @@
+import json
+import threading
+import urllib.error
+from http.server import ThreadingHTTPServer
+
+import pytest
+import torch
+
+import tracing
+from backends import load_backend
+from model_client import MedGemmaClient
+from model_server import ModelService, make_handler
+from scenarios import CLINICAL_INPUTS
+from scheduler import ContinuousBatchScheduler
+
+PROMPT = "Rewrite for a patient."
+
+
+@pytest.fixture(scope="module")
+def service():
+    model, processor = load_backend("tiny", dtype=torch.float32)
+    scheduler = ContinuousBatchScheduler(model, processor)
+    scheduler.start()
+    yield ModelService(model, processor, scheduler)
+    scheduler.stop()
+
+
+@pytest.fixture(scope="module")
+def server(service):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield MedGemmaClient(f"http://127.0.0.1:{httpd.server_port}")
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_client_request_id_reaches_scheduler_spans(server):
+    tracing.TRACER.reset()
+    with tracing.request("note-42"):
+        server.transform(CLINICAL_INPUTS["Acetaminophen"], PROMPT, max_new_tokens=4)
+
+    assert server.last_request_id == "note-42"
+    names = {span["name"] for span in tracing.TRACER.spans if span["request_id"] == "note-42"}
+    assert {"schedule_submit", "schedule_wait"} <= names
+
+
+def test_client_generates_a_request_id_outside_a_request(server):
+    tracing.TRACER.reset()
+    server.transform(CLINICAL_INPUTS["Acetaminophen"], PROMPT, max_new_tokens=2)
+
+    request_ids = {span["request_id"] for span in tracing.TRACER.spans if span["name"] == "schedule_wait"}
+    assert request_ids == {server.last_request_id}
+
+
+def test_generation_failure_returns_json_500(server, service):
+    def failing_forward(*args, **kwargs):
+        raise RuntimeError("CUDA out of memory")
+
+    service.model.forward = failing_forward
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            server.transform(CLINICAL_INPUTS["Acetaminophen"], PROMPT, max_new_tokens=2)
+    finally:
+        vars(service.model).pop("forward")
+
+    assert error.value.code == 500
+    assert error.value.headers["X-Request-ID"] == server.last_request_id
+    assert json.loads(error.value.read()) == {"error": "Generation failed: CUDA out of memory"}
+    # The server keeps serving after a failed request
+    assert server.transform(CLINICAL_INPUTS["Acetaminophen"], PROMPT, max_new_tokens=2)["output"] is not None
@@ -0,0 +1,50 @@
+import pytest
+import torch
+
+from backends import load_backend
+from model_server import ModelService
+from prefix_cache import PromptPrefixCache
+from prompts import D_SERIES_PROMPT
+from scenarios import CLINICAL_INPUTS
+from streaming import stream_transform_text
+from test_medgemma import transform_text
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    return load_backend("tiny", dtype=torch.float32)
+
+
+def test_streaming_reuses_prefix_with_identical_output(tiny):
+    model, processor = tiny
+    note = CLINICAL_INPUTS["Diabetes"]
+    cache = PromptPrefixCache()
+
+    expected = transform_text(model, processor, note, D_SERIES_PROMPT, max_new_tokens=8)
+    for _ in range(2):
+        streamed = "".join(stream_transform_text(model, processor, note, D_SERIES_PROMPT, 8, prefix_cache=cache))
+        assert streamed.strip() == expected.strip()
+
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_server_transform_uses_prefix_cache(tiny):
+    model, processor = tiny
+    service = ModelService(model, processor, prefix_cache=PromptPrefixCache())
+    payload = {"clinical_text": CLINICAL_INPUTS["Wound Care"], "prompt_instructions": D_SERIES_PROMPT, "max_new_tokens": 4}
+
+    first, second = service.transform(payload), service.transform(payload)
+
+    assert first["output"] == second["output"]
+    assert service.prefix_cache.hits == 1
+
+
+def test_stub_backend_skips_prefix_cache(monkeypatch):
+    monkeypatch.setenv("MEDGEMMA_STUB_TIME_SCALE", "0")
+    model, processor = load_backend("stub")
+    cache = PromptPrefixCache()
+
+    output = transform_text(model, processor, CLINICAL_INPUTS["Acetaminophen"], D_SERIES_PROMPT, 20, prefix_cache=cache)
+
+    assert output
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,38 @@
+from repetition import RepetitionTracker, analyze_repetition
+
+CYCLE = list(range(100, 110))
+
+
+def first_loop(tokens):
+    tracker = RepetitionTracker()
+    tracker.extend(tokens)
+    return tracker.loop
+
+
+def test_exact_loop_is_reported_where_it_qualifies():
+    # min_span 30 tokens of a 10-token cycle: three copies
+    loop = first_loop([1, 2, 3] + CYCLE * 5)
+    assert loop == {"period": 10, "offset": 3, "repeats": 3, "stopped_at": 33}
+    assert analyze_repetition([1, 2, 3] + CYCLE * 5)["loop"] == {"period": 10, "offset": 3, "repeats": 5, "end": 53}
+
+
+def test_no_loop_in_varied_text_or_padding():
+    varied = [(index * 7919) % 1000 for index in range(400)]
+    assert first_loop(varied) is None
+    # Padding after EOS is one token repeated, and a phrase used twice is no loop
+    assert first_loop(varied[:50] + [0] * 200) is None
+    assert first_loop(varied[:40] + CYCLE + varied[40:80] + CYCLE) is None
+
+
+def test_late_onset_loop_of_text_seen_earlier():
+    # The same loop already ran earlier; the longest repeated suffix points
+    # back at that older run, but the new loop must still be found at once
+    varied = [(index * 7919) % 1000 for index in range(200)]
+    tokens = varied[:60] + CYCLE * 4 + varied[60:200] + CYCLE * 4
+    tracker = RepetitionTracker()
+    cycles = [tracker.push(token) for token in tokens]
+
+    assert tracker.loop["offset"] == 60
+    restart = 60 + 40 + 140
+    assert cycles.index((10, restart, 3), restart) == restart + 29
+    assert cycles[restart:restart + 29] == [None] * 29
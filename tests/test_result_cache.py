@@ -0,0 +1,79 @@
+import pytest
+
+from backends import load_backend
+from experiment_runner import build_cells, run_cells
+from loop_guard import RepetitionLoopCriteria
+from model_server import ModelService
+from prompts import CONTENT_EXPANSION_PROMPT, D_SERIES_PROMPT, PROMPTS
+from result_cache import ResultCache, cached_transform_batch, model_key
+from scenarios import CLINICAL_INPUTS
+from test_medgemma import model_identity, transform_batch
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("MEDGEMMA_STUB_TIME_SCALE", "0")
+        return load_backend("stub")
+
+
+def test_per_note_prompts_and_limits_mix_hits_and_misses(stub, tmp_path):
+    model, processor = stub
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    acetaminophen, diabetes, wound = (CLINICAL_INPUTS[name] for name in ("Acetaminophen", "Diabetes", "Wound Care"))
+
+    cached_transform_batch(
+        cache, model, processor, [acetaminophen, diabetes], [D_SERIES_PROMPT, CONTENT_EXPANSION_PROMPT], [300, 20]
+    )
+    assert cache.stats()["entries"] == 2
+
+    notes = [diabetes, wound, acetaminophen]
+    prompts = [CONTENT_EXPANSION_PROMPT, D_SERIES_PROMPT, D_SERIES_PROMPT]
+    limits = [20, 10, 300]
+    outputs = cached_transform_batch(cache, model, processor, notes, prompts, limits)
+
+    assert cache.hits == 2
+    assert outputs == transform_batch(model, processor, notes, prompts, max_new_tokens=limits)
+    # The miss was generated with its own limit, not the first note's
+    assert len(processor.tokenizer(outputs[1], add_special_tokens=False)["input_ids"]) <= 10
+    cache.close()
+
+
+def test_loop_truncated_outputs_are_not_cached(stub, tmp_path):
+    model, processor = stub
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    guard = RepetitionLoopCriteria()
+    # The stub loops on Heart Failure until the guard stops it
+    notes = [CLINICAL_INPUTS["Acetaminophen"], CLINICAL_INPUTS["Heart Failure"]]
+
+    cached_transform_batch(cache, model, processor, notes, D_SERIES_PROMPT, 400, loop_guard=guard)
+    assert list(guard.detections) == [1]
+    assert cache.stats()["entries"] == 1
+
+    # The cached note is a hit; the looping note is generated again and keeps its index
+    cached_transform_batch(cache, model, processor, notes[::-1], D_SERIES_PROMPT, 400, loop_guard=guard)
+    assert cache.hits == 1
+    assert list(guard.detections) == [0]
+    cache.close()
+
+
+def test_key_covers_backend_and_dtype(stub):
+    assert model_key(stub[0]) == {"model_id": "stub-medgemma", "backend": "stub", "dtype": "torch.float32"}
+
+
+def test_runner_and_server_answer_repeats_from_cache(stub, tmp_path):
+    model, processor = stub
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    matrix = {"prompts": ["d_v5"], "scenarios": ["Acetaminophen", "Diabetes"], "generation": [{"max_new_tokens": 40}]}
+    cells = build_cells(matrix, identity=model_identity(model))
+
+    first = [r["output"] for batch in run_cells(model, processor, "run", cells, cache=cache) for r in batch]
+    second = [r["output"] for batch in run_cells(model, processor, "run", cells, cache=cache) for r in batch]
+    assert second == first
+    assert cache.hits == 2
+
+    service = ModelService(model, processor, cache=cache)
+    payload = {"clinical_text": CLINICAL_INPUTS["Diabetes"], "prompt_instructions": PROMPTS["d_v5"], "max_new_tokens": 40}
+    assert service.transform(payload)["output"] == first[1]
+    assert cache.hits == 3
+    cache.close()
@@ -0,0 +1,67 @@
+import pytest
+import torch
+
+from backends import load_backend
+from prompts import D_SERIES_PROMPT
+from scheduler import ContinuousBatchScheduler
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    return load_backend("tiny", dtype=torch.float32)
+
+
+def _fail_on_call(model, failing_call):
+    """Make the failing_call-th forward pass raise"""
+    forward = model.forward
+    calls = []
+
+    def patched(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == failing_call:
+            raise RuntimeError("injected forward failure")
+        return forward(*args, **kwargs)
+
+    model.forward = patched
+    return lambda: vars(model).pop("forward")
+
+
+@pytest.mark.parametrize("failing_call", [1, 2], ids=["prefill", "decode"])
+def test_forward_failure_resolves_futures_and_keeps_serving(tiny, failing_call):
+    model, processor = tiny
+    scheduler = ContinuousBatchScheduler(model, processor)
+    restore = _fail_on_call(model, failing_call)
+    # Queued before the loop starts, so both are prefilled in the same pass
+    futures = [scheduler.submit(note, D_SERIES_PROMPT, max_new_tokens=8) for note in ("Rest.", "Walk daily.")]
+    scheduler.start()
+    try:
+        for future in futures:
+            with pytest.raises(RuntimeError, match="injected"):
+                future.result(timeout=60)
+        restore()
+
+        result = scheduler.submit("Keep the wound dry.", D_SERIES_PROMPT, max_new_tokens=8).result(timeout=60)
+        assert result["generated_tokens"] >= 1
+        assert scheduler.stats["failed"] >= 1
+    finally:
+        scheduler.stop()
+
+
+def test_eos_ids_do_not_modify_the_generation_config(tiny):
+    model, processor = tiny
+    original = model.generation_config.eos_token_id
+    model.generation_config.eos_token_id = [1, 106]
+    try:
+        for _ in range(3):
+            scheduler = ContinuousBatchScheduler(model, processor)
+        assert model.generation_config.eos_token_id == [1, 106]
+        assert scheduler.eos_token_ids == {1, 106, processor.tokenizer.eos_token_id}
+    finally:
+        model.generation_config.eos_token_id = original
+
+
+def test_stub_backend_is_refused_at_construction(monkeypatch):
+    monkeypatch.setenv("MEDGEMMA_STUB_TIME_SCALE", "0")
+    model, processor = load_backend("stub")
+    with pytest.raises(ValueError, match="no forward pass"):
+        ContinuousBatchScheduler(model, processor)
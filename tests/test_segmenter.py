@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from content_classifier import DEFAULT_CLASSIFIER, LEGACY_CLASSIFIER
+from scenarios import CLINICAL_INPUTS
+from segmenter import segment_statements, stream_statements
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Take 1-2 tablets. Report gain >2-3 lbs.", ["Take 1-2 tablets", "Report gain >2-3 lbs"]),
+        ("Carvedilol 6.25mg BID. Fever >100.4F.", ["Carvedilol 6.25mg BID", "Fever >100.4F"]),
+        ("Take 1 tab b.i.d. with food. See Dr. Patel.", ["Take 1 tab b.i.d. with food", "See Dr. Patel"]),
+        ("Use as needed, e.g. Take it at night.", ["Use as needed, e.g", "Take it at night"]),
+        ("- Rest\n• Drink fluids\n2. Follow-up in 2 - 3 days", ["Rest", "Drink fluids", "Follow-up in 2 - 3 days"]),
+        ("Keep dry - call if red!", ["Keep dry", "call if red"]),
+    ],
+)
+def test_segments_keep_ranges_decimals_and_abbreviations(text, expected):
+    assert segment_statements(text) == expected
+
+
+def test_stream_matches_segments_for_any_chunking():
+    random.seed(0)
+    for text in CLINICAL_INPUTS.values():
+        for _ in range(50):
+            cuts = sorted(random.sample(range(len(text) + 1), random.randint(0, 8)))
+            chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+            assert list(stream_statements(chunks)) == segment_statements(text)
+
+
+def test_default_classifier_keeps_ranges_and_legacy_still_shreds_them():
+    note = CLINICAL_INPUTS["Heart Failure"]
+    assert any(">2-3 lbs" in statement for statement in DEFAULT_CLASSIFIER.statements(note))
+    assert not any(">2-3 lbs" in statement for statement in LEGACY_CLASSIFIER.statements(note))
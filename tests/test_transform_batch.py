@@ -0,0 +1,40 @@
+import pytest
+import torch
+
+from backends import load_backend
+from loop_guard import RepetitionLoopCriteria
+from scenarios import CLINICAL_INPUTS
+from test_medgemma import transform_batch, transform_text
+
+PROMPT = "Rewrite for a patient."
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    return load_backend("tiny", dtype=torch.float32)
+
+
+def test_left_padded_batch_matches_one_note_at_a_time(tiny):
+    model, processor = tiny
+    # Mixed lengths, so every batch pads, and more notes than the batch size
+    notes = [
+        CLINICAL_INPUTS["Hip Surgery"],
+        "Take 1 tab daily.",
+        CLINICAL_INPUTS["Acetaminophen"],
+        CLINICAL_INPUTS["Heart Failure"],
+        "Rest.",
+    ]
+
+    batch_guard = RepetitionLoopCriteria()
+    batched = transform_batch(model, processor, notes, PROMPT, max_new_tokens=12, batch_size=2, loop_guard=batch_guard)
+
+    single = []
+    single_detections = {}
+    for index, note in enumerate(notes):
+        guard = RepetitionLoopCriteria()
+        single.append(transform_text(model, processor, note, PROMPT, max_new_tokens=12, loop_guard=guard))
+        if 0 in guard.detections:
+            single_detections[index] = guard.detections[0]
+
+    assert batched == single
+    assert batch_guard.detections == single_detections